@@ -0,0 +1,165 @@
+"""埋め込み用の音声エンコード
+
+VOICEVOX の出力 (24kHz 16bit PCM WAV) はそのままだと 1 時間で 150MB 以上になるため、
+PPTX に埋め込む前に圧縮形式へ変換する。
+
+- mp3 / m4a: ローカルの ffmpeg があれば使う
+- mulaw: μ-law WAV (8bit, サイズ半分)。追加ソフト不要で、ffmpeg がない場合の代替にも使う
+"""
+
+import array
+import io
+import shutil
+import struct
+import subprocess
+import sys
+import wave
+from dataclasses import dataclass
+
+try:
+    import audioop
+    _HAS_AUDIOOP = True
+except ImportError:  # Python 3.13 以降
+    _HAS_AUDIOOP = False
+
+# 形式名 → (拡張子, コンテンツタイプ)
+AUDIO_FORMATS = {
+    "wav": ("wav", "audio/wav"),
+    "mulaw": ("wav", "audio/wav"),
+    "mp3": ("mp3", "audio/mpeg"),
+    "m4a": ("m4a", "audio/mp4"),
+}
+
+# ffmpeg に渡すエンコード設定 (音声は 24kHz モノラルの読み上げなので低めのビットレートで十分)
+_FFMPEG_ARGS = {
+    "mp3": ["-codec:a", "libmp3lame", "-b:a", "64k", "-f", "mp3"],
+    "m4a": ["-codec:a", "aac", "-b:a", "64k", "-movflags", "+faststart", "-f", "ipod"],
+}
+
+_WAVE_FORMAT_MULAW = 7
+
+
+@dataclass
+class EncodedAudio:
+    """エンコード済みの音声。"""
+    data: bytes
+    ext: str
+    content_type: str
+    format: str  # 実際の形式 (エンコードに失敗した場合は "wav")
+    error: str = ""  # 指定の形式にできず WAV のままにした理由
+
+
+def find_ffmpeg() -> str | None:
+    """ffmpeg の実行ファイルパスを返す。見つからなければ None。"""
+    return shutil.which("ffmpeg")
+
+
+def resolve_format(audio_format: str) -> str:
+    """実際に使う形式を返す (ffmpeg がなければ mp3/m4a は mulaw にする)。"""
+    audio_format = (audio_format or "wav").lower()
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"未対応の音声形式です: {audio_format}")
+    if audio_format in _FFMPEG_ARGS and find_ffmpeg() is None:
+        return "mulaw"
+    return audio_format
+
+
+def _read_pcm(wav_bytes: bytes) -> tuple[int, int, int, bytes]:
+    """PCM WAV から (チャンネル数, サンプル幅, サンプリングレート, PCMデータ) を取り出す。"""
+    with io.BytesIO(wav_bytes) as f:
+        with wave.open(f) as w:
+            return w.getnchannels(), w.getsampwidth(), w.getframerate(), w.readframes(w.getnframes())
+
+
+_ULAW_TABLE: bytes | None = None
+
+
+def _ulaw_table() -> bytes:
+    """16bit サンプル (符号なしとして解釈) → μ-law バイトの変換表 (audioop.lin2ulaw と同じ値)。"""
+    global _ULAW_TABLE
+    if _ULAW_TABLE is None:
+        seg_end = (0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)
+        table = bytearray(65536)
+        for u in range(65536):
+            val = (u - 65536 if u >= 32768 else u) >> 2  # 14bit に落とす
+            if val < 0:
+                val, mask = -val, 0x7F
+            else:
+                mask = 0xFF
+            val = min(val, 8159) + 33
+            seg = next((i for i, end in enumerate(seg_end) if val <= end), 8)
+            if seg >= 8:
+                table[u] = 0x7F ^ mask
+            else:
+                table[u] = ((seg << 4) | ((val >> (seg + 1)) & 0xF)) ^ mask
+        _ULAW_TABLE = bytes(table)
+    return _ULAW_TABLE
+
+
+def _lin2ulaw(pcm) -> bytes:
+    if _HAS_AUDIOOP:
+        return audioop.lin2ulaw(pcm, 2)
+    samples = array.array("H")
+    samples.frombytes(pcm)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return bytes(map(_ulaw_table().__getitem__, samples))
+
+
+def _encode_mulaw(wav_bytes: bytes) -> bytes:
+    nchannels, sampwidth, framerate, pcm = _read_pcm(wav_bytes)
+    if sampwidth != 2:
+        raise ValueError("μ-law 変換は 16bit PCM のみ対応しています")
+    data = _lin2ulaw(pcm)
+    nframes = len(data) // nchannels
+    # 非 PCM 形式なので fmt は cbSize 付き 18 バイト + fact チャンク
+    fmt = struct.pack("<HHIIHHH", _WAVE_FORMAT_MULAW, nchannels, framerate,
+                      framerate * nchannels, nchannels, 8, 0)
+    body = (
+        b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"fact" + struct.pack("<II", 4, nframes)
+        + b"data" + struct.pack("<I", len(data)) + data
+    )
+    if len(data) % 2:
+        body += b"\x00"
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def _encode_ffmpeg(wav_bytes: bytes, audio_format: str) -> bytes:
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg が見つかりません")
+    kwargs = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+    proc = subprocess.run(
+        [ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+         *_FFMPEG_ARGS[audio_format], "pipe:1"],
+        input=wav_bytes, capture_output=True, **kwargs,
+    )
+    if proc.returncode != 0 or not proc.stdout:
+        message = proc.stderr.decode("utf-8", "replace").strip()
+        raise RuntimeError(f"ffmpeg によるエンコードに失敗しました: {message}")
+    return proc.stdout
+
+
+def encode_audio(wav_bytes: bytes, audio_format: str = "wav") -> EncodedAudio:
+    """WAV を指定形式にエンコードする。
+
+    audio_format は resolve_format() 済みの値を渡すこと。
+    エンコードに失敗した場合は元の WAV を返し、理由を error に入れる (表示は呼び出し側で行う)。
+    """
+    error = ""
+    if audio_format != "wav":
+        try:
+            if audio_format == "mulaw":
+                data = _encode_mulaw(wav_bytes)
+            else:
+                data = _encode_ffmpeg(wav_bytes, audio_format)
+            ext, content_type = AUDIO_FORMATS[audio_format]
+            return EncodedAudio(data, ext, content_type, audio_format)
+        except (RuntimeError, ValueError, OSError) as e:
+            error = str(e)
+    ext, content_type = AUDIO_FORMATS["wav"]
+    return EncodedAudio(wav_bytes, ext, content_type, "wav", error)
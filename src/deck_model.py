@@ -0,0 +1,140 @@
+"""解析済みデッキのキャッシュ (GUI の各操作と生成処理で共有する)
+
+入力ファイルを指定したとき・スライド選択・<next> チェック・生成のたびに
+同じ PPTX を読み直さないよう、ノート・文の分割・クリックアニメーション数・<config> タグと
+StreamingPackage の骨組みを 1 回の読み込みでまとめて作り、パス・更新時刻・サイズをキーに保持する。
+ファイルが変更されると (更新時刻かサイズが変わると) 次の get() で読み直す。
+読み込みは cancel_event で中断でき (DeckLoadCancelled)、on_progress で進み具合を通知する。
+
+    cache = DeckCache()
+    deck = cache.get("lecture.pptx")
+    deck.config                       # <config> タグ
+    deck.slides[0].sentences          # 字幕に表示する文
+    package = deck.open_package()     # embed_audio(package=...) に渡す
+"""
+
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from lxml import etree
+
+from generation import parse_config_tags
+from pptx_reader import read_notes_from_zip
+from pptx_stream import StreamingPackage, build_skeleton, file_stamp
+from pptx_writer import count_click_groups
+from tts.voicevox import count_next_tags, display_sentences
+
+
+@dataclass
+class SlideModel:
+    index: int  # 0-based
+    notes_text: str
+    partname: str  # スライドの ZIP 内のパス
+    sentences: list[str] = field(default_factory=list)  # 字幕に表示する文 (<wait> などで分割)
+    click_groups: int = 0  # クリックアニメーション (mainSeq のグループ) の数
+    next_tags: int = 0  # ノートの <next> の数 ({...} でエスケープしたものは除く)
+
+
+@dataclass
+class DeckModel:
+    path: str
+    mtime_ns: int
+    size: int
+    slides: list[SlideModel]
+    config: dict[str, str]  # <config> タグ (parse_config_tags の結果)
+    skeleton: bytes  # StreamingPackage の骨組み (XML 以外を空にした ZIP)
+
+    def open_package(self) -> StreamingPackage:
+        """元のファイルを読み直さずに StreamingPackage を開く (呼ぶたびに新しく作る)。"""
+        return StreamingPackage(self.path, skeleton=self.skeleton, stamp=(self.mtime_ns, self.size))
+
+
+class DeckLoadCancelled(Exception):
+    """cancel_event によりデッキの読み込みが中断された。"""
+
+
+def load_deck(path: str, cancel_event: threading.Event | None = None,
+              on_progress=None) -> DeckModel:
+    """PPTX を 1 回だけ開いて DeckModel を作る。
+
+    Args:
+        cancel_event: セットされるとスライドの区切りで DeckLoadCancelled を送出する
+        on_progress: on_progress(読み込んだスライド数, 全スライド数)。読み込むスレッドで呼ばれる
+    """
+    mtime_ns, size = file_stamp(path)
+    with zipfile.ZipFile(path) as zf:
+        slides = []
+        all_notes = read_notes_from_zip(zf)
+        for notes in all_notes:
+            if cancel_event is not None and cancel_event.is_set():
+                raise DeckLoadCancelled()
+            slide = SlideModel(notes.index, notes.notes_text, notes.partname)
+            if notes.partname in zf.NameToInfo:
+                slide.click_groups = count_click_groups(etree.fromstring(zf.read(notes.partname)))
+            if notes.notes_text:
+                slide.sentences = display_sentences(notes.notes_text)
+                slide.next_tags = count_next_tags(notes.notes_text)
+            slides.append(slide)
+            if on_progress is not None:
+                on_progress(len(slides), len(all_notes))
+        if cancel_event is not None and cancel_event.is_set():
+            raise DeckLoadCancelled()
+        skeleton = build_skeleton(zf)
+    config = parse_config_tags([s.notes_text for s in slides if s.notes_text])
+    return DeckModel(os.path.abspath(path), mtime_ns, size, slides, config, skeleton)
+
+
+class DeckCache:
+    """DeckModel のキャッシュ (スレッドセーフ)。最近使った max_entries 件を保持する。"""
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self._decks: OrderedDict[str, DeckModel] = OrderedDict()
+        self._lock = threading.Lock()
+        # ファイルごとの読み込みロック (同じファイルを同時に読み込まない)
+        self._load_locks: dict[str, threading.Lock] = {}
+
+    def _cached(self, key: str, stamp: tuple[int, int]) -> DeckModel | None:
+        with self._lock:
+            deck = self._decks.get(key)
+            if deck is not None and (deck.mtime_ns, deck.size) == stamp:
+                self._decks.move_to_end(key)
+                return deck
+        return None
+
+    def get(self, path: str, cancel_event: threading.Event | None = None,
+            on_progress=None) -> DeckModel:
+        """path の DeckModel を返す。初回とファイルが変更された後は読み込む。
+
+        同じファイルを別のスレッドが読み込み中なら、その完了を待って結果を使う
+        (待っている間は on_progress は呼ばれない)。cancel_event と on_progress は load_deck() と同じ。
+        """
+        key = os.path.abspath(path)
+        deck = self._cached(key, file_stamp(key))
+        if deck is not None:
+            return deck
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # 待っている間に他のスレッドが読み込んだかもしれない
+            deck = self._cached(key, file_stamp(key))
+            if deck is not None:
+                return deck
+            deck = load_deck(key, cancel_event=cancel_event, on_progress=on_progress)
+            with self._lock:
+                self._decks[key] = deck
+                self._decks.move_to_end(key)
+                while len(self._decks) > self.max_entries:
+                    self._decks.popitem(last=False)
+        return deck
+
+    def invalidate(self, path: str | None = None) -> None:
+        """path (省略時はすべて) のキャッシュを捨てる。"""
+        with self._lock:
+            if path is None:
+                self._decks.clear()
+            else:
+                self._decks.pop(os.path.abspath(path), None)
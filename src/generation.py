@@ -0,0 +1,618 @@
+"""PPTX 1 ファイル分の音声付き PPTX 生成処理 (GUI / CLI 共通)
+
+GUI の各設定項目は GenerationSettings のフィールドに対応し、
+フィールド名は <config ...> タグのキー名と同じにしてある。
+"""
+
+import asyncio
+import os
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass, field, fields
+
+from audio_encode import resolve_format
+from manifest import load_reusable, read_manifest, slide_hash
+from pptx_reader import read_notes
+from pptx_writer import EncodeReport, embed_audio, get_wav_duration_ms
+from tracing import Trace, recording, span
+from tts.cache import DiskCache, default_cache_dir
+from tts.voicevox import DEFAULT_SAMPLING_RATE, VoicevoxEngine
+from tts.voicevox_async import AsyncVoicevoxEngine, synthesize_deck_async
+
+_CONFIG_RE = re.compile(r"<config\s([^>]*)>", re.IGNORECASE)
+_KV_RE = re.compile(r'([\w]+)=(?:"([^"]*)"|(\S+))')
+
+
+def parse_config_tags(notes_list: list[str]) -> dict[str, str]:
+    """複数のノートテキストから <config ...> タグを解析し設定 dict を返す。
+
+    複数のタグがある場合は後のタグが優先される。
+    """
+    config: dict[str, str] = {}
+    for notes in notes_list:
+        for m in _CONFIG_RE.finditer(notes):
+            for kv in _KV_RE.finditer(m.group(1)):
+                key = kv.group(1)
+                val = kv.group(2) if kv.group(2) is not None else kv.group(3)
+                config[key] = val
+    return config
+
+
+@dataclass
+class GenerationSettings:
+    """音声付き PPTX の生成設定 (既定値は GUI の初期値と同じ)。"""
+    url: str = "http://localhost:50021"
+    speaker_id: int = 1
+    # <config> タグの話者名・スタイル名 (resolve_speaker_id で speaker_id に変換する)
+    speaker: str = ""
+    style: str = ""
+    # 音声
+    pause: float = 0.5
+    speed: float = 1.0
+    pitch: float = 0.0
+    intonation: float = 1.0
+    volume: float = 1.0
+    end_pause: float = 2.0
+    parallel: int = 4
+    async_engine: bool = False  # AsyncVoicevoxEngine (aiohttp) で合成する
+    audio_format: str = "wav"
+    sample_rate: int = DEFAULT_SAMPLING_RATE
+    stereo: bool = False
+    compression: str = "normal"  # 保存時の圧縮 ("fast", "normal", "small")
+    # アニメーション
+    auto_next: float = 5.0
+    auto_next_enabled: bool = True
+    # 字幕
+    subtitle: bool = True
+    subtitle_style: str = "outline"
+    fontsize: int = 18
+    font: str = ""
+    bottom: float = 0.05
+    font_color: str = "FFFFFF"
+    outline: bool = True
+    outline_color: str = "000000"
+    outline_width: float = 0.75
+    glow: bool = False
+    glow_color: str = "000000"
+    glow_size: float = 11.0
+    bg_color: str = "000000"
+    bg_alpha: int = 60
+    kuten: str = "そのまま"
+    touten: str = "そのまま"
+    bold: bool = False
+    italic: bool = False
+    underline: bool = False
+    # 生成対象
+    update_mode: bool = True
+    selected_slides: set[int] | None = None  # 1始まりのスライド番号。None = 全スライド
+
+
+# <config> タグで上書きできない項目
+_NON_CONFIG_FIELDS = {"url", "speaker_id", "async_engine", "update_mode", "selected_slides"}
+_COLOR_FIELDS = {"font_color", "outline_color", "glow_color", "bg_color"}
+
+
+def apply_config(settings: GenerationSettings, config: dict[str, str]) -> list[str]:
+    """<config> タグの設定 (parse_config_tags の結果) を settings に適用する。
+
+    Returns:
+        解釈できなかったキーのリスト
+    """
+    ignored = []
+    for f in fields(settings):
+        if f.name in _NON_CONFIG_FIELDS or f.name not in config:
+            continue
+        val = config[f.name]
+        try:
+            if f.type is bool:
+                setattr(settings, f.name, val.lower() in ("on", "true", "1"))
+            elif f.type is int:
+                setattr(settings, f.name, int(float(val)))
+            elif f.type is float:
+                setattr(settings, f.name, float(val))
+            elif f.name in _COLOR_FIELDS:
+                setattr(settings, f.name, val.lstrip("#").upper())
+            else:
+                setattr(settings, f.name, val)
+        except ValueError:
+            ignored.append(f.name)
+    names = {f.name for f in fields(settings)}
+    ignored.extend(k for k in config if k not in names)
+    return ignored
+
+
+def resolve_speaker_id(speakers: list[dict], speaker: str, style: str = "") -> int | None:
+    """話者名・スタイル名 (/speakers の name) からスタイル ID を求める。
+
+    style を省略した場合は話者の最初のスタイルを使う。見つからなければ None。
+    """
+    for sp in speakers:
+        if sp.get("name") != speaker:
+            continue
+        styles = sp.get("styles", [])
+        for st in styles:
+            if not style or st.get("name") == style:
+                return st["id"]
+    return None
+
+
+def hash_settings(s: GenerationSettings) -> dict:
+    """スライドのハッシュ (slide_hash) に含める、音声とタイミングに影響する設定。"""
+    return {
+        "speaker": s.speaker_id, "pause": s.pause, "speed": s.speed, "pitch": s.pitch,
+        "intonation": s.intonation, "volume": s.volume, "sample_rate": s.sample_rate,
+        "stereo": s.stereo, "audio_format": resolve_format(s.audio_format), "subtitle": s.subtitle,
+    }
+
+
+def changed_slides(slides, output_path: str, settings: GenerationSettings) -> set[int]:
+    """前回の出力 output_path の音声を再利用できない (ノートか設定が変わった) スライドのインデックス。
+
+    ノートのないスライドは含めない。output_path にマニフェストがなければノートのあるスライドすべて。
+    slides は notes_text と index (0始まり) を持つもの (SlideNotes・SlideModel)。
+    """
+    entries = read_manifest(output_path)
+    hs = hash_settings(settings)
+    audio_format = resolve_format(settings.audio_format)
+    changed = set()
+    for sl in slides:
+        if not sl.notes_text:
+            continue
+        entry = entries.get(sl.index)
+        if entry is None or not entry.matches(slide_hash(sl.notes_text, hs), audio_format):
+            changed.add(sl.index)
+    return changed
+
+
+def open_caches(directory: str | None = None) -> tuple[DiskCache, DiskCache]:
+    """合成結果と audio_query のディスクキャッシュを返す。
+
+    同じディレクトリを複数のプロセスで共有してよい。
+    """
+    directory = directory or default_cache_dir()
+    # 文ごとの合成結果キャッシュ (再生成時に変更のない文は合成しない)
+    wav_cache = DiskCache(os.path.join(directory, "wav"))
+    # audio_query の結果キャッシュ (速度・ピッチ等の変更だけならテキスト解析を省略)
+    query_cache = DiskCache(
+        os.path.join(directory, "query"), max_bytes=256 * 1024 ** 2,
+        suffix=".json", memory_items=4096,
+    )
+    return wav_cache, query_cache
+
+
+@dataclass
+class GenerationResult:
+    """1 ファイル分の生成結果と処理時間。"""
+    input_path: str
+    output_path: str = ""
+    slides: int = 0
+    synthesized_slides: int = 0
+    reused_slides: int = 0
+    sentences: int = 0
+    cache_hits: int = 0
+    audio_sec: float = 0.0
+    synth_sec: float = 0.0
+    embed_sec: float = 0.0
+    total_sec: float = 0.0
+    error: str = ""
+    trace: Trace | None = field(default=None, repr=False)  # 段階ごとの処理時間の記録
+
+    @property
+    def realtime_factor(self) -> float:
+        """生成した音声の長さ ÷ 処理時間 (大きいほど速い)。"""
+        return self.audio_sec / self.total_sec if self.total_sec > 0 else 0.0
+
+
+# ---------------------------------------------------------------------------
+# 進捗イベント
+# ---------------------------------------------------------------------------
+
+
+@dataclass(kw_only=True)
+class PipelineEvent:
+    """GenerationPipeline が通知する進捗イベントの基底クラス。
+
+    progress は 0.0〜1.0 の全体の進捗、eta_sec は残り時間の推定値 (秒、推定できなければ None)。
+    """
+    progress: float = 0.0
+    eta_sec: float | None = None
+
+
+@dataclass
+class Started(PipelineEvent):
+    input_path: str
+    output_path: str
+
+
+@dataclass
+class DeckLoaded(PipelineEvent):
+    total_slides: int
+    selected_slides: int | None  # スライド選択時の選択数 (全スライドなら None)
+    notes_slides: int
+    reused_slides: int
+    kept_slides: int = 0  # 選択外で、前回の出力の音声をそのまま引き継ぐスライド数
+
+
+@dataclass
+class SynthesisStarted(PipelineEvent):
+    speaker_id: int
+    pause: float
+    parallel: int
+    slides: int  # 合成するスライド数 (再利用分を除く)
+
+
+@dataclass
+class SlideStarted(PipelineEvent):
+    slide_index: int  # 0始まり
+    sentences: int
+
+
+@dataclass
+class SentenceSynthesized(PipelineEvent):
+    slide_index: int
+    sentence_index: int  # 完了順に通知されるため連番とは限らない
+    sentences: int
+    text: str
+
+
+@dataclass
+class SlideFinished(PipelineEvent):
+    """スライドの音声が揃った (スライド順に通知)。ノートのないスライドは sentences が空。"""
+    slide_index: int
+    total_slides: int
+    sentences: list[str]
+    duration_ms: int
+
+
+@dataclass
+class SynthesisFinished(PipelineEvent):
+    elapsed_sec: float
+    cache_hits: int
+    transport_stats: str
+
+
+@dataclass
+class AudioEncoded(PipelineEvent):
+    """埋め込む音声をエンコードした (指定の形式にできなかったスライドは report.failed)。"""
+    report: EncodeReport
+
+
+@dataclass
+class BytesWritten(PipelineEvent):
+    output_path: str
+    nbytes: int
+    elapsed_sec: float
+
+
+@dataclass
+class Finished(PipelineEvent):
+    result: GenerationResult
+
+
+def log_event(event: PipelineEvent) -> None:
+    """イベントを GUI のログと同じ形式で print する (on_event にそのまま渡せる)。"""
+    if isinstance(event, Started):
+        print(f"PPTXを読み込んでいます: {event.input_path}")
+    elif isinstance(event, DeckLoaded):
+        print(f"  {event.total_slides} スライドを検出")
+        if event.selected_slides is not None:
+            print(f"  {event.selected_slides} スライドを選択中")
+        if event.notes_slides == 0:
+            print("ノートが含まれるスライドがありません。終了します。")
+            return
+        print(f"  {event.notes_slides} スライドにノートあり")
+        if event.reused_slides:
+            print(f"  変更のない {event.reused_slides} スライドは前回の出力の音声を再利用します")
+        if event.kept_slides:
+            print(f"  選択外の {event.kept_slides} スライドは前回の出力の音声を引き継ぎます")
+    elif isinstance(event, SynthesisStarted):
+        print(f"\n音声を合成しています (speaker={event.speaker_id}, pause={event.pause}s, "
+              f"並列数={event.parallel})...")
+    elif isinstance(event, SlideFinished):
+        slide_num = event.slide_index + 1
+        if not event.sentences:
+            print(f"  [{slide_num}/{event.total_slides}] スライド {slide_num}: (ノートなし - スキップ)")
+        else:
+            print(f"  [{slide_num}/{event.total_slides}] スライド {slide_num}:")
+            for i, text in enumerate(event.sentences):
+                print(f"    ({i + 1}/{len(event.sentences)}) {text}")
+    elif isinstance(event, SynthesisFinished):
+        if event.cache_hits:
+            print(f"  キャッシュ済みの文: {event.cache_hits}")
+        if event.transport_stats:
+            print("  VOICEVOX 通信:\n" + event.transport_stats)
+        print(f"\n音声付きPPTXを生成しています...")
+    elif isinstance(event, AudioEncoded):
+        for line in event.report.lines():
+            print(line)
+
+
+class _EtaEstimator:
+    """ノートの文字数で重み付けした合成の進捗と残り時間を求める。
+
+    合成を始めるまで各スライドの文数は分からないため、スライドの重みは
+    ノートの文字数とし、スライド内は完了した文の割合で按分する。
+    """
+
+    def __init__(self, weights: list[int]):
+        self._weights = weights
+        self._total = sum(weights) or 1
+        self._done = [0.0] * len(weights)
+        self._t0 = time.perf_counter()
+
+    def update(self, pos: int, fraction: float) -> None:
+        self._done[pos] = fraction
+
+    def progress(self) -> float:
+        return sum(w * d for w, d in zip(self._weights, self._done)) / self._total
+
+    def eta_sec(self) -> float | None:
+        p = self.progress()
+        if p <= 0:
+            return None
+        return (time.perf_counter() - self._t0) * (1 - p) / p
+
+
+# 全体の進捗のうち合成が占める割合 (残りは PPTX の書き出し)
+_SYNTH_SHARE = 0.9
+
+
+class GenerationPipeline:
+    """音声付き PPTX の生成処理 (スライド読み込み → 合成 → 埋め込み)。
+
+    GUI を使わずに組み込めるよう、進捗は print ではなく PipelineEvent として
+    on_event コールバック (run) またはイテレータ (iter_events) で通知する。
+    ログが必要なら on_event に log_event を渡す。
+    エンジンや PPTX 書き出しのメッセージ (キャッシュ統計・保存先など) は従来どおり print される。
+
+    使用例:
+        pipeline = GenerationPipeline(GenerationSettings(speaker_id=3), *open_caches())
+        for event in pipeline.iter_events("in.pptx", "out.pptx"):
+            ...
+    """
+
+    def __init__(self, settings: GenerationSettings, wav_cache: DiskCache | None = None,
+                 query_cache: DiskCache | None = None, deck_cache=None, generator: str = ""):
+        self.settings = settings
+        self.wav_cache = wav_cache
+        self.query_cache = query_cache
+        # deck_model.DeckCache。指定すると解析済みのデッキを使い、入力の読み直しを省く
+        self.deck_cache = deck_cache
+        # マニフェストに記録する生成元 (呼び出し側が "PPVoice <バージョン>" などを渡す)
+        self.generator = generator
+
+    def run(self, input_path: str, output_path: str, on_event=None,
+            cancel_event: threading.Event | None = None) -> GenerationResult:
+        """生成を実行し、結果を返す。
+
+        cancel_event がセットされると SynthesisCancelled を送出する。
+        段階ごとの処理時間と通信・キャッシュのカウンタは result.trace に記録される。
+
+        Args:
+            on_event: コールバック on_event(event: PipelineEvent)。生成処理と同じスレッドで呼ばれる
+        """
+        trace = Trace()
+        with recording(trace):
+            return self._run(input_path, output_path, on_event or (lambda event: None),
+                             cancel_event, trace)
+
+    def _run(self, input_path: str, output_path: str, emit, cancel_event: threading.Event | None,
+             trace: Trace) -> GenerationResult:
+        t_start = time.perf_counter()
+        s = self.settings
+        result = GenerationResult(input_path=input_path, trace=trace)
+        emit(Started(input_path, output_path))
+
+        # スライド読み込み
+        with span("read_notes"):
+            deck = self.deck_cache.get(input_path) if self.deck_cache is not None else None
+            slides = deck.slides if deck is not None else read_notes(input_path)
+        total_slides = len(slides)
+        all_slides = slides
+        selected = None
+        # スライドフィルタ
+        if s.selected_slides is not None:
+            slides = [sl for sl in slides if (sl.index + 1) in s.selected_slides]
+            selected = len(slides)
+        notes_count = sum(1 for sl in slides if sl.notes_text)
+        result.slides = notes_count
+
+        # 差分再生成: 音声とタイミングに影響する設定のハッシュで変更を判定する
+        hs = hash_settings(s)
+        slide_hashes = {sl.index: slide_hash(sl.notes_text, hs) for sl in slides if sl.notes_text}
+        reused = {}
+        kept = {}  # 選択外のスライドのうち、前回の出力の音声を引き継ぐもの
+        if notes_count and s.update_mode and os.path.exists(output_path):
+            # 選択外のスライドも前回の音声がまだ使えれば引き継ぐ。出力とマニフェストから
+            # 落とすと、次に全スライドで更新したときに合成し直しになるため
+            other_hashes = {sl.index: slide_hash(sl.notes_text, hs) for sl in all_slides
+                            if sl.notes_text and sl.index not in slide_hashes}
+            reusable = load_reusable(output_path, {**slide_hashes, **other_hashes},
+                                     resolve_format(s.audio_format))
+            reused = {idx: r for idx, r in reusable.items() if idx in slide_hashes}
+            kept = {idx: r for idx, r in reusable.items() if idx in other_hashes}
+            slide_hashes.update((idx, other_hashes[idx]) for idx in kept)
+        synth_slides = [sl for sl in slides if sl.index not in reused]
+        result.reused_slides = len(reused)
+        emit(DeckLoaded(total_slides, selected, notes_count, len(reused), kept_slides=len(kept)))
+        if notes_count == 0:
+            result.total_sec = time.perf_counter() - t_start
+            emit(Finished(result, progress=1.0, eta_sec=0.0))
+            return result
+
+        # 音声合成
+        need_timings = s.subtitle
+        emit(SynthesisStarted(s.speaker_id, s.pause, s.parallel, len(synth_slides)))
+        slide_audio = []
+        slide_timings = {}
+        slide_next_positions = {}
+        for idx, r in {**reused, **kept}.items():
+            if idx in reused:
+                result.audio_sec += r.entry.duration_ms / 1000
+            if need_timings:
+                slide_timings[idx] = r.entry.timings
+                if r.entry.next_positions:
+                    slide_next_positions[idx] = r.entry.next_positions
+        cache_hits_before = self.wav_cache.hits if self.wav_cache is not None else 0
+        eta = _EtaEstimator([len(sl.notes_text) for sl in synth_slides])
+        completed = [0] * len(synth_slides)
+
+        def _progress(**kw):
+            return dict(progress=eta.progress() * _SYNTH_SHARE, eta_sec=eta.eta_sec(), **kw)
+
+        def on_slide_start(pos, total):
+            emit(SlideStarted(synth_slides[pos].index, total, **_progress()))
+
+        def on_chunk(pos, i, total, text):
+            completed[pos] += 1
+            eta.update(pos, completed[pos] / total)
+            emit(SentenceSynthesized(synth_slides[pos].index, i, total, text, **_progress()))
+
+        def on_slide(pos, res):
+            # スライドの完了はスライド順に通知される
+            info = synth_slides[pos]
+            wav, timings, next_pos = res
+            duration_ms = get_wav_duration_ms(wav) if wav else 0
+            if info.notes_text:
+                result.synthesized_slides += 1
+                result.sentences += len(timings)
+                result.audio_sec += duration_ms / 1000
+                if need_timings:
+                    slide_timings[info.index] = timings
+                    if next_pos:
+                        slide_next_positions[info.index] = next_pos
+            slide_audio.append((info.index, wav))
+            eta.update(pos, 1.0)
+            emit(SlideFinished(info.index, total_slides, [t[0] for t in timings], duration_ms,
+                               **_progress()))
+
+        t0 = time.perf_counter()
+        with span("synthesize_deck", slides=len(synth_slides)):
+            transport_stats = self._synthesize_deck(
+                [info.notes_text for info in synth_slides], cancel_event,
+                on_chunk=on_chunk, on_slide=on_slide, on_slide_start=on_slide_start,
+            )
+        result.synth_sec = time.perf_counter() - t0
+        if self.wav_cache is not None:
+            result.cache_hits = self.wav_cache.hits - cache_hits_before
+        emit(SynthesisFinished(result.synth_sec, result.cache_hits, transport_stats,
+                               progress=_SYNTH_SHARE, eta_sec=None))
+
+        # PPTX出力
+        t0 = time.perf_counter()
+        with span("embed_audio", slides=len(slide_audio) + len(reused) + len(kept)):
+            result.output_path = embed_audio(
+                input_path,
+                slide_audio,
+                output_path,
+                end_pause_ms=int(s.end_pause * 1000),
+                slide_timings=slide_timings if need_timings else None,
+                subtitle_font_size=s.fontsize,
+                subtitle_font_name=s.font,
+                subtitle_bottom_pct=s.bottom,
+                subtitle_style=s.subtitle_style,
+                subtitle_font_color=s.font_color,
+                subtitle_use_outline=s.outline,
+                subtitle_outline_color=s.outline_color,
+                subtitle_outline_width=s.outline_width,
+                subtitle_use_glow=s.glow,
+                subtitle_glow_color=s.glow_color,
+                subtitle_glow_size=s.glow_size,
+                subtitle_bg_color=s.bg_color,
+                subtitle_bg_alpha=s.bg_alpha,
+                subtitle_kuten_mode=s.kuten,
+                subtitle_touten_mode=s.touten,
+                subtitle_default_bold=s.bold,
+                subtitle_default_italic=s.italic,
+                subtitle_default_underline=s.underline,
+                slide_next_positions=slide_next_positions if slide_next_positions else None,
+                auto_next_interval_ms=int(s.auto_next * 1000) if s.auto_next_enabled else -1,
+                audio_format=s.audio_format,
+                compression=s.compression,
+                slide_hashes=slide_hashes,
+                reused_audio={**reused, **kept},
+                generator=self.generator,
+                package=deck.open_package() if deck is not None else None,
+                on_encoded=lambda report: emit(AudioEncoded(report, progress=_SYNTH_SHARE)),
+            )
+        result.embed_sec = time.perf_counter() - t0
+        emit(BytesWritten(result.output_path, os.path.getsize(result.output_path), result.embed_sec,
+                          progress=1.0, eta_sec=0.0))
+        result.total_sec = time.perf_counter() - t_start
+        emit(Finished(result, progress=1.0, eta_sec=0.0))
+        return result
+
+    def _synthesize_deck(self, texts: list[str], cancel_event: threading.Event | None,
+                         **callbacks) -> str:
+        """texts を合成し (結果は callbacks で受け取る)、通信の統計を返す。
+
+        settings.async_engine なら AsyncVoicevoxEngine を、このスレッドのイベントループで使う。
+        """
+        s = self.settings
+        voice = dict(speaker_id=s.speaker_id, base_url=s.url, pause_sec=s.pause,
+                     speed_scale=s.speed, pitch_scale=s.pitch,
+                     intonation_scale=s.intonation, volume_scale=s.volume,
+                     wav_cache=self.wav_cache, query_cache=self.query_cache,
+                     output_sampling_rate=s.sample_rate, output_stereo=s.stereo)
+        if s.async_engine:
+            engine = AsyncVoicevoxEngine(**voice, max_concurrency=max(1, s.parallel),
+                                         cancel_event=cancel_event)
+            asyncio.run(synthesize_deck_async(engine, texts, cancel_event=cancel_event, **callbacks))
+            return engine.format_stats()
+        engine = VoicevoxEngine(**voice, cancel_event=cancel_event)
+        try:
+            engine.synthesize_deck(texts, max_in_flight=max(1, s.parallel), cancel_event=cancel_event,
+                                   **callbacks)
+            return engine.transport.format_stats()
+        finally:
+            engine.transport.close()
+
+    def iter_events(self, input_path: str, output_path: str,
+                    cancel_event: threading.Event | None = None):
+        """生成をバックグラウンドスレッドで実行し、イベントを順に返すイテレータ。
+
+        最後のイベントは Finished。生成中の例外はイテレータから送出される。
+        途中で反復をやめた場合は cancel_event をセットして生成を中断させること。
+        """
+        events: queue.Queue = queue.Queue()
+        done = object()
+
+        def _worker():
+            try:
+                self.run(input_path, output_path, on_event=events.put, cancel_event=cancel_event)
+            except BaseException as e:
+                events.put(e)
+            finally:
+                events.put(done)
+
+        thread = threading.Thread(target=_worker, daemon=True)
+        thread.start()
+        while True:
+            item = events.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+        thread.join()
+
+
+def generate(
+    input_path: str,
+    output_path: str,
+    settings: GenerationSettings,
+    wav_cache: DiskCache | None = None,
+    query_cache: DiskCache | None = None,
+    cancel_event: threading.Event | None = None,
+    on_event=log_event,
+    deck_cache=None,
+    generator: str = "",
+) -> GenerationResult:
+    """入力 PPTX のノートを読み上げた音声付き PPTX を生成する。
+
+    GenerationPipeline の簡易版で、既定では進捗をログとして print する。
+    """
+    pipeline = GenerationPipeline(settings, wav_cache, query_cache, deck_cache, generator)
+    return pipeline.run(input_path, output_path, on_event=on_event, cancel_event=cancel_event)
@@ -4,6 +4,7 @@ import os
 import re
 import sys
 import threading
+import time
 import tkinter as tk
 import winsound
 from tkinter import colorchooser, filedialog, font as tkfont, messagebox
@@ -17,9 +18,15 @@ try:
 except ImportError:
     _HAS_DND = False
 
-from pptx_reader import read_slides
-from pptx_writer import embed_audio, _extract_click_groups
-from tts.voicevox import VoicevoxEngine, _NEXT_TAG, _READING_PATTERN, _BRACE_PATTERN
+from audio_encode import AUDIO_FORMATS
+from deck_model import DeckCache, DeckLoadCancelled
+from generation import (
+    GenerationPipeline, GenerationSettings, changed_slides, log_event, open_caches,
+    parse_config_tags,
+)
+from tts.cache import default_cache_dir
+from tts.speakers import SpeakerCatalog
+from tts.voicevox import DEFAULT_SAMPLING_RATE, SynthesisCancelled, VoicevoxEngine
 from version import __version__
 
 ctk.set_appearance_mode("light")
@@ -27,31 +34,245 @@ ctk.set_default_color_theme(
     os.path.join(os.path.dirname(__file__), "theme_modern.json")
 )
 
+# 選択できる出力サンプリングレート (Hz)
+_SAMPLE_RATES = (24000, 16000, 22050, 44100, 48000)
+
+# ログ表示: まとめて反映する間隔 (ms) と、ログ欄に残す行数
+_LOG_FLUSH_MS = 100
+_LOG_MAX_LINES = 2000
+# ログファイルがこれより大きくなったら .1 に退避して新しく始める
+_LOG_FILE_MAX_BYTES = 5 * 1024 ** 2
+
+# スライド選択: 1 行の高さ (px) と、番号による絞り込み ("1-10, 15")
+_SLIDE_ROW_HEIGHT = 26
+_SLIDE_RANGE_PATTERN = re.compile(r"^\s*\d+\s*(-\s*\d*\s*)?(,\s*(\d+\s*(-\s*\d*\s*)?)?)*$")
+# スライド選択の絞り込み条件
+_SLIDE_FILTERS = ("すべて", "ノートあり", "<next> を含む", "前回から変更あり")
+
+
+def _default_log_path() -> str:
+    # キャッシュディレクトリ (…/PPVoice/cache) の隣に置く
+    return os.path.join(os.path.dirname(default_cache_dir()), "logs", "ppvoice.log")
+
 
 class _CancelledError(Exception):
     """生成処理の中断を伝える例外"""
     pass
 
 
-class LogRedirector:
-    """print 出力を CTkTextbox にリダイレクトする。"""
+class LogSink:
+    """ログ欄 (CTkTextbox) への出力をまとめて反映する。sys.stdout の代わりにも使える。
 
-    def __init__(self, textbox: ctk.CTkTextbox):
-        self.textbox = textbox
-
-    def write(self, text):
-        self.textbox.after(0, self._append, text)
+    write() はどのスレッドから呼んでもよく、テキストをバッファに溜めるだけで、
+    Tk への反映は flush_ms ごとに 1 回 (挿入・スクロールも 1 回) にまとめる。
+    ログ欄には最新の max_lines 行だけを残し、全文は log_path のファイルに書く。
+    """
 
-    def _append(self, text):
+    def __init__(self, textbox: ctk.CTkTextbox, flush_ms: int = _LOG_FLUSH_MS,
+                 max_lines: int = _LOG_MAX_LINES, log_path: str | None = None):
+        self.textbox = textbox
+        self.flush_ms = flush_ms
+        self.max_lines = max_lines
+        self.log_path = log_path
+        self._pending: list[str] = []
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self._file = self._open_log_file(log_path) if log_path else None
+
+    @staticmethod
+    def _open_log_file(path: str):
+        """ログファイルを追記モードで開く。開けなければ None (ログ欄への表示は続ける)。"""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > _LOG_FILE_MAX_BYTES:
+                os.replace(path, path + ".1")
+            f = open(path, "a", encoding="utf-8")
+            f.write(f"\n===== PPVoice {__version__} {time.strftime('%Y-%m-%d %H:%M:%S')} =====\n")
+            return f
+        except OSError:
+            return None
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        with self._lock:
+            self._pending.append(text)
+            if self._file is not None:
+                try:
+                    self._file.write(text)
+                except OSError:
+                    self._file = None
+            if not self._scheduled:
+                self._scheduled = True
+                self.textbox.after(self.flush_ms, self._flush_pending)
+
+    def _flush_pending(self) -> None:
+        """溜まったテキストをログ欄に反映する (Tk のスレッド)。"""
+        with self._lock:
+            text = "".join(self._pending)
+            self._pending.clear()
+            self._scheduled = False
+            if self._file is not None:
+                try:
+                    self._file.flush()
+                except OSError:
+                    self._file = None
+        if not text:
+            return
         self.textbox.configure(state="normal")
         self.textbox.insert("end", text)
+        # 古い行を捨てる ("end-1c" の行番号 = 行数)
+        excess = int(self.textbox.index("end-1c").split(".")[0]) - self.max_lines
+        if excess > 0:
+            self.textbox.delete("1.0", f"{excess + 1}.0")
         self.textbox.see("end")
         self.textbox.configure(state="disabled")
 
-    def flush(self):
+    def clear(self) -> None:
+        """ログ欄を空にする (Tk のスレッド。ログファイルはそのまま)。"""
+        with self._lock:
+            self._pending.clear()
+        self.textbox.configure(state="normal")
+        self.textbox.delete("1.0", "end")
+        self.textbox.configure(state="disabled")
+
+    def flush(self) -> None:
+        # print(..., flush=True) 用。反映は定期的に行うのでここでは何もしない
         pass
 
 
+def _parse_slide_range(text: str, total: int) -> set[int] | None:
+    """"1-10, 15, 20-" のような番号の指定をスライド番号 (1始まり) の集合にする。
+
+    番号の指定でなければ None。total を超える番号は無視する。
+    """
+    if not _SLIDE_RANGE_PATTERN.match(text):
+        return None
+    nums = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        first = int(start)
+        last = int(end) if end.strip() else (total if sep else first)  # "5-" は最後まで
+        if end.strip() and first > last:
+            first, last = last, first
+        nums.update(range(max(first, 1), min(last, total) + 1))
+    return nums
+
+
+class SlideList(ctk.CTkFrame):
+    """スライドのチェックリスト。表示中の行だけウィジェットを作る。
+
+    スライドごとに CTkCheckBox を作ると 1000 枚を超えるデッキでは開くまでに数秒かかるため、
+    見えている行数分のチェックボックスだけを作り、スクロールのたびに表示するスライドを差し替える。
+    選択状態はウィジェットではなく selected (スライド番号の集合) に持つ。
+    """
+
+    def __init__(self, master, labels: list[str], selected: set[int], on_change=None,
+                 row_height: int = _SLIDE_ROW_HEIGHT, **kwargs):
+        super().__init__(master, **kwargs)
+        self.labels = labels  # labels[i] はスライド i+1 の表示
+        self.selected = set(selected)
+        self.items: list[int] = list(range(len(labels)))  # 表示するスライドのインデックス (フィルタ後)
+        self.on_change = on_change
+        self.row_height = row_height
+        self._top = 0  # 先頭の行に表示している items の位置
+        self._rows: list[ctk.CTkCheckBox] = []
+
+        self._scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self._scrollbar.pack(side="right", fill="y", padx=(0, 2), pady=2)
+        self._body = ctk.CTkFrame(self, fg_color="transparent")
+        self._body.pack(side="left", fill="both", expand=True, padx=(6, 0), pady=2)
+        self._body.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self._body)
+
+    def _bind_wheel(self, widget) -> None:
+        widget.bind("<MouseWheel>", self._on_wheel)  # Windows / macOS
+        widget.bind("<Button-4>", self._on_wheel)  # X11
+        widget.bind("<Button-5>", self._on_wheel)
+
+    def _on_resize(self, event) -> None:
+        count = max(1, event.height // self.row_height)
+        while len(self._rows) < count:
+            k = len(self._rows)
+            row = ctk.CTkCheckBox(self._body, text="", command=lambda k=k: self._on_toggle(k))
+            self._bind_wheel(row)
+            self._rows.append(row)
+        while len(self._rows) > count:
+            self._rows.pop().destroy()
+        self._render()
+
+    def _render(self) -> None:
+        """見えている行に items[_top:] のスライドを割り当てる。"""
+        count = len(self._rows)
+        self._top = max(0, min(self._top, len(self.items) - count))
+        for k, row in enumerate(self._rows):
+            pos = self._top + k
+            if pos >= len(self.items):
+                row.grid_remove()
+                continue
+            i = self.items[pos]
+            row.configure(text=self.labels[i])
+            if (i + 1) in self.selected:
+                row.select()
+            else:
+                row.deselect()
+            row.grid(row=k, column=0, sticky="w", pady=1)
+        if self.items and count < len(self.items):
+            self._scrollbar.set(self._top / len(self.items), (self._top + count) / len(self.items))
+        else:
+            self._scrollbar.set(0.0, 1.0)
+
+    def _scroll_to(self, top: int) -> None:
+        if top != self._top:
+            self._top = top
+            self._render()
+
+    def _on_scrollbar(self, *args) -> None:
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * len(self.items)))
+        elif args[0] == "scroll":
+            step = len(self._rows) if args[2] == "pages" else 1
+            self._scroll_to(self._top + int(args[1]) * step)
+
+    def _on_wheel(self, event) -> None:
+        if event.num == 4 or event.delta > 0:
+            self._scroll_to(self._top - 3)
+        elif event.num == 5 or event.delta < 0:
+            self._scroll_to(self._top + 3)
+
+    def _on_toggle(self, k: int) -> None:
+        pos = self._top + k
+        if pos >= len(self.items):
+            return
+        num = self.items[pos] + 1
+        if self._rows[k].get():
+            self.selected.add(num)
+        else:
+            self.selected.discard(num)
+        if self.on_change is not None:
+            self.on_change()
+
+    def set_items(self, items: list[int]) -> None:
+        """表示するスライド (インデックスのリスト) を差し替えて先頭に戻る。"""
+        self.items = items
+        self._top = 0
+        self._render()
+
+    def set_checked(self, checked: bool) -> None:
+        """表示中 (フィルタに一致する) のスライドをすべて選択または解除する。"""
+        nums = {i + 1 for i in self.items}
+        if checked:
+            self.selected |= nums
+        else:
+            self.selected -= nums
+        self._render()
+        if self.on_change is not None:
+            self.on_change()
+
+
 if _HAS_DND:
     class _AppBase(ctk.CTk, TkinterDnD.DnDWrapper):
         def __init__(self):
@@ -86,9 +307,21 @@ class App(_AppBase):
         self._pending_speaker: str | None = None
         self._pending_style: str | None = None
         self._test_stop = False
+        # 合成結果・audio_query のキャッシュ (再生成時に変更のない文は合成しない)
+        self._wav_cache, self._query_cache = open_caches()
+        # 解析済みの入力デッキ (ファイル指定・スライド選択・<next> チェック・生成で共有)
+        self._deck_cache = DeckCache()
+        # 入力デッキのバックグラウンド読み込み。別のファイルを指定すると前の読み込みを中断し、
+        # 古い読み込みの結果は (トークンが変わっているので) 画面に反映しない
+        self._deck_load_cancel = threading.Event()
+        self._deck_load_token = 0
+        # 話者一覧のディスクキャッシュ (起動時に前回の一覧をすぐ表示し、取得はバックグラウンド)
+        self._speaker_catalog = SpeakerCatalog()
+        self._speaker_fetch_token = 0
 
         self._build_ui()
         self._setup_dnd()
+        self._load_cached_speakers()
         self.input_var.trace_add("write", lambda *_: self._update_run_btn())
         self._update_run_btn()
 
@@ -177,6 +410,14 @@ class App(_AppBase):
         ctk.CTkEntry(row, textvariable=self.output_var).pack(side="left", fill="x", expand=True, padx=(4, 6))
         ctk.CTkButton(row, text="参照", width=60, command=self._browse_output).pack(side="left")
 
+        # 更新モード (前回の出力から変更のないスライドの音声を再利用)
+        row = ctk.CTkFrame(sec, fg_color="transparent")
+        row.pack(fill="x", padx=14, pady=3)
+        ctk.CTkLabel(row, text="", width=140).pack(side="left")
+        self.update_mode_var = ctk.BooleanVar(value=True)
+        ctk.CTkCheckBox(row, text="変更されたスライドだけ再生成する (出力ファイルが既にある場合)",
+                        variable=self.update_mode_var).pack(side="left", padx=(4, 0))
+
         # スライド範囲
         row = ctk.CTkFrame(sec, fg_color="transparent")
         row.pack(fill="x", padx=14, pady=(3, 12))
@@ -312,7 +553,7 @@ class App(_AppBase):
 
         # 文の区切り・末尾の余白
         row = ctk.CTkFrame(sec, fg_color="transparent")
-        row.pack(fill="x", padx=14, pady=(3, 12))
+        row.pack(fill="x", padx=14, pady=3)
         ctk.CTkLabel(row, text="文の区切り (秒)", width=120, anchor="w").pack(side="left")
         self.pause_var = ctk.DoubleVar(value=0.5)
         ctk.CTkEntry(row, textvariable=self.pause_var, width=50).pack(side="left", padx=(4, 16))
@@ -320,6 +561,38 @@ class App(_AppBase):
         self.end_pause_var = ctk.DoubleVar(value=2.0)
         ctk.CTkEntry(row, textvariable=self.end_pause_var, width=50).pack(side="left", padx=(4, 0))
 
+        # 同時リクエスト数 (スライドをまたいで並列に合成する文の数)
+        row = ctk.CTkFrame(sec, fg_color="transparent")
+        row.pack(fill="x", padx=14, pady=3)
+        ctk.CTkLabel(row, text="並列数", width=120, anchor="w").pack(side="left")
+        self.parallel_var = ctk.IntVar(value=4)
+        ctk.CTkEntry(row, textvariable=self.parallel_var, width=50).pack(side="left", padx=(4, 0))
+        ctk.CTkLabel(row, text="(同時に合成する文の数)", font=ctk.CTkFont(size=11),
+                     text_color="gray50").pack(side="left", padx=(8, 0))
+
+        # 埋め込む音声の形式 (mp3/m4a は ffmpeg が必要)
+        row = ctk.CTkFrame(sec, fg_color="transparent")
+        row.pack(fill="x", padx=14, pady=3)
+        ctk.CTkLabel(row, text="音声形式", width=120, anchor="w").pack(side="left")
+        self.audio_format_var = ctk.StringVar(value="wav")
+        ctk.CTkComboBox(row, values=["wav", "mp3", "m4a", "mulaw"],
+                        variable=self.audio_format_var,
+                        state="readonly", width=100).pack(side="left", padx=(4, 0))
+        ctk.CTkLabel(row, text="(mp3/m4a は ffmpeg が必要。なければ mulaw で圧縮)",
+                     font=ctk.CTkFont(size=11), text_color="gray50").pack(side="left", padx=(8, 0))
+
+        # 出力のサンプリングレート・チャンネル (読み上げなら 16000Hz で十分)
+        row = ctk.CTkFrame(sec, fg_color="transparent")
+        row.pack(fill="x", padx=14, pady=(3, 12))
+        ctk.CTkLabel(row, text="サンプリングレート", width=120, anchor="w").pack(side="left")
+        self.sample_rate_var = ctk.StringVar(value=str(DEFAULT_SAMPLING_RATE))
+        ctk.CTkComboBox(row, values=[str(r) for r in _SAMPLE_RATES],
+                        variable=self.sample_rate_var,
+                        state="readonly", width=100).pack(side="left", padx=(4, 4))
+        ctk.CTkLabel(row, text="Hz", anchor="w").pack(side="left", padx=(0, 16))
+        self.stereo_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(row, text="ステレオ", variable=self.stereo_var).pack(side="left")
+
 
     # --- 字幕設定 ---
     def _build_subtitle_section(self, parent):
@@ -532,6 +805,8 @@ class App(_AppBase):
 
         self.log_box = ctk.CTkTextbox(sec, state="disabled", font=ctk.CTkFont(size=12))
         self.log_box.pack(fill="both", expand=True, padx=14, pady=(0, 14))
+        # print やログの出力先 (まとめて反映し、全文はファイルにも残す)
+        self._log_sink = LogSink(self.log_box, log_path=_default_log_path())
 
     # ------------------------------------------------------------------
     # コールバック
@@ -543,22 +818,71 @@ class App(_AppBase):
             self._set_input_file(path)
 
     def _set_input_file(self, path: str):
-        """入力ファイルを設定し、<config> タグを自動読み込みする。"""
+        """入力ファイルを設定し、デッキの読み込みと <config> タグの反映をバックグラウンドで行う。"""
         self.input_var.set(path)
         if not self.output_var.get():
             base = os.path.splitext(path)[0]
             self.output_var.set(base + "_speech.pptx")
-        # <config> タグの自動読み込み
-        try:
-            slides = read_slides(path)
-            notes = [s.notes_text for s in slides if s.notes_text]
-            config = self._parse_config_tags(notes)
-            if config:
-                self._apply_config(config)
-                details = "\n".join(f"  {k}={v}" for k, v in config.items())
-                self._log(f"設定タグを読み込みました:\n{details}\n")
-        except Exception:
-            pass
+        # 前のファイルの読み込みを中断する
+        self._deck_load_cancel.set()
+        self._deck_load_cancel = threading.Event()
+        self._deck_load_token += 1
+        token = self._deck_load_token
+        if not self._running:
+            self.progress.set(0)
+            self.progress.pack(fill="x", padx=14, pady=(0, 8), before=self.log_box)
+
+        def on_progress(done, total):
+            # 読み込み用スレッドから呼ばれる。Tk への通知は 2% ごとに間引く
+            if done == total or done % max(1, total // 50) == 0:
+                self.after(0, self._on_deck_progress, token, done / total)
+
+        self._with_deck(path, self._on_deck_loaded, "ファイル読み込み失敗", on_progress)
+
+    def _with_deck(self, path: str, on_loaded, error_message: str, on_progress=None):
+        """デッキをバックグラウンドで読み込み (キャッシュ済みならすぐ)、Tk のスレッドで on_loaded(deck) を呼ぶ。
+
+        読み込み中に別の入力ファイルが指定された場合は on_loaded を呼ばない。
+        """
+        token = self._deck_load_token
+        cancel = self._deck_load_cancel
+
+        def worker():
+            try:
+                deck = self._deck_cache.get(path, cancel_event=cancel, on_progress=on_progress)
+            except DeckLoadCancelled:
+                return
+            except Exception as e:
+                self.after(0, self._on_deck_failed, token, f"{error_message}: {e}")
+                return
+            self.after(0, lambda: on_loaded(deck) if token == self._deck_load_token else None)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_deck_progress(self, token: int, fraction: float):
+        if token == self._deck_load_token and not self._running:
+            self.progress.set(fraction)
+
+    def _hide_deck_progress(self):
+        if not self._running:
+            self.progress.pack_forget()
+
+    def _on_deck_failed(self, token: int, message: str):
+        if token != self._deck_load_token:
+            return
+        self._hide_deck_progress()
+        self._log(message + "\n")
+
+    def _on_deck_loaded(self, deck):
+        """入力デッキの読み込み完了 (Tk のスレッド)。<config> タグを反映する。"""
+        self._hide_deck_progress()
+        notes_count = sum(1 for s in deck.slides if s.notes_text)
+        self._log(f"{os.path.basename(deck.path)}: {len(deck.slides)} スライド (ノートあり {notes_count})\n")
+        config = deck.config
+        if config:
+            self._apply_config(config)
+            details = "\n".join(f"  {k}={v}" for k, v in config.items())
+            self._log(f"設定タグを読み込みました:\n{details}\n")
 
     def _on_slide_range_changed(self):
         if self.slide_range_var.get() == "select":
@@ -574,11 +898,10 @@ class App(_AppBase):
         if not input_path or not os.path.exists(input_path):
             self._log("スライド選択にはまず入力ファイルを指定してください。\n")
             return
-        try:
-            slides = read_slides(input_path)
-        except Exception as e:
-            self._log(f"ファイル読み込み失敗: {e}\n")
-            return
+        self._with_deck(input_path, self._show_slide_selector, "ファイル読み込み失敗")
+
+    def _show_slide_selector(self, deck):
+        slides = deck.slides
         total = len(slides)
         if total == 0:
             self._log("スライドが見つかりませんでした。\n")
@@ -587,7 +910,7 @@ class App(_AppBase):
         # ポップアップウィンドウ
         dialog = ctk.CTkToplevel(self)
         dialog.title("スライド選択")
-        dialog.geometry("360x420")
+        dialog.geometry("400x480")
         dialog.resizable(False, True)
         dialog.grab_set()
 
@@ -596,42 +919,91 @@ class App(_AppBase):
             font=ctk.CTkFont(size=14, weight="bold"),
         ).pack(padx=10, pady=(10, 4))
 
-        # 全選択/全解除ボタン
+        # 絞り込み: 番号 ("1-10, 15") またはノートの語句と、条件
+        filter_row = ctk.CTkFrame(dialog, fg_color="transparent")
+        filter_row.pack(fill="x", padx=10, pady=(0, 4))
+        query_var = ctk.StringVar()
+        ctk.CTkEntry(
+            filter_row, textvariable=query_var, placeholder_text="番号 (1-10, 15) / ノートの語句",
+        ).pack(side="left", fill="x", expand=True, padx=(0, 4))
+        filter_var = ctk.StringVar(value=_SLIDE_FILTERS[0])
+        ctk.CTkOptionMenu(
+            filter_row, variable=filter_var, values=list(_SLIDE_FILTERS), width=140,
+            command=lambda _: apply_filter(),
+        ).pack(side="left")
+
+        # 全選択/全解除ボタン (絞り込み中は表示中のスライドだけ)
         btn_row = ctk.CTkFrame(dialog, fg_color="transparent")
         btn_row.pack(fill="x", padx=10, pady=(0, 4))
+        ctk.CTkButton(btn_row, text="全選択", width=70,
+                      command=lambda: slide_list.set_checked(True)).pack(side="left", padx=(0, 4))
+        ctk.CTkButton(btn_row, text="全解除", width=70,
+                      command=lambda: slide_list.set_checked(False)).pack(side="left")
+        count_label = ctk.CTkLabel(btn_row, text="", anchor="e")
+        count_label.pack(side="right")
 
-        check_vars: list[ctk.BooleanVar] = []
-
-        def select_all():
-            for v in check_vars:
-                v.set(True)
-
-        def deselect_all():
-            for v in check_vars:
-                v.set(False)
-
-        ctk.CTkButton(btn_row, text="全選択", width=70, command=select_all).pack(side="left", padx=(0, 4))
-        ctk.CTkButton(btn_row, text="全解除", width=70, command=deselect_all).pack(side="left")
+        labels = []
+        for sl in slides:
+            preview = (sl.notes_text or "").replace("\n", " ").replace("\v", " ")[:30]
+            labels.append(f"スライド {sl.index + 1} - {preview}" if preview else f"スライド {sl.index + 1}")
+        notes_lower = [(sl.notes_text or "").lower() for sl in slides]
+        changed: set[int] | None = None  # 「前回から変更あり」を初めて選んだときに求める
 
-        # チェックボックスリスト
-        scroll = ctk.CTkScrollableFrame(dialog)
-        scroll.pack(fill="both", expand=True, padx=10, pady=(0, 6))
+        def update_count():
+            count_label.configure(
+                text=f"選択 {len(slide_list.selected)} / 表示 {len(slide_list.items)}"
+            )
 
         prev = self._selected_slides
-        for i in range(total):
-            num = i + 1
-            var = ctk.BooleanVar(value=(prev is None or num in prev))
-            check_vars.append(var)
-            notes = slides[i].notes_text or ""
-            preview = notes.replace("\n", " ")[:30]
-            label = f"スライド {num}"
-            if preview:
-                label += f" - {preview}"
-            ctk.CTkCheckBox(scroll, text=label, variable=var).pack(anchor="w", pady=1)
+        slide_list = SlideList(
+            dialog, labels, set(range(1, total + 1)) if prev is None else prev,
+            on_change=update_count,
+        )
+        slide_list.pack(fill="both", expand=True, padx=10, pady=(0, 6))
+
+        def changed_indices() -> set[int]:
+            nonlocal changed
+            if changed is None:
+                output_path = self.output_var.get().strip()
+                if not output_path:
+                    output_path = os.path.splitext(deck.path)[0] + "_speech.pptx"
+                try:
+                    settings = self._collect_settings()
+                except (tk.TclError, ValueError) as e:
+                    self._log(f"設定値が不正なため変更を判定できません: {e}\n")
+                    return set()
+                changed = changed_slides(slides, output_path, settings)
+                if not os.path.exists(output_path):
+                    self._log("前回の出力がないため、ノートのあるスライドをすべて変更ありとします。\n")
+            return changed
+
+        def apply_filter():
+            mode = filter_var.get()
+            items = range(total)
+            if mode == "ノートあり":
+                items = [i for i in items if slides[i].notes_text]
+            elif mode == "<next> を含む":
+                items = [i for i in items if slides[i].next_tags]
+            elif mode == "前回から変更あり":
+                indices = changed_indices()
+                items = [i for i in items if i in indices]
+            query = query_var.get().strip()
+            if query:
+                nums = _parse_slide_range(query, total)
+                if nums is not None:
+                    items = [i for i in items if (i + 1) in nums]
+                else:
+                    query = query.lower()
+                    items = [i for i in items if query in notes_lower[i]]
+            slide_list.set_items(list(items))
+            update_count()
+
+        query_var.trace_add("write", lambda *_: apply_filter())
+        update_count()
 
         # OKボタン
         def on_ok():
-            selected = {i + 1 for i, v in enumerate(check_vars) if v.get()}
+            selected = set(slide_list.selected)
             if not selected:
                 messagebox.showwarning("選択なし", "少なくとも1枚選択してください。", parent=dialog)
                 return
@@ -671,15 +1043,63 @@ class App(_AppBase):
             self.output_var.set(path)
 
     def _fetch_speakers(self):
+        """「話者取得」ボタン: 保存済みの一覧を使わずにエンジンから取得し直す。"""
         self._log_clear()
-        url = self.url_var.get().strip().rstrip("/")
+        self._log("話者一覧を取得しています...\n")
+        self._refresh_speakers(force=True)
+
+    def _load_cached_speakers(self):
+        """起動時: 前回取得した話者一覧をすぐに表示し、バックグラウンドで更新を確認する。"""
+        url = self.url_var.get().strip()
         try:
-            engine = VoicevoxEngine(base_url=url)
-            speakers = engine.list_speakers()
-        except Exception as e:
-            self._log(f"話者取得失敗: {e}\nVOICEVOXエンジンが起動しているか確認してください。\n")
+            cached = self._speaker_catalog.cached(url)
+        except ValueError:  # URL が空
             return
+        if cached is not None and self._show_speakers(cached.speakers):
+            self._log(f"前回取得した {len(cached.speakers)} 話者を表示しています。\n")
+        self._refresh_speakers(force=False)
+
+    def _refresh_speakers(self, force: bool):
+        """話者一覧をバックグラウンドで取得する (/version が同じで TTL 内なら保存済みの一覧を使う)。"""
+        url = self.url_var.get().strip()
+        self._speaker_fetch_token += 1
+        token = self._speaker_fetch_token
+
+        def worker():
+            try:
+                entry = self._speaker_catalog.fetch(url, force=force)
+            except Exception as e:
+                self.after(0, self._on_speakers_failed, token, e)
+                return
+            self.after(0, self._on_speakers_fetched, token, entry, force)
 
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_speakers_failed(self, token: int, error: Exception):
+        if token != self._speaker_fetch_token:
+            return
+        if self._speakers_cache:
+            self._log(f"話者一覧を更新できませんでした ({error})。前回の一覧を使います。\n")
+        else:
+            self._log(f"話者取得失敗: {error}\nVOICEVOXエンジンが起動しているか確認してください。\n")
+
+    def _on_speakers_fetched(self, token: int, entry, force: bool):
+        if token != self._speaker_fetch_token:
+            return  # 後から別の取得を始めた
+        if not force and entry.speakers == self._speakers_cache:
+            return  # 表示中の一覧から変わっていない
+        total_styles = self._show_speakers(entry.speakers)
+        if total_styles:
+            self._log(f"{len(entry.speakers)} 話者 ({total_styles} スタイル) を取得しました。\n")
+
+    def _show_speakers(self, speakers: list[dict]) -> int:
+        """話者一覧をメニューに反映し、スタイル数を返す (Tk のスレッド)。
+
+        一覧の更新で選択が変わらないよう、表示中の話者・スタイルを同じ名前で選び直す。
+        """
+        if self._styles_by_speaker and not self._pending_speaker:
+            self._pending_speaker = self.speaker_menu.get().rsplit(" (", 1)[0]
+            self._pending_style = self.style_speaker_menu.get().rsplit(" (ID=", 1)[0]
         self._speakers_cache = speakers
         self._speaker_map.clear()
         # 話者名 → [(スタイルラベル, ID), ...] のマッピング
@@ -701,12 +1121,12 @@ class App(_AppBase):
             self.speaker_menu.configure(values=speaker_names)
             self.speaker_menu.set(speaker_names[0])
             self._on_speaker_changed(speaker_names[0])
-            self._log(f"{len(speakers)} 話者 ({total_styles} スタイル) を取得しました。\n")
             # pending speaker の適用
             self._apply_pending_speaker()
         else:
             self._log("話者が見つかりませんでした。\n")
         self._update_run_btn()
+        return total_styles
 
     def _on_speaker_changed(self, speaker_name: str):
         # "話者名 (N)" → "話者名" に変換
@@ -734,24 +1154,14 @@ class App(_AppBase):
         if not path or not os.path.isfile(path):
             self._log("入力ファイルが指定されていません。\n")
             return
-        try:
-            slides = read_slides(path)
-        except Exception as e:
-            self._log(f"PPTXの読み込みに失敗: {e}\n")
-            return
+        # 集計は読み込み時に済んでいる (デッキの読み込みはバックグラウンド)
+        self._with_deck(path, self._log_next_check, "PPTXの読み込みに失敗")
 
+    def _log_next_check(self, deck):
         self._log("--- <next> / アニメーション チェック ---\n")
-        for si in slides:
-            sld = si.slide._element
-            click_groups, _ = _extract_click_groups(sld)
-            n_clicks = len(click_groups)
-            if si.notes_text:
-                # {…} 内の <next> はエスケープ済みなので除外してカウント
-                _stripped = _READING_PATTERN.sub("", si.notes_text)
-                _stripped = _BRACE_PATTERN.sub("", _stripped)
-                n_next = len(_NEXT_TAG.findall(_stripped))
-            else:
-                n_next = 0
+        for si in deck.slides:
+            n_clicks = si.click_groups
+            n_next = si.next_tags
             status = ""
             if n_next > n_clicks and n_clicks > 0:
                 status = " ← <next> が多い (余分は無視)"
@@ -803,7 +1213,10 @@ class App(_AppBase):
         try:
             engine = VoicevoxEngine(speaker_id=speaker_id, base_url=url,
                                     speed_scale=speed, pitch_scale=pitch,
-                                    intonation_scale=intonation, volume_scale=volume)
+                                    intonation_scale=intonation, volume_scale=volume,
+                                    wav_cache=self._wav_cache, query_cache=self._query_cache,
+                                    output_sampling_rate=int(self.sample_rate_var.get()),
+                                    output_stereo=self.stereo_var.get())
             wav, timings, _ = engine.synthesize_with_timings(text)
             self.after(0, lambda: self.test_play_btn.configure(text="■ 停止", state="normal"))
 
@@ -853,19 +1266,9 @@ class App(_AppBase):
     # <config> タグ
     # ------------------------------------------------------------------
 
-    _CONFIG_RE = re.compile(r"<config\s([^>]*)>", re.IGNORECASE)
-    _KV_RE = re.compile(r'([\w]+)=(?:"([^"]*)"|(\S+))')
-
     def _parse_config_tags(self, notes_list: list[str]) -> dict:
         """複数のノートテキストから <config ...> タグを解析し設定 dict を返す。"""
-        config: dict[str, str] = {}
-        for notes in notes_list:
-            for m in self._CONFIG_RE.finditer(notes):
-                for kv in self._KV_RE.finditer(m.group(1)):
-                    key = kv.group(1)
-                    val = kv.group(2) if kv.group(2) is not None else kv.group(3)
-                    config[key] = val
-        return config
+        return parse_config_tags(notes_list)
 
     def _apply_config(self, config: dict):
         """解析済み config dict を GUI ウィジェットに適用する。"""
@@ -891,6 +1294,14 @@ class App(_AppBase):
             self.volume_var.set(float(config["volume"]))
         if "end_pause" in config:
             self.end_pause_var.set(float(config["end_pause"]))
+        if "parallel" in config:
+            self.parallel_var.set(int(config["parallel"]))
+        if config.get("audio_format", "").lower() in AUDIO_FORMATS:
+            self.audio_format_var.set(config["audio_format"].lower())
+        if "sample_rate" in config:
+            self.sample_rate_var.set(str(int(config["sample_rate"])))
+        if "stereo" in config:
+            self.stereo_var.set(config["stereo"].lower() in ("on", "true", "1"))
         if "auto_next" in config:
             self.auto_next_var.set(float(config["auto_next"]))
         if "auto_next_enabled" in config:
@@ -997,6 +1408,10 @@ class App(_AppBase):
         _add("intonation", f"{self.intonation_var.get():.1f}")
         _add("volume", f"{self.volume_var.get():.1f}")
         _add("end_pause", f"{self.end_pause_var.get():.1f}")
+        _add("parallel", self.parallel_var.get())
+        _add("audio_format", self.audio_format_var.get())
+        _add("sample_rate", self.sample_rate_var.get())
+        _add("stereo", "on" if self.stereo_var.get() else "off")
         _add("auto_next", f"{self.auto_next_var.get():.1f}")
         _add("auto_next_enabled", "on" if self.auto_next_enabled_var.get() else "off")
 
@@ -1134,15 +1549,10 @@ class App(_AppBase):
             btn.configure(text_color=text_col)
 
     def _log(self, text: str):
-        self.log_box.configure(state="normal")
-        self.log_box.insert("end", text)
-        self.log_box.see("end")
-        self.log_box.configure(state="disabled")
+        self._log_sink.write(text)
 
     def _log_clear(self):
-        self.log_box.configure(state="normal")
-        self.log_box.delete("1.0", "end")
-        self.log_box.configure(state="disabled")
+        self._log_sink.clear()
 
     # ------------------------------------------------------------------
     # 生成処理
@@ -1201,7 +1611,7 @@ class App(_AppBase):
 
     def _run_generate(self):
         old_stdout = sys.stdout
-        sys.stdout = LogRedirector(self.log_box)
+        sys.stdout = self._log_sink
         try:
             self._do_generate()
         except _CancelledError:
@@ -1223,6 +1633,49 @@ class App(_AppBase):
         )
         self._update_run_btn()
 
+    def _collect_settings(self) -> GenerationSettings:
+        """GUI の設定値を GenerationSettings にまとめる。"""
+        # 話者ID
+        style_label = self.style_speaker_menu.get()
+        _font_sel = self.subtitle_font_var.get().strip()
+        return GenerationSettings(
+            url=self.url_var.get().strip(),
+            speaker_id=self._speaker_map.get(style_label, 1),
+            pause=self.pause_var.get(),
+            speed=self.speed_var.get(),
+            pitch=self.pitch_var.get(),
+            intonation=self.intonation_var.get(),
+            volume=self.volume_var.get(),
+            end_pause=self.end_pause_var.get(),
+            parallel=self.parallel_var.get(),
+            audio_format=self.audio_format_var.get(),
+            sample_rate=int(self.sample_rate_var.get()),
+            stereo=self.stereo_var.get(),
+            auto_next=self.auto_next_var.get(),
+            auto_next_enabled=self.auto_next_enabled_var.get(),
+            subtitle=self.subtitle_var.get(),
+            subtitle_style=self.style_var.get(),
+            fontsize=self.fontsize_var.get(),
+            font="" if _font_sel == self._font_default_label else _font_sel,
+            bottom=self.bottom_var.get(),
+            font_color=self.font_color_var.get().lstrip("#"),
+            outline=self.use_outline_var.get(),
+            outline_color=self.outline_color_var.get().lstrip("#"),
+            outline_width=self.outline_width_var.get(),
+            glow=self.use_glow_var.get(),
+            glow_color=self.glow_color_var.get().lstrip("#"),
+            glow_size=self.glow_size_var.get(),
+            bg_color=self.bg_color_var.get().lstrip("#"),
+            bg_alpha=self.bg_alpha_var.get(),
+            kuten=self.kuten_mode_var.get(),
+            touten=self.touten_mode_var.get(),
+            bold=self.default_bold_var.get(),
+            italic=self.default_italic_var.get(),
+            underline=self.default_underline_var.get(),
+            update_mode=self.update_mode_var.get(),
+            selected_slides=self._selected_slides,
+        )
+
     def _do_generate(self):
         input_path = self.input_var.get().strip()
         base_name = os.path.splitext(input_path)[0]
@@ -1231,129 +1684,22 @@ class App(_AppBase):
         if not output_path:
             output_path = base_name + "_speech.pptx"
 
-        # 話者ID
-        style_label = self.style_speaker_menu.get()
-        speaker_id = self._speaker_map.get(style_label, 1)
+        def on_event(event):
+            log_event(event)
+            self.after(0, self.progress.set, event.progress)
 
-        url = self.url_var.get().strip()
-        pause_sec = self.pause_var.get()
-        speed_scale = self.speed_var.get()
-        pitch_scale = self.pitch_var.get()
-        intonation_scale = self.intonation_var.get()
-        volume_scale = self.volume_var.get()
-        end_pause_sec = self.end_pause_var.get()
-        use_subtitle = self.subtitle_var.get()
-        sub_style = self.style_var.get()
-        sub_size = self.fontsize_var.get()
-        sub_bottom = self.bottom_var.get()
-        _font_sel = self.subtitle_font_var.get().strip()
-        sub_font_name = "" if _font_sel == self._font_default_label else _font_sel
-        sub_font_color = self.font_color_var.get().lstrip("#")
-        sub_use_outline = self.use_outline_var.get()
-        sub_outline_color = self.outline_color_var.get().lstrip("#")
-        sub_outline_width = self.outline_width_var.get()
-        sub_use_glow = self.use_glow_var.get()
-        sub_glow_color = self.glow_color_var.get().lstrip("#")
-        sub_glow_size = self.glow_size_var.get()
-        sub_bg_color = self.bg_color_var.get().lstrip("#")
-        sub_bg_alpha = self.bg_alpha_var.get()
-        sub_kuten_mode = self.kuten_mode_var.get()
-        sub_touten_mode = self.touten_mode_var.get()
-        sub_default_bold = self.default_bold_var.get()
-        sub_default_italic = self.default_italic_var.get()
-        sub_default_underline = self.default_underline_var.get()
-
-        # スライド読み込み
-        print(f"PPTXを読み込んでいます: {input_path}")
-        slides = read_slides(input_path)
-        total_slides = len(slides)
-        print(f"  {total_slides} スライドを検出")
-
-        # スライドフィルタ
-        selected = self._selected_slides
-        if selected is not None:
-            slides = [s for s in slides if (s.index + 1) in selected]
-            print(f"  {len(slides)} スライドを選択中")
-
-        notes_count = sum(1 for s in slides if s.notes_text)
-        if notes_count == 0:
-            print("ノートが含まれるスライドがありません。終了します。")
+        pipeline = GenerationPipeline(self._collect_settings(), self._wav_cache, self._query_cache,
+                                      self._deck_cache, generator=f"PPVoice {__version__}")
+        try:
+            result = pipeline.run(input_path, output_path, on_event=on_event,
+                                  cancel_event=self._cancel_event)
+        except SynthesisCancelled:
+            raise _CancelledError()
+        if not result.output_path:
             return
-        print(f"  {notes_count} スライドにノートあり")
-
-        # 音声合成
-        need_timings = use_subtitle
-        auto_next_sec = self.auto_next_var.get()
-        print(f"\n音声を合成しています (speaker={speaker_id}, pause={pause_sec}s)...")
-        engine = VoicevoxEngine(speaker_id=speaker_id, base_url=url, pause_sec=pause_sec,
-                                speed_scale=speed_scale, pitch_scale=pitch_scale,
-                                intonation_scale=intonation_scale, volume_scale=volume_scale)
-
-        slide_audio = []
-        slide_timings = {}
-        slide_next_positions = {}
-        processed = 0
-
-        for info in slides:
-            if self._cancel_event.is_set():
-                raise _CancelledError()
-
-            slide_num = info.index + 1
-            if not info.notes_text:
-                print(f"  [{slide_num}/{total_slides}] スライド {slide_num}: (ノートなし - スキップ)")
-                slide_audio.append((info.index, b""))
-            else:
-                print(f"  [{slide_num}/{total_slides}] スライド {slide_num}:")
-
-                def on_chunk(i, total, text, _sn=slide_num):
-                    if self._cancel_event.is_set():
-                        raise _CancelledError()
-                    print(f"    ({i + 1}/{total}) {text}")
-
-                if need_timings:
-                    wav, timings, next_pos = engine.synthesize_with_timings(info.notes_text, on_chunk=on_chunk)
-                    slide_timings[info.index] = timings
-                    if next_pos:
-                        slide_next_positions[info.index] = next_pos
-                else:
-                    wav = engine.synthesize(info.notes_text, on_chunk=on_chunk)
-                slide_audio.append((info.index, wav))
-
-            processed += 1
-            self.after(0, self.progress.set, processed / total_slides)
-
-        # PPTX出力
-        print(f"\n音声付きPPTXを生成しています...")
-        embed_audio(
-            input_path,
-            slide_audio,
-            output_path,
-            end_pause_ms=int(end_pause_sec * 1000),
-            slide_timings=slide_timings if need_timings else None,
-            subtitle_font_size=sub_size,
-            subtitle_font_name=sub_font_name,
-            subtitle_bottom_pct=sub_bottom,
-            subtitle_style=sub_style,
-            subtitle_font_color=sub_font_color,
-            subtitle_use_outline=sub_use_outline,
-            subtitle_outline_color=sub_outline_color,
-            subtitle_outline_width=sub_outline_width,
-            subtitle_use_glow=sub_use_glow,
-            subtitle_glow_color=sub_glow_color,
-            subtitle_glow_size=sub_glow_size,
-            subtitle_bg_color=sub_bg_color,
-            subtitle_bg_alpha=sub_bg_alpha,
-            subtitle_kuten_mode=sub_kuten_mode,
-            subtitle_touten_mode=sub_touten_mode,
-            subtitle_default_bold=sub_default_bold,
-            subtitle_default_italic=sub_default_italic,
-            subtitle_default_underline=sub_default_underline,
-            slide_next_positions=slide_next_positions if slide_next_positions else None,
-            auto_next_interval_ms=int(auto_next_sec * 1000) if self.auto_next_enabled_var.get() else -1,
-        )
-
-        self.after(0, self.progress.set, 1.0)
-        print(f"\n完了! → {os.path.basename(output_path)}")
+        if result.trace is not None and result.trace.spans:
+            print("\n処理時間の内訳:\n" + result.trace.summary())
+        print(f"\n完了! → {os.path.basename(result.output_path)}")
         print("\n--- 動画 (MP4) にするには ---")
         print("1. 生成されたPPTXをPowerPointで開く")
         print("2. ファイル → エクスポート → ビデオの作成")
@@ -0,0 +1,119 @@
+"""生成済み PPTX に埋め込むマニフェスト (差分再生成用)
+
+embed_audio は出力 PPTX に /ppvoice/manifest.json を追加し、スライドごとに
+合成条件のハッシュ・音声パート名・再生時間・字幕タイミングを記録する。
+次回の生成 (更新モード) ではハッシュが一致するスライドの音声を
+前回の出力から取り出して再利用し、変更されたスライドだけを合成する。
+"""
+
+import json
+import zipfile
+from dataclasses import asdict, dataclass, field
+
+from audio_encode import EncodedAudio
+from tts.cache import make_key
+
+MANIFEST_PARTNAME = "/ppvoice/manifest.json"
+MANIFEST_CONTENT_TYPE = "application/json"
+# パッケージ (_rels/.rels) から参照する独自のリレーションシップタイプ
+RT_MANIFEST = "urn:ppvoice:relationships:manifest"
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class SlideEntry:
+    """マニフェストに記録する 1 スライド分の情報。"""
+    hash: str
+    media: str  # 音声パート名 (/ppt/media/audioN.ext)
+    content_type: str
+    duration_ms: int
+    timings: list[tuple[str, int, int]] = field(default_factory=list)
+    next_positions: list[tuple[int, float]] = field(default_factory=list)
+    # 実際に埋め込んだ音声の形式 (エンコードに失敗して WAV にした場合は "wav")。古いマニフェストでは空
+    format: str = ""
+
+    def matches(self, slide_hash: str, audio_format: str | None = None) -> bool:
+        """ハッシュが一致し、実際に埋め込んだ形式が audio_format (指定時) と同じか。"""
+        if self.hash != slide_hash:
+            return False
+        return audio_format is None or not self.format or self.format == audio_format
+
+
+@dataclass
+class ReusedSlide:
+    """前回の出力から取り出した、そのまま埋め込めるスライドの音声。"""
+    audio: EncodedAudio
+    entry: SlideEntry
+
+
+def slide_hash(notes_text: str, settings: dict) -> str:
+    """ノートテキストと合成条件 (話者・音声パラメータ・字幕設定など) のハッシュ。"""
+    return make_key("slide", MANIFEST_VERSION, notes_text, settings)
+
+
+def dumps_manifest(entries: dict[int, SlideEntry], generator: str = "") -> bytes:
+    """マニフェストを JSON バイト列にする。キーはスライドインデックス (0始まり)。"""
+    data = {
+        "version": MANIFEST_VERSION,
+        "generator": generator,
+        "slides": {str(idx): asdict(e) for idx, e in sorted(entries.items())},
+    }
+    return json.dumps(data, ensure_ascii=False, indent=1).encode("utf-8")
+
+
+def read_manifest(pptx_path: str) -> dict[int, SlideEntry]:
+    """PPTX からマニフェストを読む。なければ (または読めなければ) 空の dict。"""
+    try:
+        with zipfile.ZipFile(pptx_path) as zf:
+            data = json.loads(zf.read(MANIFEST_PARTNAME.lstrip("/")))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    entries = {}
+    for idx, e in data.get("slides", {}).items():
+        try:
+            entries[int(idx)] = SlideEntry(
+                hash=e["hash"],
+                media=e["media"],
+                content_type=e["content_type"],
+                duration_ms=int(e["duration_ms"]),
+                timings=[tuple(t) for t in e.get("timings", [])],
+                next_positions=[tuple(p) for p in e.get("next_positions", [])],
+                format=e.get("format", ""),
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+    return entries
+
+
+def load_reusable(pptx_path: str, hashes: dict[int, str],
+                  audio_format: str | None = None) -> dict[int, ReusedSlide]:
+    """前回の出力のうちハッシュが一致するスライドの音声を取り出す。
+
+    Args:
+        pptx_path: 前回の出力 PPTX
+        hashes: {スライドインデックス: 今回のハッシュ}
+        audio_format: 今回埋め込む形式 (resolve_format 済み)。前回エンコードに失敗して
+            別の形式で埋め込んだスライドは再利用しない
+    """
+    entries = read_manifest(pptx_path)
+    reused = {}
+    if not entries:
+        return reused
+    try:
+        with zipfile.ZipFile(pptx_path) as zf:
+            for idx, h in hashes.items():
+                entry = entries.get(idx)
+                if entry is None or not entry.matches(h, audio_format):
+                    continue
+                try:
+                    data = zf.read(entry.media.lstrip("/"))
+                except KeyError:
+                    continue
+                ext = entry.media.rsplit(".", 1)[-1]
+                reused[idx] = ReusedSlide(EncodedAudio(data, ext, entry.content_type, entry.format or ext),
+                                          entry)
+    except (OSError, zipfile.BadZipFile):
+        return {}
+    return reused
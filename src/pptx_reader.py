@@ -1,8 +1,39 @@
-"""PPTXファイルからスライド情報とノートテキストを抽出する"""
+"""PPTXファイルからスライド情報とノートテキストを抽出する
 
+read_slides() は python-pptx の Presentation を作る (スライドのシェイプなども使える)。
+ノートのテキストだけが必要な場合は read_notes() を使う。ZIP から presentation.xml・
+リレーションシップ・ノートの XML だけを読むので、大きなデッキでも数ミリ秒〜数十ミリ秒で済む。
+"""
+
+import posixpath
+import zipfile
 from dataclasses import dataclass
+
+from lxml import etree
 from pptx import Presentation
 
+_NS_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+_NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+_NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG_RELS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_RT_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+_RT_NOTES_SLIDE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide"
+
+_SLD_ID = f"{{{_NS_P}}}sldId"
+_SLD_ID_LST = f"{{{_NS_P}}}sldIdLst"
+_SP = f"{{{_NS_P}}}sp"
+_SP_TREE = f"{{{_NS_P}}}spTree"
+_PH = f"{{{_NS_P}}}ph"
+_NV_SP_PR = f"{{{_NS_P}}}nvSpPr"
+_NV_PR = f"{{{_NS_P}}}nvPr"
+_TX_BODY = f"{{{_NS_P}}}txBody"
+_A_P = f"{{{_NS_A}}}p"
+_A_R = f"{{{_NS_A}}}r"
+_A_FLD = f"{{{_NS_A}}}fld"
+_A_BR = f"{{{_NS_A}}}br"
+_A_T = f"{{{_NS_A}}}t"
+_R_ID = f"{{{_NS_R}}}id"
+
 
 @dataclass
 class SlideInfo:
@@ -11,6 +42,14 @@ class SlideInfo:
     slide: object  # pptx.slide.Slide
 
 
+@dataclass
+class SlideNotes:
+    """read_notes() の結果 (python-pptx のオブジェクトを持たない軽量版)。"""
+    index: int  # 0-based
+    notes_text: str
+    partname: str  # スライドの ZIP 内のパス (例: "ppt/slides/slide1.xml")
+
+
 def read_slides(pptx_path: str) -> list[SlideInfo]:
     """PPTXファイルを読み込み、各スライドのノートテキストを抽出する。
 
@@ -26,3 +65,107 @@ def read_slides(pptx_path: str) -> list[SlideInfo]:
             notes_text = notes_slide.notes_text_frame.text.strip()
         slides.append(SlideInfo(index=i, notes_text=notes_text, slide=slide))
     return slides
+
+
+def read_notes(pptx_path: str) -> list[SlideNotes]:
+    """各スライドのノートテキストを、Presentation を作らずに抽出する。
+
+    テキストは read_slides() と同じ (ノートのプレースホルダーの TextFrame.text を strip したもの。
+    段落は "\\n"、段落内の改行は "\\v" になる)。
+
+    Returns:
+        SlideNotes のリスト (スライドの表示順)。ノートが空のスライドも含まれる。
+    """
+    with zipfile.ZipFile(pptx_path) as zf:
+        return read_notes_from_zip(zf)
+
+
+def read_notes_from_zip(zf: zipfile.ZipFile) -> list[SlideNotes]:
+    """開いてある PPTX の ZipFile から read_notes() と同じ結果を得る。"""
+    slides = []
+    for i, partname in enumerate(_slide_partnames(zf)):
+        notes_text = ""
+        notes_partname = _related_partname(zf, partname, _RT_NOTES_SLIDE)
+        if notes_partname is not None and notes_partname in zf.NameToInfo:
+            with zf.open(notes_partname) as f:
+                notes_text = _notes_placeholder_text(f).strip()
+        slides.append(SlideNotes(index=i, notes_text=notes_text, partname=partname))
+    return slides
+
+
+def read_slide_xml(pptx_path: str) -> list[etree._Element]:
+    """各スライドの XML (p:sld 要素) をスライドの表示順に読む (Presentation を作らない)。"""
+    with zipfile.ZipFile(pptx_path) as zf:
+        return [etree.fromstring(zf.read(partname)) for partname in _slide_partnames(zf)]
+
+
+def _read_rels(zf: zipfile.ZipFile, partname: str) -> dict[str, tuple[str, str]]:
+    """パート partname のリレーションシップ {rId: (種類, 参照先のパス)} (外部参照は除く)。"""
+    directory, name = posixpath.split(partname)
+    rels_name = posixpath.join(directory, "_rels", name + ".rels")
+    if rels_name not in zf.NameToInfo:
+        return {}
+    rels = {}
+    for rel in etree.fromstring(zf.read(rels_name)).iter(f"{{{_NS_PKG_RELS}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(directory, target))
+        rels[rel.get("Id")] = (rel.get("Type"), target)
+    return rels
+
+
+def _related_partname(zf: zipfile.ZipFile, partname: str, reltype: str) -> str | None:
+    for rtype, target in _read_rels(zf, partname).values():
+        if rtype == reltype:
+            return target
+    return None
+
+
+def _slide_partnames(zf: zipfile.ZipFile) -> list[str]:
+    """presentation.xml の sldIdLst の順に、スライドの ZIP 内のパスを返す。"""
+    presentation = _related_partname(zf, "", _RT_OFFICE_DOCUMENT)
+    if presentation is None:
+        raise zipfile.BadZipFile("PPTX ではありません (presentation.xml がありません)")
+    rels = _read_rels(zf, presentation)
+    partnames = []
+    with zf.open(presentation) as f:
+        # sldIdLst は presentation.xml の先頭付近にあるので、読み終えたら打ち切る
+        for _, el in etree.iterparse(f, events=("end",), tag=(_SLD_ID, _SLD_ID_LST)):
+            if el.tag == _SLD_ID_LST:
+                break
+            rel = rels.get(el.get(_R_ID))
+            if rel is not None:
+                partnames.append(rel[1])
+    return partnames
+
+
+def _notes_placeholder_text(f) -> str:
+    """ノートスライドの XML から、最初の本文 (type="body") プレースホルダーのテキストを取り出す。"""
+    for _, sp in etree.iterparse(f, events=("end",), tag=_SP):
+        parent = sp.getparent()
+        if parent is None or parent.tag != _SP_TREE:
+            continue  # グループ内のシェイプはプレースホルダーとして扱わない (python-pptx と同じ)
+        ph = sp.find(f"{_NV_SP_PR}/{_NV_PR}/{_PH}")
+        if ph is None or ph.get("type") != "body":
+            continue
+        tx_body = sp.find(_TX_BODY)
+        if tx_body is None:
+            return ""
+        return "\n".join(_paragraph_text(p) for p in tx_body.iterchildren(_A_P))
+    return ""
+
+
+def _paragraph_text(p: etree._Element) -> str:
+    parts = []
+    for child in p.iterchildren(_A_R, _A_FLD, _A_BR):
+        if child.tag == _A_BR:
+            parts.append("\v")
+        else:
+            t = child.find(_A_T)
+            if t is not None and t.text:
+                parts.append(t.text)
+    return "".join(parts)
@@ -0,0 +1,352 @@
+"""PPTX のストリーミング保存
+
+python-pptx の Presentation() は画像・動画を含む全パートをメモリに読み込み、
+prs.save() はそれらを展開済みのデータから圧縮し直して書き出す。
+画像や動画の多い数百 MB のデッキでは、触ってもいないメディアの再圧縮に保存時間の大半を使う。
+
+StreamingPackage は XML 以外のパートを空にした「骨組み」の ZIP から Presentation を開き、
+保存時は元の ZIP を先頭から読みながら、変更のないエントリを圧縮データのまま
+(展開・再圧縮せずに) コピーする。書き出すのは変更したパートと .rels、
+[Content_Types].xml、パッケージの .rels、新しく追加したパート (音声など) だけ。
+
+    package = StreamingPackage("input.pptx")
+    slide = package.presentation.slides[0]
+    ...  # スライドの XML やリレーションシップを変更する
+    package.save("output.pptx", modified_parts={slide.part.partname})
+
+書き出すパートはスレッドプールで並列に圧縮する (zlib は圧縮中に GIL を解放する)。
+圧縮レベルはパートの種類ごとにプリセット (COMPRESSION_PRESETS) で決める。
+mp3・画像などの圧縮済みのメディアは圧縮しても小さくならないので無圧縮で格納し、
+WAV は速いレベル、XML は既定のレベルで圧縮する。
+"""
+
+import io
+import os
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from pptx import Presentation
+from pptx.opc.oxml import serialize_part_xml
+from pptx.opc.packuri import PACKAGE_URI
+from pptx.opc.serialized import _ContentTypesItem
+
+# 骨組みに中身を残すエントリ (これ以外は空のデータで読み込む)
+_XML_SUFFIXES = (".xml", ".rels")
+
+# ZIP のレコード
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_ZIP64_END_RECORD = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_ZIP64_LIMIT = 0xFFFFFFFF
+_FLAG_UTF8 = 0x800
+_COPY_BUFFER = 1024 * 1024
+
+# 圧縮済みの形式 (deflate してもほとんど小さくならない)
+_COMPRESSED_SUFFIXES = (
+    ".mp3", ".m4a", ".aac", ".wma", ".ogg", ".mp4", ".m4v", ".mov", ".wmv", ".webm",
+    ".png", ".jpg", ".jpeg", ".gif", ".wdp", ".jxr", ".svgz",
+    ".xlsx", ".docx", ".pptx", ".zip",
+)
+
+# 圧縮レベルのプリセット: パートの種類 → zlib のレベル (0 = 無圧縮で格納)
+#   compressed  圧縮済みのメディア (mp3・m4a・画像・動画・Office 文書)
+#   wav         WAV (μ-law を含む)
+#   other       XML・.rels とその他のパート
+COMPRESSION_PRESETS = {
+    "fast": {"compressed": 0, "wav": 0, "other": 1},
+    "normal": {"compressed": 0, "wav": 1, "other": 6},
+    "small": {"compressed": 0, "wav": 9, "other": 9},
+}
+DEFAULT_COMPRESSION = "normal"
+
+
+def _is_xml_entry(name: str) -> bool:
+    return name.lower().endswith(_XML_SUFFIXES)
+
+
+def compression_level(name: str, compression: str = DEFAULT_COMPRESSION) -> int:
+    """エントリ名 name に使う圧縮レベル (compression は COMPRESSION_PRESETS のキー)。"""
+    try:
+        levels = COMPRESSION_PRESETS[compression]
+    except KeyError:
+        raise ValueError(f"未対応の圧縮設定です: {compression}") from None
+    lower = name.lower()
+    if lower.endswith(_COMPRESSED_SUFFIXES):
+        return levels["compressed"]
+    if lower.endswith(".wav"):
+        return levels["wav"]
+    return levels["other"]
+
+
+def _default_workers() -> int:
+    return min(8, os.cpu_count() or 1)
+
+
+def _compress(data: bytes, level: int) -> tuple[int, int, bytes]:
+    """(圧縮方式, CRC32, 圧縮後のデータ)。level 0 は無圧縮。スレッドから呼んでよい。"""
+    crc = zlib.crc32(data)
+    if level == 0:
+        return zipfile.ZIP_STORED, crc, data
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return zipfile.ZIP_DEFLATED, crc, compressor.compress(data) + compressor.flush()
+
+
+def file_stamp(path: str) -> tuple[int, int]:
+    """ファイルが変更されたかどうかの判定に使う (更新時刻 ns, サイズ)。"""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def build_skeleton(src: zipfile.ZipFile) -> bytes:
+    """XML と .rels だけ中身を残し、それ以外のエントリを空にした ZIP (StreamingPackage 用)。"""
+    skeleton = io.BytesIO()
+    with zipfile.ZipFile(skeleton, "w") as out:
+        for info in src.infolist():
+            if info.is_dir():
+                continue
+            out.writestr(info.filename, src.read(info) if _is_xml_entry(info.filename) else b"")
+    return skeleton.getvalue()
+
+
+def _dos_datetime(t: tuple) -> tuple[int, int]:
+    """(年, 月, 日, 時, 分, 秒) を ZIP の (時刻, 日付) にする。"""
+    year, month, day, hour, minute, second = t[:6]
+    year = max(year, 1980)
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+class _ZipEntry:
+    """書き出したエントリの中央ディレクトリ用の情報。"""
+    __slots__ = ("name", "flags", "method", "dostime", "dosdate", "crc", "csize", "usize", "offset")
+
+    def __init__(self, name, flags, method, dostime, dosdate, crc, csize, usize, offset):
+        self.name = name
+        self.flags = flags
+        self.method = method
+        self.dostime = dostime
+        self.dosdate = dosdate
+        self.crc = crc
+        self.csize = csize
+        self.usize = usize
+        self.offset = offset
+
+
+class _ZipStreamWriter:
+    """ZIP を先頭から順に書き出す最小限のライタ。
+
+    圧縮済みのデータをそのまま書き込める (copy_raw)。エントリ 1 つは 4GB 未満まで、
+    ファイル全体が 4GB を超える場合やエントリ数が多い場合は ZIP64 の終端レコードを書く。
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.entries: list[_ZipEntry] = []
+        self._names: set[str] = set()
+        self._offset = 0
+
+    def _write(self, data: bytes) -> None:
+        self.fp.write(data)
+        self._offset += len(data)
+
+    def _begin_entry(self, name: str, flags: int, method: int, dostime: int, dosdate: int,
+                     crc: int, csize: int, usize: int) -> None:
+        if name in self._names:
+            raise ValueError(f"パート名が重複しています: {name}")
+        if csize >= _ZIP64_LIMIT or usize >= _ZIP64_LIMIT:
+            raise ValueError(f"4GB 以上のパートには対応していません: {name}")
+        self._names.add(name)
+        encoded = name.encode("utf-8")
+        if not name.isascii():
+            flags |= _FLAG_UTF8
+        self.entries.append(_ZipEntry(encoded, flags, method, dostime, dosdate, crc, csize, usize,
+                                      self._offset))
+        self._write(_LOCAL_HEADER.pack(b"PK\x03\x04", 20, flags, method, dostime, dosdate,
+                                       crc, csize, usize, len(encoded), 0) + encoded)
+
+    def write(self, name: str, data: bytes, level: int = 6) -> None:
+        """データを圧縮して書き込む (level 0 は無圧縮で格納)。"""
+        self.write_compressed(name, _compress(data, level), len(data))
+
+    def write_compressed(self, name: str, compressed: tuple[int, int, bytes], size: int) -> None:
+        """_compress() の結果を書き込む。size は圧縮前のバイト数。"""
+        method, crc, payload = compressed
+        dostime, dosdate = _dos_datetime(time.localtime())
+        self._begin_entry(name, 0, method, dostime, dosdate, crc, len(payload), size)
+        self._write(payload)
+
+    def copy_raw(self, fp, info: zipfile.ZipInfo) -> None:
+        """元の ZIP ファイル fp のエントリ info を圧縮データのままコピーする。"""
+        fp.seek(info.header_offset)
+        header = fp.read(_LOCAL_HEADER.size)
+        fields = _LOCAL_HEADER.unpack(header)
+        if fields[0] != b"PK\x03\x04":
+            raise zipfile.BadZipFile(f"ローカルヘッダが不正です: {info.filename}")
+        fp.seek(fields[9] + fields[10], os.SEEK_CUR)  # ファイル名と拡張フィールドを飛ばす
+        dostime, dosdate = _dos_datetime(info.date_time)
+        # サイズはヘッダに書くのでデータディスクリプタ (bit 3) は使わない
+        flags = info.flag_bits & ~0x08 & ~_FLAG_UTF8
+        self._begin_entry(info.filename, flags, info.compress_type, dostime, dosdate, info.CRC,
+                          info.compress_size, info.file_size)
+        remaining = info.compress_size
+        while remaining:
+            block = fp.read(min(_COPY_BUFFER, remaining))
+            if not block:
+                raise zipfile.BadZipFile(f"データが途中で終わっています: {info.filename}")
+            self._write(block)
+            remaining -= len(block)
+
+    def close(self) -> None:
+        """中央ディレクトリと終端レコードを書く。"""
+        cd_start = self._offset
+        for e in self.entries:
+            extra = b""
+            offset = e.offset
+            if offset >= _ZIP64_LIMIT:
+                extra = struct.pack("<2HQ", 1, 8, offset)
+                offset = _ZIP64_LIMIT
+            version = 45 if extra else 20
+            self._write(_CENTRAL_HEADER.pack(b"PK\x01\x02", version, version, e.flags, e.method,
+                                             e.dostime, e.dosdate, e.crc, e.csize, e.usize,
+                                             len(e.name), len(extra), 0, 0, 0, 0, offset)
+                        + e.name + extra)
+        cd_size = self._offset - cd_start
+        count = len(self.entries)
+        if count >= 0xFFFF or cd_start >= _ZIP64_LIMIT or cd_size >= _ZIP64_LIMIT:
+            zip64_end = self._offset
+            self._write(_ZIP64_END_RECORD.pack(b"PK\x06\x06", _ZIP64_END_RECORD.size - 12, 45, 45,
+                                               0, 0, count, count, cd_size, cd_start))
+            self._write(_ZIP64_LOCATOR.pack(b"PK\x06\x07", 0, zip64_end, 1))
+            self._write(_END_RECORD.pack(b"PK\x05\x06", 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                                         min(cd_size, _ZIP64_LIMIT), min(cd_start, _ZIP64_LIMIT), 0))
+        else:
+            self._write(_END_RECORD.pack(b"PK\x05\x06", 0, 0, count, count, cd_size, cd_start, 0))
+
+
+class StreamingPackage:
+    """メディアをメモリに載せずに開き、変更のないパートを再圧縮せずに保存する PPTX。
+
+    presentation は通常の python-pptx の Presentation だが、XML 以外の元のパート
+    (画像・動画・埋め込みファイルなど) の中身は空になっている。保存は必ず save() で行うこと。
+
+    作成済みの骨組み (build_skeleton) と、それを作ったときの file_stamp() を渡すと
+    元のファイルを読み直さずに開く。開いた後に元のファイルが変更されていると save() は失敗する。
+    """
+
+    def __init__(self, source_path: str, skeleton: bytes | None = None,
+                 stamp: tuple[int, int] | None = None):
+        self.source_path = source_path
+        if skeleton is None:
+            stamp = file_stamp(source_path)
+            with zipfile.ZipFile(source_path) as src:
+                skeleton = build_skeleton(src)
+        self._stamp = stamp
+        self.presentation = Presentation(io.BytesIO(skeleton))
+        # 元のパート (同じパート名の新しいパートと区別するためオブジェクトで持つ)
+        self._source_parts = {part.partname: part for part in self.presentation.part.package.iter_parts()}
+
+    def save(self, output_path: str, modified_parts=(), compression: str = DEFAULT_COMPRESSION,
+             workers: int | None = None) -> None:
+        """パッケージを保存する。
+
+        Args:
+            modified_parts: XML またはリレーションシップを変更した元のパートのパート名。
+                新しく追加したパートは指定しなくても書き出す。それ以外の元のパートは
+                元の ZIP から圧縮データのままコピーする
+            compression: 書き出すパートの圧縮レベルのプリセット (COMPRESSION_PRESETS のキー)
+            workers: 圧縮に使うスレッド数 (None = CPU 数。1 以下なら呼び出し元のスレッドで圧縮)
+        """
+        if compression not in COMPRESSION_PRESETS:
+            raise ValueError(f"未対応の圧縮設定です: {compression}")
+        if workers is None:
+            workers = _default_workers()
+        if self._stamp is not None and file_stamp(self.source_path) != self._stamp:
+            # 変更のないパートは元のファイルからコピーするため、別の内容が混ざってしまう
+            raise RuntimeError(f"入力ファイルが読み込み後に変更されました: {self.source_path}")
+        package = self.presentation.part.package
+        parts = list(package.iter_parts())
+        modified = set(modified_parts)
+        directory = os.path.dirname(os.path.abspath(output_path))
+        # 入力と同じファイルへの上書きにも対応するため、一時ファイルに書いてから置き換える
+        fd, tmp_path = tempfile.mkstemp(prefix=".ppvoice_", suffix=".pptx", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as out, open(self.source_path, "rb") as src_fp, \
+                    zipfile.ZipFile(src_fp) as src:
+                writer = _ZipStreamWriter(out)
+                entries = self._iter_entries(parts, modified, src)
+                if workers > 1:
+                    with ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="ppvoice-zip") as pool:
+                        self._write_entries(writer, src_fp, entries, compression, pool, workers)
+                else:
+                    self._write_entries(writer, src_fp, entries, compression, None, 0)
+                writer.close()
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _iter_entries(self, parts, modified: set, src: zipfile.ZipFile):
+        """書き出すエントリを ZIP の順に返す。
+
+        元の ZIP からコピーするエントリは (名前, ZipInfo, None)、
+        新しく書くエントリは (名前, None, データ)。
+        """
+        package = self.presentation.part.package
+        yield "[Content_Types].xml", None, serialize_part_xml(_ContentTypesItem.xml_for(parts))
+        yield PACKAGE_URI.rels_uri.membername, None, package._rels.xml
+        source_names = set(src.namelist())
+        for part in parts:
+            name = part.partname.membername
+            rels_name = part.partname.rels_uri.membername
+            from_source = self._source_parts.get(part.partname) is part
+            if from_source and part.partname not in modified:
+                yield name, src.getinfo(name), None
+                if rels_name in source_names:
+                    yield rels_name, src.getinfo(rels_name), None
+                continue
+            if from_source and not _is_xml_entry(name):
+                raise ValueError(f"XML 以外の元のパートは変更できません: {part.partname}")
+            yield name, None, part.blob
+            if part._rels:
+                yield rels_name, None, part.rels.xml
+
+    @staticmethod
+    def _write_entries(writer: _ZipStreamWriter, src_fp, entries, compression: str,
+                       pool: ThreadPoolExecutor | None, workers: int) -> None:
+        """エントリを順に書き出す。pool があれば先の数エントリの圧縮を並列に進めておく。"""
+        # (名前, ZipInfo, 圧縮前のサイズ, 圧縮結果の Future)。先読みは workers の 2 倍まで
+        pending: deque = deque()
+
+        def flush_one():
+            name, info, size, future = pending.popleft()
+            if info is not None:
+                writer.copy_raw(src_fp, info)
+            else:
+                writer.write_compressed(name, future.result(), size)
+
+        for name, info, data in entries:
+            if info is not None:
+                if not pending:
+                    writer.copy_raw(src_fp, info)
+                    continue
+                pending.append((name, info, 0, None))
+            elif pool is None:
+                writer.write(name, data, compression_level(name, compression))
+                continue
+            else:
+                pending.append((name, None, len(data),
+                                pool.submit(_compress, data, compression_level(name, compression))))
+            while len(pending) > workers * 2:
+                flush_one()
+        while pending:
+            flush_one()
@@ -5,18 +5,26 @@ import io
 import os
 import re
 import subprocess
+import time
 import wave
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 
 from lxml import etree
-from pptx import Presentation
 from pptx.dml.color import RGBColor
 from pptx.enum.text import MSO_ANCHOR, PP_ALIGN
 from pptx.opc.package import Part
 from pptx.opc.packuri import PackURI
 from pptx.util import Emu, Pt
 
+from audio_encode import encode_audio, resolve_format
+from manifest import (
+    MANIFEST_CONTENT_TYPE, MANIFEST_PARTNAME, RT_MANIFEST, ReusedSlide, SlideEntry, dumps_manifest,
+)
+from pptx_stream import DEFAULT_COMPRESSION, StreamingPackage
+from tracing import span
+
 # リレーションシップタイプ
 RT_AUDIO = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/audio"
 RT_MEDIA = "http://schemas.microsoft.com/office/2007/relationships/media"
@@ -405,18 +413,31 @@ def _extract_click_groups(sld) -> tuple[list[etree._Element], etree._Element | N
         return [], None
 
     bld_lst = timing.find(_qn("p:bldLst"))
+    child_list = _main_seq_children(timing)
+    # 各 <p:par> をコピーして返す (元のツリーから切り離す)
+    click_groups = [copy.deepcopy(par) for par in child_list.findall(_qn("p:par"))] \
+        if child_list is not None else []
+    return click_groups, copy.deepcopy(bld_lst) if bld_lst is not None else None
 
-    # mainSeq を探す
+
+def _main_seq_children(timing) -> etree._Element | None:
+    """p:timing の mainSeq の p:childTnLst (クリックグループの並び)。なければ None。"""
     for seq in timing.iter(_qn("p:seq")):
         ctn = seq.find(_qn("p:cTn"))
         if ctn is not None and ctn.get("nodeType") == "mainSeq":
             child_list = ctn.find(_qn("p:childTnLst"))
             if child_list is not None:
-                # 各 <p:par> をコピーして返す (元のツリーから切り離す)
-                return [copy.deepcopy(par) for par in child_list.findall(_qn("p:par"))], \
-                       copy.deepcopy(bld_lst) if bld_lst is not None else None
+                return child_list
+    return None
 
-    return [], copy.deepcopy(bld_lst) if bld_lst is not None else None
+
+def count_click_groups(sld) -> int:
+    """スライド (p:sld 要素) のクリックアニメーション (mainSeq のグループ) の数。"""
+    timing = sld.find(_qn("p:timing"))
+    if timing is None:
+        return 0
+    child_list = _main_seq_children(timing)
+    return len(child_list.findall(_qn("p:par"))) if child_list is not None else 0
 
 
 def _next_positions_to_ms(
@@ -671,6 +692,67 @@ def _try_close_powerpoint_file(filepath: str) -> None:
         pass
 
 
+@dataclass
+class EncodeReport:
+    """音声のエンコード結果 (embed_audio の on_encoded に渡す)。"""
+    requested: str  # 指定された形式
+    format: str  # 使った形式 (ffmpeg がなければ mp3/m4a の代わりに mulaw)
+    slides: int
+    wav_bytes: int
+    encoded_bytes: int
+    elapsed_sec: float
+    failed: dict[int, str] = field(default_factory=dict)  # WAV のまま埋め込んだスライド → 理由
+
+    def lines(self) -> list[str]:
+        """ログに表示する行。"""
+        lines = []
+        if self.format != self.requested.lower():
+            lines.append(f"  ffmpeg が見つからないため {self.requested} の代わりに μ-law WAV で埋め込みます")
+        for idx, reason in sorted(self.failed.items()):
+            lines.append(f"  スライド {idx + 1}: {self.format} へのエンコードに失敗したため"
+                         f" WAV のまま埋め込みます ({reason})")
+        if self.format != "wav" and self.slides:
+            lines.append(f"  音声形式: {self.format}  WAV {self.wav_bytes / 1024 ** 2:.1f}MB → "
+                         f"{self.encoded_bytes / 1024 ** 2:.1f}MB "
+                         f"({self.encoded_bytes / self.wav_bytes:.0%}), エンコード {self.elapsed_sec:.1f}秒")
+        return lines
+
+
+def _encode_slide_audio(slide_audio: list[tuple[int, bytes]],
+                        audio_format: str) -> tuple[dict, EncodeReport]:
+    """各スライドの WAV を埋め込み形式にエンコードする。
+
+    Returns:
+        ({スライドインデックス: EncodedAudio}, サイズ・時間・失敗したスライドの報告)
+    """
+    fmt = resolve_format(audio_format)
+    targets = [(idx, wav) for idx, wav in slide_audio if wav]
+    t0 = time.perf_counter()
+    # ffmpeg はサブプロセスなのでスライド単位で並列に実行する
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+        results = list(pool.map(lambda item: encode_audio(item[1], fmt), targets))
+    report = EncodeReport(
+        requested=audio_format, format=fmt, slides=len(targets),
+        wav_bytes=sum(len(wav) for _, wav in targets),
+        encoded_bytes=sum(len(r.data) for r in results),
+        elapsed_sec=time.perf_counter() - t0,
+        failed={idx: r.error for (idx, _), r in zip(targets, results) if r.error},
+    )
+    return {idx: r for (idx, _), r in zip(targets, results)}, report
+
+
+def _embed_manifest(prs, blob: bytes) -> None:
+    """マニフェストパートをパッケージに追加する (入力に前回のマニフェストがあれば置き換える)。"""
+    package = prs.part.package
+    # マニフェストはパッケージからしか参照しないので、reltype で見つかるのはパッケージのリレーションシップ。
+    # 元のパートの blob を書き換えると StreamingPackage が元の ZIP の内容をコピーしてしまうため、
+    # リレーションシップごと外して新しいパートにする
+    for rId in [rel.rId for rel in package.iter_rels() if rel.reltype == RT_MANIFEST]:
+        package.drop_rel(rId)
+    part = Part(PackURI(MANIFEST_PARTNAME), MANIFEST_CONTENT_TYPE, package, blob=blob)
+    package.relate_to(part, RT_MANIFEST)
+
+
 def embed_audio(
     source_path: str,
     slide_audio: list[tuple[int, bytes]],
@@ -697,7 +779,15 @@ def embed_audio(
     subtitle_default_underline: bool = False,
     slide_next_positions: dict[int, list[tuple[int, float]]] | None = None,
     auto_next_interval_ms: int = 5000,
-) -> None:
+    audio_format: str = "wav",
+    compression: str = DEFAULT_COMPRESSION,
+    compress_workers: int | None = None,
+    slide_hashes: dict[int, str] | None = None,
+    reused_audio: dict[int, ReusedSlide] | None = None,
+    generator: str = "",
+    package: StreamingPackage | None = None,
+    on_encoded=None,
+) -> str:
     """各スライドに音声を埋め込んだPPTXを生成する。
 
     Args:
@@ -708,19 +798,60 @@ def embed_audio(
         slide_timings: {スライドインデックス: [(文, 開始ms, 長さms), ...]} 字幕タイミング
         slide_next_positions: {スライドインデックス: [(sent_idx, ratio), ...]}
         auto_next_interval_ms: 余りクリックグループの自動発火間隔 (ms)
-    """
-    prs = Presentation(source_path)
-
-    for slide_idx, wav_bytes in slide_audio:
-        if not wav_bytes:
-            continue
+        audio_format: 埋め込む音声の形式 ("wav", "mulaw", "mp3", "m4a")。
+            mp3/m4a は ffmpeg が必要で、見つからなければ mulaw で埋め込む
+        compression: 保存時の圧縮レベルのプリセット ("fast", "normal", "small")。
+            書き出すパートはスレッドプールで並列に圧縮する
+        compress_workers: 圧縮に使うスレッド数 (None = CPU 数、1 = 並列化しない)
+        slide_hashes: {スライドインデックス: slide_hash()}。指定するとマニフェストを埋め込む
+        reused_audio: {スライドインデックス: ReusedSlide}。前回の出力から再利用する
+            エンコード済みの音声 (slide_audio に含めないこと)
+        generator: マニフェストに記録する生成元 (バージョン表記など)
+        package: source_path を開いた StreamingPackage (DeckModel.open_package() など)。
+            省略時は source_path から開く
+        on_encoded: コールバック on_encoded(report: EncodeReport)。音声のエンコード後に呼ばれる。
+            省略時は report.lines() を print する
 
+    Returns:
+        実際に保存したファイルパス (出力先が使用中の場合は日時付きの別名になる)
+    """
+    # 画像・動画はメモリに読み込まず、保存時に元のファイルから圧縮データのままコピーする
+    with span("load_presentation"):
+        if package is None:
+            package = StreamingPackage(source_path)
+    prs = package.presentation
+    # 元のパートと、このループで割り当てた音声パートの名前 (重複させない)
+    used_partnames = {part.partname for part in prs.part.package.iter_parts()}
+    modified_parts = set()
+
+    with span("encode_audio", slides=len(slide_audio), format=audio_format):
+        encoded, report = _encode_slide_audio(slide_audio, audio_format)
+    if on_encoded is not None:
+        on_encoded(report)
+    else:
+        for line in report.lines():
+            print(line)
+    durations = {idx: get_wav_duration_ms(wav) for idx, wav in slide_audio if wav}
+    for slide_idx, reused in (reused_audio or {}).items():
+        encoded[slide_idx] = reused.audio
+        durations[slide_idx] = reused.entry.duration_ms
+    manifest_entries: dict[int, SlideEntry] = {}
+
+    for slide_idx in sorted(encoded):
         slide = prs.slides[slide_idx]
         slide_part = slide.part
+        modified_parts.add(slide_part.partname)
 
         # 音声パートをパッケージに追加
-        partname = PackURI(f"/ppt/media/audio{slide_idx + 1}.wav")
-        audio_part = Part(partname, "audio/wav", prs.part.package, blob=wav_bytes)
+        audio = encoded[slide_idx]
+        partname = PackURI(f"/ppt/media/audio{slide_idx + 1}.{audio.ext}")
+        n = 1
+        while partname in used_partnames:
+            # 元のデッキに同名のメディアがある (音声付きのデッキを入力にした場合など)
+            partname = PackURI(f"/ppt/media/audio{n}.{audio.ext}")
+            n += 1
+        used_partnames.add(partname)
+        audio_part = Part(partname, audio.content_type, prs.part.package, blob=audio.data)
 
         # リレーションシップ追加 (audio + media の2種類)
         audio_rId = slide_part.relate_to(audio_part, RT_AUDIO)
@@ -746,27 +877,28 @@ def embed_audio(
                 int(subtitle_bg_color[2:4], 16),
                 int(subtitle_bg_color[4:6], 16),
             )
-            sub_shape_ids, split_timings = _add_subtitle_shapes(
-                slide, timings, prs,
-                font_size=subtitle_font_size,
-                font_name=subtitle_font_name,
-                bottom_margin_pct=subtitle_bottom_pct,
-                style=subtitle_style,
-                font_color=fc,
-                use_outline=subtitle_use_outline,
-                outline_color_hex=subtitle_outline_color,
-                outline_width_pt=subtitle_outline_width,
-                use_glow=subtitle_use_glow,
-                glow_color_hex=subtitle_glow_color,
-                glow_radius_pt=subtitle_glow_size,
-                bg_color=bgc,
-                bg_alpha=subtitle_bg_alpha * 1000,
-                kuten_mode=subtitle_kuten_mode,
-                touten_mode=subtitle_touten_mode,
-                default_bold=subtitle_default_bold,
-                default_italic=subtitle_default_italic,
-                default_underline=subtitle_default_underline,
-            )
+            with span("add_subtitle_shapes", slide=slide_idx + 1, sentences=len(timings)):
+                sub_shape_ids, split_timings = _add_subtitle_shapes(
+                    slide, timings, prs,
+                    font_size=subtitle_font_size,
+                    font_name=subtitle_font_name,
+                    bottom_margin_pct=subtitle_bottom_pct,
+                    style=subtitle_style,
+                    font_color=fc,
+                    use_outline=subtitle_use_outline,
+                    outline_color_hex=subtitle_outline_color,
+                    outline_width_pt=subtitle_outline_width,
+                    use_glow=subtitle_use_glow,
+                    glow_color_hex=subtitle_glow_color,
+                    glow_radius_pt=subtitle_glow_size,
+                    bg_color=bgc,
+                    bg_alpha=subtitle_bg_alpha * 1000,
+                    kuten_mode=subtitle_kuten_mode,
+                    touten_mode=subtitle_touten_mode,
+                    default_bold=subtitle_default_bold,
+                    default_italic=subtitle_default_italic,
+                    default_underline=subtitle_default_underline,
+                )
             # (shape_id, appear_ms, disappear_ms) のリストを作成
             subtitle_anim_data = []
             for i, (sid, (_, start_ms, dur_ms)) in enumerate(zip(sub_shape_ids, split_timings)):
@@ -778,10 +910,21 @@ def embed_audio(
                 subtitle_anim_data.append((sid, appear, disappear))
 
         # タイミングXML (音声 + 字幕アニメーション)
-        duration_ms = get_wav_duration_ms(wav_bytes)
+        duration_ms = durations[slide_idx]
 
         # <next> タグがある場合、既存アニメーションを退避
         next_positions = (slide_next_positions or {}).get(slide_idx, [])
+
+        if slide_hashes and slide_idx in slide_hashes:
+            manifest_entries[slide_idx] = SlideEntry(
+                hash=slide_hashes[slide_idx],
+                media=str(partname),
+                content_type=audio.content_type,
+                duration_ms=duration_ms,
+                timings=list(timings or []),
+                next_positions=list(next_positions),
+                format=audio.format,
+            )
         click_groups, bld_lst = _extract_click_groups(sld) if next_positions else ([], None)
 
         # 既存の transition / timing を除去
@@ -831,20 +974,29 @@ def embed_audio(
         transition.set("advTm", str(last_event_ms + end_pause_ms))
         sld.insert(insert_idx, transition)
 
-        timing_el = _make_timing_xml(
-            audio_shape_id, duration_ms, subtitle_anim_data,
-            click_groups=click_groups if click_groups else None,
-            click_ms_list=click_ms_list if click_ms_list else None,
-            bld_lst=bld_lst,
-        )
+        with span("make_timing_xml", slide=slide_idx + 1):
+            timing_el = _make_timing_xml(
+                audio_shape_id, duration_ms, subtitle_anim_data,
+                click_groups=click_groups if click_groups else None,
+                click_ms_list=click_ms_list if click_ms_list else None,
+                bld_lst=bld_lst,
+            )
         sld.insert(insert_idx + 1, timing_el)
 
+    if slide_hashes is not None:
+        _embed_manifest(prs, dumps_manifest(manifest_entries, generator))
+
     _try_close_powerpoint_file(output_path)
-    try:
-        prs.save(output_path)
-    except PermissionError:
-        base, ext = os.path.splitext(output_path)
-        ts = datetime.now().strftime("%Y%m%d%H%M%S")
-        output_path = f"{base}_{ts}{ext}"
-        prs.save(output_path)
-    print(f"音声付きPPTX を保存しました: {output_path}")
+    t0 = time.perf_counter()
+    with span("save_package"):
+        try:
+            package.save(output_path, modified_parts, compression=compression, workers=compress_workers)
+        except PermissionError:
+            base, ext = os.path.splitext(output_path)
+            ts = datetime.now().strftime("%Y%m%d%H%M%S")
+            output_path = f"{base}_{ts}{ext}"
+            package.save(output_path, modified_parts, compression=compression, workers=compress_workers)
+    size_mb = os.path.getsize(output_path) / 1024 ** 2
+    print(f"音声付きPPTX を保存しました: {output_path} "
+          f"({size_mb:.1f}MB, 保存 {time.perf_counter() - t0:.1f}秒)")
+    return output_path
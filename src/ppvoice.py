@@ -0,0 +1,285 @@
+"""PPVoice コマンドライン版 (GUI なしで音声付き PPTX を生成する)
+
+使い方 (src ディレクトリで実行):
+    python -m ppvoice lecture.pptx
+    python -m ppvoice decks/ -o out/ --jobs 4 --url "http://host-a:50021, http://host-b:50021"
+    python -m ppvoice lecture.pptx --speaker ずんだもん --style ノーマル --set fontsize=24
+
+設定の優先順位は 既定値 < ノートの <config> タグ < --set < 個別オプション。
+複数のファイルは --jobs 個のプロセスで並列に処理し、合成結果のキャッシュは全プロセスで共有する。
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from audio_encode import AUDIO_FORMATS
+from deck_model import DeckCache
+from generation import (
+    GenerationResult, GenerationSettings, apply_config, generate, open_caches, resolve_speaker_id,
+)
+from pptx_stream import COMPRESSION_PRESETS
+from tracing import Trace, write_chrome_trace
+from tts.speakers import SpeakerCatalog
+from tts.voicevox_async import async_engine_available
+from version import __version__
+
+# 個別オプション名 → GenerationSettings のフィールド名
+_OPTION_FIELDS = {
+    "url": "url", "speaker_id": "speaker_id", "speaker": "speaker", "style": "style",
+    "pause": "pause", "speed": "speed", "pitch": "pitch", "intonation": "intonation",
+    "volume": "volume", "end_pause": "end_pause", "parallel": "parallel",
+    "async_engine": "async_engine",
+    "audio_format": "audio_format", "sample_rate": "sample_rate", "stereo": "stereo",
+    "compression": "compression", "subtitle": "subtitle", "update": "update_mode",
+}
+
+# プロセスごとの話者一覧 (URL → /speakers の結果)
+_speakers_by_url: dict[str, list[dict]] = {}
+# プロセスごとの解析済みデッキ (<config> タグの読み込みと生成で同じファイルを 2 回読まない)
+_deck_cache = DeckCache()
+
+
+def _find_decks(inputs: list[str], suffix: str) -> list[str]:
+    """ファイル・ディレクトリの指定から入力 PPTX の一覧を作る (生成済みの出力は除く)。"""
+    decks = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                base, ext = os.path.splitext(name)
+                if ext.lower() == ".pptx" and not base.endswith(suffix) and not name.startswith("~$"):
+                    decks.append(os.path.join(path, name))
+        else:
+            decks.append(path)
+    return decks
+
+
+def _output_path(input_path: str, output_dir: str | None, suffix: str) -> str:
+    base = os.path.splitext(os.path.basename(input_path))[0] + suffix + ".pptx"
+    return os.path.join(output_dir or os.path.dirname(input_path), base)
+
+
+def _speaker_id_for(url: str, speaker: str, style: str) -> int | None:
+    if url not in _speakers_by_url:
+        # 前回の一覧がエンジンの現在の /version のものなら /speakers を取得しない
+        _speakers_by_url[url] = SpeakerCatalog().fetch(url).speakers
+    return resolve_speaker_id(_speakers_by_url[url], speaker, style)
+
+
+def _build_settings(input_path: str, set_config: dict[str, str], options: dict,
+                    use_config_tags: bool) -> GenerationSettings:
+    """既定値・<config> タグ・--set・個別オプションの順に重ねて設定を作る。"""
+    settings = GenerationSettings()
+    if use_config_tags:
+        ignored = apply_config(settings, _deck_cache.get(input_path).config)
+        if ignored:
+            print(f"  <config> の未対応の項目を無視しました: {', '.join(ignored)}")
+    ignored = apply_config(settings, set_config)
+    if ignored:
+        raise ValueError(f"--set の項目が不正です: {', '.join(ignored)}")
+    for name, value in options.items():
+        setattr(settings, _OPTION_FIELDS[name], value)
+    # 話者名の指定があり ID の直接指定がなければ、エンジンの話者一覧から ID を求める
+    if settings.speaker and "speaker_id" not in options:
+        speaker_id = _speaker_id_for(settings.url, settings.speaker, settings.style)
+        if speaker_id is None:
+            raise ValueError(f"話者が見つかりません: {settings.speaker} {settings.style}".rstrip())
+        settings.speaker_id = speaker_id
+    return settings
+
+
+def _run_deck(input_path: str, output_path: str, set_config: dict[str, str], options: dict,
+              use_config_tags: bool, cache_dir: str | None, use_cache: bool,
+              quiet: bool) -> tuple[GenerationResult, str]:
+    """1 ファイルを生成する (プロセスプールのワーカーからも呼ばれる)。
+
+    Returns:
+        (生成結果, quiet の場合に抑制したログ)
+    """
+    log = io.StringIO()
+    result = GenerationResult(input_path=input_path)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(log) if quiet else contextlib.nullcontext():
+        try:
+            settings = _build_settings(input_path, set_config, options, use_config_tags)
+            wav_cache, query_cache = open_caches(cache_dir) if use_cache else (None, None)
+            result = generate(input_path, output_path, settings,
+                              wav_cache=wav_cache, query_cache=query_cache, deck_cache=_deck_cache,
+                              generator=f"PPVoice {__version__}")
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            result.total_sec = time.perf_counter() - t0
+    return result, log.getvalue()
+
+
+def _format_report(results: list[GenerationResult], wall_sec: float) -> str:
+    """ファイルごとの処理量と速度の一覧。"""
+    lines = [
+        f"{'ファイル':<32} {'スライド':>8} {'再利用':>6} {'文':>6} {'音声(秒)':>9} "
+        f"{'合成(秒)':>9} {'合計(秒)':>9} {'倍速':>7}",
+    ]
+    for r in results:
+        name = os.path.basename(r.input_path)
+        if r.error:
+            lines.append(f"{name:<32} エラー: {r.error}")
+            continue
+        lines.append(
+            f"{name:<32} {r.slides:>8} {r.reused_slides:>6} {r.sentences:>6} {r.audio_sec:>9.1f} "
+            f"{r.synth_sec:>9.1f} {r.total_sec:>9.1f} {r.realtime_factor:>6.1f}x"
+        )
+    ok = [r for r in results if not r.error]
+    audio = sum(r.audio_sec for r in ok)
+    lines.append(
+        f"合計 {len(ok)}/{len(results)} ファイル, 音声 {audio:.1f} 秒, 経過 {wall_sec:.1f} 秒"
+        + (f" ({audio / wall_sec:.1f}x)" if wall_sec > 0 else "")
+    )
+    return "\n".join(lines)
+
+
+def _parse_set(values: list[str]) -> dict[str, str]:
+    config = {}
+    for item in values:
+        key, sep, val = item.partition("=")
+        if not sep or not key:
+            raise argparse.ArgumentTypeError(f"--set は KEY=VALUE の形式で指定してください: {item}")
+        config[key.strip()] = val
+    return config
+
+
+def _positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"1 以上の整数を指定してください: {value}")
+    return n
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="ppvoice",
+        description="PowerPoint のノートを VOICEVOX で読み上げ、音声付き PPTX を生成します。",
+    )
+    p.add_argument("inputs", nargs="+", help="入力 PPTX ファイル、または PPTX を含むディレクトリ")
+    p.add_argument("-o", "--output-dir", help="出力先ディレクトリ (省略時は入力と同じ場所)")
+    p.add_argument("--suffix", default="_speech", help="出力ファイル名に付ける接尾辞 (既定: _speech)")
+    p.add_argument("-j", "--jobs", type=int, default=0,
+                   help="同時に処理するファイル数 (プロセス数)。既定は min(4, ファイル数)")
+    p.add_argument("-v", "--verbose", action="store_true",
+                   help="並列処理時も各ファイルの詳細ログを表示する")
+    p.add_argument("--version", action="version", version=f"PPVoice {__version__}")
+
+    g = p.add_argument_group("音声設定 (省略時はノートの <config> タグ、なければ GUI と同じ既定値)")
+    g.add_argument("--url", help="VOICEVOX の URL。カンマ区切りで複数指定可")
+    g.add_argument("--speaker-id", type=int, help="話者のスタイル ID")
+    g.add_argument("--speaker", help="話者名 (例: ずんだもん)")
+    g.add_argument("--style", help="スタイル名 (例: ノーマル)")
+    g.add_argument("--pause", type=float, help="文の区切り (秒)")
+    g.add_argument("--speed", type=float)
+    g.add_argument("--pitch", type=float)
+    g.add_argument("--intonation", type=float)
+    g.add_argument("--volume", type=float)
+    g.add_argument("--end-pause", type=float, help="末尾の余白 (秒)")
+    g.add_argument("--parallel", type=_positive_int, help="1 ファイル内で同時に合成する文の数")
+    g.add_argument("--async-engine", action="store_true", default=None,
+                   help="asyncio 版のエンジン (aiohttp が必要) で合成する。--parallel を大きくしても"
+                        "スレッドを増やさずに済む")
+    g.add_argument("--audio-format", choices=sorted(AUDIO_FORMATS))
+    g.add_argument("--sample-rate", type=int)
+    g.add_argument("--stereo", action=argparse.BooleanOptionalAction, default=None)
+    g.add_argument("--compression", choices=list(COMPRESSION_PRESETS),
+                   help="保存時の圧縮 (fast: 速い・大きい, normal: 既定, small: 遅い・小さい)")
+    g.add_argument("--subtitle", action=argparse.BooleanOptionalAction, default=None,
+                   help="字幕を付ける")
+    g.add_argument("--update", action=argparse.BooleanOptionalAction, default=None,
+                   help="既存の出力から変更のないスライドの音声を再利用する (既定: 有効)")
+    g.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                   help="<config> タグと同じキーで設定を指定 (例: --set fontsize=24 --set kuten=。)")
+    g.add_argument("--ignore-config", action="store_true", help="ノートの <config> タグを読まない")
+
+    t = p.add_argument_group("計測")
+    t.add_argument("--profile", action="store_true",
+                   help="全ファイル合計の段階ごとの処理時間と通信量を表示する")
+    t.add_argument("--trace", metavar="FILE",
+                   help="Chrome trace-event 形式の JSON を書き出す (chrome://tracing や Perfetto で表示)")
+
+    c = p.add_argument_group("キャッシュ")
+    c.add_argument("--cache-dir", help="合成結果キャッシュのディレクトリ (全プロセスで共有)")
+    c.add_argument("--no-cache", action="store_true", help="合成結果キャッシュを使わない")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        set_config = _parse_set(args.set)
+    except argparse.ArgumentTypeError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 2
+    options = {name: getattr(args, name) for name in _OPTION_FIELDS if getattr(args, name) is not None}
+    if args.async_engine and not async_engine_available():
+        print("エラー: --async-engine には aiohttp が必要です (pip install aiohttp)", file=sys.stderr)
+        return 2
+
+    decks = _find_decks(args.inputs, args.suffix)
+    missing = [d for d in decks if not os.path.isfile(d)]
+    if missing:
+        print(f"エラー: ファイルが見つかりません: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    if not decks:
+        print("エラー: 入力 PPTX がありません", file=sys.stderr)
+        return 2
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = args.jobs if args.jobs > 0 else min(4, len(decks))
+    common = (set_config, options, not args.ignore_config, args.cache_dir, not args.no_cache)
+    results: list[GenerationResult] = []
+    t0 = time.perf_counter()
+    if jobs == 1:
+        for deck in decks:
+            result, _ = _run_deck(deck, _output_path(deck, args.output_dir, args.suffix), *common,
+                                  quiet=False)
+            if result.error:
+                print(f"エラー: {deck}: {result.error}")
+            results.append(result)
+    else:
+        print(f"{len(decks)} ファイルを {jobs} プロセスで処理します")
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(_run_deck, deck, _output_path(deck, args.output_dir, args.suffix),
+                            *common, quiet=not args.verbose): deck
+                for deck in decks
+            }
+            for future in as_completed(futures):
+                result, log = future.result()
+                if log and result.error:
+                    print(log, end="")
+                status = f"エラー: {result.error}" if result.error else f"→ {result.output_path}"
+                print(f"[{len(results) + 1}/{len(decks)}] {os.path.basename(futures[future])} {status}")
+                results.append(result)
+        order = {d: i for i, d in enumerate(decks)}
+        results.sort(key=lambda r: order[r.input_path])
+    wall_sec = time.perf_counter() - t0
+
+    print()
+    print(_format_report(results, wall_sec))
+    traces = [r.trace for r in results if r.trace is not None]
+    if args.profile and traces:
+        total = Trace()
+        for trace in traces:
+            total.merge(trace)
+        print("\n処理時間の内訳 (全ファイル合計):\n" + total.summary())
+    if args.trace:
+        # プロセスごとに pid が分かれるので、並列処理の様子もそのまま見られる
+        write_chrome_trace(args.trace, traces)
+        print(f"トレースを保存しました: {args.trace}")
+    return 1 if any(r.error for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""処理段階ごとの時間計測 (スパン) とカウンタ
+
+生成処理の各段階を span() で囲み、count() で通信回数・バイト数・キャッシュヒットなどを数える。
+recording() で Trace を有効にしている間だけ記録し、無効なときはほぼ何もしない。
+記録先はコンテキスト (スレッド・asyncio タスク) ごとなので、同時に複数の生成を別々に記録できる。
+スレッドプールのワーカーには引き継がれないため、submit する関数は bind_trace() で包む。
+
+    trace = Trace()
+    with recording(trace):
+        with span("concat_wav", sentences=3):
+            ...
+        count("http.requests")
+        pool.submit(bind_trace(work), ...)
+    print(trace.summary())
+    write_chrome_trace("trace.json", [trace])   # chrome://tracing や Perfetto で開く
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+
+@dataclass
+class Span:
+    """1 区間の記録。start は time.perf_counter() の値 (秒)。"""
+    name: str
+    start: float
+    duration: float
+    pid: int
+    tid: int
+    args: dict
+
+
+class Trace:
+    """スパンとカウンタの記録先 (スレッドセーフ)。ProcessPool から返せるよう pickle できる。"""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"spans": self.spans, "counters": self.counters}
+
+    def __setstate__(self, state):
+        self.spans = state["spans"]
+        self.counters = state["counters"]
+        self._lock = threading.Lock()
+
+    def add_span(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def add_count(self, name: str, n: int) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def merge(self, other: "Trace") -> None:
+        """他の Trace (別ファイル・別プロセスの記録) を取り込む。"""
+        with self._lock:
+            self.spans.extend(other.spans)
+            self.counters.update(other.counters)
+
+    def summary(self) -> str:
+        """段階ごとの回数・合計・平均・最大と、カウンタの一覧表。
+
+        並列に実行された段階は合計が経過時間を超えることがある。
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        stats: dict[str, list[float]] = {}
+        for s in spans:
+            stats.setdefault(s.name, []).append(s.duration)
+        lines = [f"  {'段階':<24} {'回数':>7} {'合計(秒)':>10} {'平均(ms)':>10} {'最大(ms)':>10}"]
+        for name, durations in sorted(stats.items(), key=lambda kv: -sum(kv[1])):
+            total = sum(durations)
+            lines.append(f"  {name:<24} {len(durations):>7} {total:>10.2f} "
+                         f"{total / len(durations) * 1000:>10.1f} {max(durations) * 1000:>10.1f}")
+        for name, value in sorted(counters.items()):
+            lines.append(f"  {name:<24} {_format_count(name, value):>7}")
+        return "\n".join(lines)
+
+    def chrome_events(self, origin: float | None = None) -> list[dict]:
+        """Chrome trace-event 形式 (完了イベント "X") のリスト。ts/dur はマイクロ秒。"""
+        with self._lock:
+            spans = list(self.spans)
+        if origin is None:
+            origin = min((s.start for s in spans), default=0.0)
+        return [
+            {"name": s.name, "ph": "X", "ts": (s.start - origin) * 1e6, "dur": s.duration * 1e6,
+             "pid": s.pid, "tid": s.tid, "args": s.args}
+            for s in spans
+        ]
+
+
+def _format_count(name: str, value: int) -> str:
+    if "bytes" in name:
+        if value >= 1024 * 1024:
+            return f"{value / (1024 * 1024):.1f}MB"
+        if value >= 1024:
+            return f"{value / 1024:.1f}KB"
+    return str(value)
+
+
+_active: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("ppvoice_trace", default=None)
+
+
+class _SpanTimer:
+    __slots__ = ("trace", "name", "args", "start")
+
+    def __init__(self, trace: Trace, name: str, args: dict):
+        self.trace = trace
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.trace.add_span(Span(self.name, self.start, end - self.start, os.getpid(),
+                                 threading.get_ident(), self.args))
+        return False
+
+
+def span(name: str, **args):
+    """区間を計測するコンテキストマネージャ。記録中でなければ何もしない。
+
+    args はトレースの各イベントに付ける補足情報 (スライド番号・文数など)。
+    """
+    trace = _active.get()
+    if trace is None:
+        return contextlib.nullcontext()
+    return _SpanTimer(trace, name, args)
+
+
+def count(name: str, n: int = 1) -> None:
+    """カウンタを n 増やす。記録中でなければ何もしない。"""
+    trace = _active.get()
+    if trace is not None:
+        trace.add_count(name, n)
+
+
+@contextlib.contextmanager
+def recording(trace: Trace):
+    """with の間、現在のコンテキストでの span() と count() の記録先を trace にする。"""
+    token = _active.set(trace)
+    try:
+        yield trace
+    finally:
+        _active.reset(token)
+
+
+def bind_trace(fn):
+    """fn を、呼び出した時点の記録先で記録しながら実行する関数にする。
+
+    ThreadPoolExecutor のワーカーは呼び出し元のコンテキストを引き継がないため、
+    submit / map に渡す関数はこれで包む。記録中でなければ fn をそのまま返す。
+    """
+    trace = _active.get()
+    if trace is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _active.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _active.reset(token)
+    return run
+
+
+def write_chrome_trace(path: str, traces: list[Trace]) -> None:
+    """複数の Trace (プロセスごとの記録など) を 1 つの Chrome trace-event JSON に書き出す。"""
+    starts = [s.start for t in traces for s in t.spans]
+    origin = min(starts, default=0.0)
+    events = [e for t in traces for e in t.chrome_events(origin)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
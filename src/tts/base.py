@@ -17,3 +17,19 @@ class TTSEngine(ABC):
             WAV形式の音声データ (bytes)
         """
         ...
+
+
+class AsyncTTSEngine(ABC):
+    """asyncio で使う音声合成エンジンの共通インターフェース (TTSEngine の非同期版)"""
+
+    @abstractmethod
+    async def synthesize(self, text: str) -> bytes:
+        """テキストからWAV音声バイナリを生成する (コルーチン)。
+
+        Args:
+            text: 読み上げるテキスト
+
+        Returns:
+            WAV形式の音声データ (bytes)
+        """
+        ...
@@ -0,0 +1,230 @@
+"""合成結果のディスクキャッシュ (内容アドレス方式)
+
+キーは合成結果に影響するパラメータ一式のハッシュで、値はファイルとして保存する。
+複数の PPVoice プロセスから同じディレクトリを共有しても壊れないよう、
+書き込みは一時ファイル + os.replace によるアトミックな置き換えで行う。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# エビクション時はこの割合まで削減する (毎回の put でエビクションが走らないように)
+_EVICT_TARGET_RATIO = 0.8
+# ロックファイルがこれより古ければ異常終了したプロセスの残骸とみなす (秒)
+_STALE_LOCK_SEC = 60.0
+
+
+def default_cache_dir() -> str:
+    """ユーザーごとのキャッシュディレクトリを返す。"""
+    base = (
+        os.environ.get("LOCALAPPDATA")
+        or os.environ.get("XDG_CACHE_HOME")
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    )
+    return os.path.join(base, "PPVoice", "cache")
+
+
+def make_key(*parts) -> str:
+    """JSON 化可能な値の組からキャッシュキー (sha256 hex) を生成する。"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """プロセス内の件数上限付き LRU (スレッドセーフ)。ディスクに置くまでもない小さな結果向け。"""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._items[key] = data
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+class DiskCache:
+    """サイズ上限付き LRU のディスクキャッシュ。
+
+    ファイルの mtime を最終アクセス時刻として扱い、get のたびに更新する。
+    合計サイズが上限を超えたら mtime の古い順に削除する。
+    エビクションはロックファイルで 1 プロセスずつ実行する。
+
+    memory_items > 0 の場合、直近のエントリをプロセス内にも保持し
+    ディスクの読み込みを省略する (小さなエントリ向け)。
+    """
+
+    def __init__(self, directory: str | None = None, max_bytes: int = 1024 ** 3,
+                 suffix: str = ".bin", memory_items: int = 0):
+        self.directory = directory or os.path.join(default_cache_dir(), "wav")
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.memory_items = memory_items
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self._approx_bytes: int | None = None  # None = 未計測
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, data: bytes) -> None:
+        """メモリ上の LRU に登録する (呼び出し側で _lock を保持すること)。"""
+        if self.memory_items <= 0:
+            return
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        # 1 ディレクトリ内のファイル数を抑えるため先頭 2 文字で振り分ける
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def get(self, key: str) -> bytes | None:
+        """キーに対応するデータを返す。存在しなければ None。"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            # 未登録、または他プロセスがエビクション中
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """データを保存する。書き込みに失敗してもエラーにはしない。"""
+        with self._lock:
+            self._remember(key, data)
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError:
+                # Windows では読み込み中のファイルを置き換えられない場合がある
+                # (同じキー = 同じ内容なので既存ファイルをそのまま使う)
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                return
+        except OSError:
+            return
+
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan_size()
+            else:
+                self._approx_bytes += len(data)
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _iter_entries(self):
+        """(path, size, mtime) を列挙する。"""
+        try:
+            shards = os.listdir(self.directory)
+        except OSError:
+            return
+        for shard in shards:
+            shard_dir = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            try:
+                names = os.listdir(shard_dir)
+            except OSError:
+                continue
+            for name in names:
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._iter_entries())
+
+    def evict(self) -> None:
+        """合計サイズが上限を超えていれば古いエントリから削除する。"""
+        lock_path = os.path.join(self.directory, ".evict.lock")
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # 他プロセスがエビクション中。古いロックなら取り除いて次回に任せる
+            try:
+                if time.time() - os.path.getmtime(lock_path) > _STALE_LOCK_SEC:
+                    os.remove(lock_path)
+            except OSError:
+                pass
+            return
+        except OSError:
+            return
+        os.close(fd)
+        try:
+            entries = sorted(self._iter_entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * _EVICT_TARGET_RATIO)
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            with self._lock:
+                self._approx_bytes = total
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        """全エントリを削除する。"""
+        for path, _, _ in list(self._iter_entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._memory.clear()
+            self._approx_bytes = 0
@@ -0,0 +1,84 @@
+"""話者一覧 (/speakers) のディスクキャッシュ
+
+/speakers の応答はエンジンによっては数百 KB あり、エンジンが遅い・起動していない場合は
+取得に時間がかかる。SpeakerCatalog はエンジンの URL ごとに最後に取得した一覧を
+/version の値と取得時刻とともに保存し、起動直後はそれをすぐに表示できるようにする。
+fetch() は /version が同じで TTL 内なら保存済みの一覧を返し、そうでなければ取得し直す。
+
+    catalog = SpeakerCatalog()
+    cached = catalog.cached(url)        # 通信しない (なければ None)
+    entry = catalog.fetch(url)          # 必要なときだけ /speakers を取得する
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass
+
+from .cache import DiskCache, default_cache_dir, make_key
+from .transport import parse_base_urls
+from .voicevox import VoicevoxEngine
+
+# 保存した一覧をそのまま使う期間 (秒)。/version が変わった場合は期間内でも取得し直す
+DEFAULT_TTL_SEC = 24 * 3600
+
+
+@dataclass
+class SpeakerList:
+    speakers: list[dict]  # /speakers の応答
+    version: str  # 取得したときのエンジンの /version (取得できなければ空文字)
+    fetched_at: float  # 取得時刻 (time.time())
+    from_cache: bool  # ディスクキャッシュから読んだ一覧か
+
+
+class SpeakerCatalog:
+    """エンジンの URL ごとの話者一覧のディスクキャッシュ。複数のプロセス・スレッドから使ってよい。"""
+
+    def __init__(self, directory: str | None = None, ttl_sec: float = DEFAULT_TTL_SEC):
+        self.cache = DiskCache(directory or os.path.join(default_cache_dir(), "speakers"),
+                               max_bytes=64 * 1024 ** 2, suffix=".json")
+        self.ttl_sec = ttl_sec
+
+    @staticmethod
+    def _key(url: str) -> str:
+        # 末尾の / や区切りの空白の違いで別のエントリにならないよう正規化する
+        return make_key("speakers", parse_base_urls(url))
+
+    def cached(self, url: str) -> SpeakerList | None:
+        """保存済みの一覧 (古くても返す)。なければ None。"""
+        data = self.cache.get(self._key(url))
+        if data is None:
+            return None
+        try:
+            entry = json.loads(data)
+            return SpeakerList(entry["speakers"], entry["version"], entry["fetched_at"], from_cache=True)
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def is_fresh(self, entry: SpeakerList, version: str) -> bool:
+        """entry がエンジンの現在の version のもので、TTL 内か。"""
+        return entry.version == version and time.time() - entry.fetched_at < self.ttl_sec
+
+    def fetch(self, url: str, force: bool = False) -> SpeakerList:
+        """話者一覧を返す。保存済みの一覧が使えなければ /speakers を取得して保存する。
+
+        Args:
+            force: 保存済みの一覧を使わずに必ず取得する
+
+        Raises:
+            requests.RequestException: エンジンに接続できない場合など
+        """
+        engine = VoicevoxEngine(base_url=url)
+        try:
+            version = engine.engine_version()
+            if not force:
+                cached = self.cached(url)
+                if cached is not None and self.is_fresh(cached, version):
+                    return cached
+            speakers = engine.list_speakers()
+        finally:
+            engine.transport.close()
+        entry = SpeakerList(speakers, version, time.time(), from_cache=False)
+        payload = {"url": url, "version": version, "fetched_at": entry.fetched_at, "speakers": speakers}
+        self.cache.put(self._key(url), json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        return entry
@@ -0,0 +1,355 @@
+"""VOICEVOX API 用の HTTP トランスポート
+
+requests.Session を共有してコネクションを再利用 (keep-alive) し、
+タイムアウト・リトライ・エンドポイントごとのレイテンシ計測をまとめて扱う。
+"""
+
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracing import count
+
+
+class SynthesisCancelled(Exception):
+    """合成 (またはその途中の HTTP リクエスト) が cancel_event により中断されたことを示す例外"""
+    pass
+
+
+@dataclass
+class EndpointStats:
+    """1エンドポイントの呼び出し統計。"""
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    total_sec: float = 0.0
+    max_sec: float = 0.0
+    bytes_received: int = 0
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_sec / self.calls * 1000 if self.calls else 0.0
+
+
+class LatencyRecorder:
+    """エンドポイントごとの呼び出し回数・レイテンシ・再試行回数を集計する (スレッドセーフ)。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[str, EndpointStats] = {}
+
+    def record(self, path: str, elapsed: float, error: bool = False, retry: bool = False,
+               nbytes: int = 0) -> None:
+        with self._lock:
+            st = self._stats.setdefault(path, EndpointStats())
+            if retry:
+                st.retries += 1
+                return
+            st.calls += 1
+            st.total_sec += elapsed
+            st.max_sec = max(st.max_sec, elapsed)
+            st.bytes_received += nbytes
+            if error:
+                st.errors += 1
+
+    def stats(self) -> dict[str, EndpointStats]:
+        """エンドポイントごとの統計のスナップショットを返す。"""
+        with self._lock:
+            return {k: EndpointStats(**vars(v)) for k, v in self._stats.items()}
+
+    def format_stats(self) -> str:
+        """統計を人が読める複数行の文字列にする。"""
+        lines = []
+        for path, st in sorted(self.stats().items()):
+            line = (f"  {path}: {st.calls} 回, 平均 {st.avg_ms:.0f}ms, "
+                    f"最大 {st.max_sec * 1000:.0f}ms")
+            if st.retries:
+                line += f", 再試行 {st.retries}"
+            if st.errors:
+                line += f", エラー {st.errors}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def parse_base_urls(base_url: str | list[str]) -> list[str]:
+    """"http://a:50021, http://b:50021" のような URL 指定をリストにする。"""
+    if isinstance(base_url, str):
+        base_url = re.split(r"[,\s]+", base_url)
+    urls = [u.strip().rstrip("/") for u in base_url if u and u.strip()]
+    if not urls:
+        raise ValueError("VOICEVOX の URL が指定されていません")
+    return urls
+
+
+@dataclass
+class EngineEndpoint:
+    """負荷分散対象のエンジン 1 台の状態。"""
+    url: str
+    in_flight: int = 0
+    calls: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    healthy: bool = True
+    retry_at: float = 0.0  # 退避中のエンジンを再確認する時刻 (time.monotonic)
+
+
+class EnginePool:
+    """複数のエンジンインスタンスへの振り分けを管理する。
+
+    処理中リクエスト数が最も少ない正常なエンジンを選ぶ。
+    max_failures 回続けて接続できなかったエンジンは退避させ、cooldown_sec 後に /version で
+    再確認して復帰させる (確認は呼び出し側が probe_candidates() で行う)。
+    最後の 1 台 (1 台構成ならそのエンジン) は一時的なエラーでは退避させない。
+    """
+
+    def __init__(self, urls: list[str], cooldown_sec: float = 10.0, max_failures: int = 2):
+        self.endpoints = [EngineEndpoint(u) for u in urls]
+        self.cooldown_sec = cooldown_sec
+        self.max_failures = max_failures
+        self._lock = threading.Lock()
+
+    def acquire(self) -> EngineEndpoint:
+        """リクエストを送るエンジンを選び、処理中数を増やす。"""
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy]
+            if not candidates:
+                # 全滅時は最も早く復帰予定のエンジンに送ってエラーを呼び出し側に返す
+                candidates = [min(self.endpoints, key=lambda e: e.retry_at)]
+            ep = min(candidates, key=lambda e: (e.in_flight, e.calls))
+            ep.in_flight += 1
+            ep.calls += 1
+            return ep
+
+    def release(self, ep: EngineEndpoint) -> None:
+        with self._lock:
+            ep.in_flight -= 1
+
+    def evict(self, ep: EngineEndpoint) -> None:
+        """エンジンを退避させる (/version の確認で応答しなかった場合など)。"""
+        with self._lock:
+            self._evict_locked(ep)
+
+    def _evict_locked(self, ep: EngineEndpoint) -> None:
+        ep.failures += 1
+        ep.healthy = False
+        ep.retry_at = time.monotonic() + self.cooldown_sec
+
+    def report_failure(self, ep: EngineEndpoint) -> None:
+        """リクエストの接続エラー・タイムアウトを記録し、続けて失敗したエンジンを退避させる。"""
+        with self._lock:
+            ep.consecutive_failures += 1
+            if not ep.healthy or ep.consecutive_failures < self.max_failures:
+                return
+            if not any(e.healthy for e in self.endpoints if e is not ep):
+                return  # 最後の正常なエンジンは退避させない (要求はそのまま再試行する)
+            ep.consecutive_failures = 0
+            self._evict_locked(ep)
+
+    def report_success(self, ep: EngineEndpoint) -> None:
+        """エンジンから応答があったことを記録する (連続失敗の回数を戻す)。"""
+        with self._lock:
+            ep.consecutive_failures = 0
+
+    def readmit(self, ep: EngineEndpoint) -> None:
+        with self._lock:
+            ep.healthy = True
+
+    def has_healthy(self) -> bool:
+        with self._lock:
+            return any(e.healthy for e in self.endpoints)
+
+    def probe_candidates(self) -> list[EngineEndpoint]:
+        """再確認の時刻を過ぎた退避中エンジンを返す。
+
+        同じエンジンを複数スレッドから同時に確認しないよう、返したエンジンの
+        再確認時刻は先送りする。
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = [e for e in self.endpoints if not e.healthy and e.retry_at <= now]
+            for e in due:
+                e.retry_at = now + self.cooldown_sec
+            return due
+
+    def format_summary(self) -> str:
+        """エンジンごとの振り分け状況を複数行の文字列にする。"""
+        with self._lock:
+            return "\n".join(
+                f"  {e.url}: {e.calls} 回{'' if e.healthy else ' (退避中)'}"
+                + (f", 接続失敗 {e.failures}" if e.failures else "")
+                for e in self.endpoints
+            )
+
+
+def _cap_timeout(timeout, remaining: float):
+    """requests の timeout 指定 (秒または (接続, 応答待ち)) の応答待ちを remaining 秒までに縮める。"""
+    if timeout is None:
+        return remaining
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return connect, remaining if read is None else min(read, remaining)
+    return min(timeout, remaining)
+
+
+class HttpTransport:
+    """コネクションプール付きの HTTP クライアント。
+
+    接続エラー・タイムアウト・5xx は指数バックオフで最大 retries 回まで再試行する。
+    ただし最初の送信から max_total_sec を過ぎたら再試行せず、各回の応答待ちも残り時間までに
+    縮める (応答しないエンジンで 1 件に read_timeout × 試行回数かかるのを防ぐ)。
+    cancel_event がセットされると、次の送信の前 (バックオフの待ち中を含む) に
+    SynthesisCancelled を送出する。
+    4xx は再試行せずにそのまま返す (呼び出し側で raise_for_status する)。
+
+    base_url に複数の URL を渡すと、リクエストごとに処理中数が最も少ない
+    エンジンへ振り分ける。最初のリクエスト時に全エンジンを /version で確認し、
+    接続できないエンジンは退避させて一定時間後に再確認する。
+
+    Args:
+        base_url: エンジンの URL (例: http://localhost:50021)。リストまたはカンマ区切りで複数指定可
+        pool_size: 同一ホストへの最大同時接続数 (並列ワーカー数に合わせる)
+        connect_timeout: 接続タイムアウト (秒)
+        read_timeout: 応答待ちタイムアウト (秒)。長文の合成を考慮して長めにする
+        retries: 再試行回数
+        backoff_sec: 初回再試行までの待ち時間 (秒)。以降 2 倍ずつ伸ばす
+        max_total_sec: 1 件のリクエストに再試行を含めてかける時間の上限 (秒)
+        cancel_event: セットされたら以降の送信・再試行をやめる
+    """
+
+    def __init__(self, base_url: str | list[str], pool_size: int = 8, connect_timeout: float = 5.0,
+                 read_timeout: float = 300.0, retries: int = 3, backoff_sec: float = 0.5,
+                 max_total_sec: float = 300.0, cancel_event: threading.Event | None = None):
+        self.base_urls = parse_base_urls(base_url)
+        self.base_url = self.base_urls[0]
+        self.engines = EnginePool(self.base_urls)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_sec = backoff_sec
+        self.max_total_sec = max_total_sec
+        self.cancel_event = cancel_event
+        self.pool_size = 0
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._checked = len(self.base_urls) == 1  # 1台なら事前確認は不要
+        self.latency = LatencyRecorder()
+        self.ensure_pool_size(pool_size)
+
+    def ensure_pool_size(self, pool_size: int) -> None:
+        """接続プールを pool_size 以上にする (縮小はしない)。"""
+        with self._lock:
+            if pool_size <= self.pool_size:
+                return
+            self.pool_size = pool_size
+            old = [self._session.adapters[prefix] for prefix in ("http://", "https://")]
+            adapter = HTTPAdapter(pool_connections=len(self.base_urls), pool_maxsize=pool_size,
+                                  max_retries=0)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+            # 置き換えたアダプタの接続プールを閉じる (処理中の接続は応答を読み終えてから閉じられる。
+            # http/https で同じアダプタを共有していても close は 2 回呼んでよい)
+            for prev in old:
+                prev.close()
+
+    def _is_alive(self, url: str) -> bool:
+        """/version に応答するか確認する。"""
+        try:
+            resp = self._session.get(f"{url}/version", timeout=(self.connect_timeout, self.connect_timeout))
+            return resp.status_code == 200
+        except requests.RequestException:
+            return False
+
+    def check_health(self) -> None:
+        """全エンジンを確認し、応答しないものを退避させる。"""
+        for ep in self.engines.endpoints:
+            if self._is_alive(ep.url):
+                self.engines.readmit(ep)
+            else:
+                self.engines.evict(ep)
+
+    def _probe_evicted(self) -> None:
+        """再確認時刻を過ぎた退避中エンジンを確認し、応答すれば復帰させる。"""
+        if not self._checked:
+            # 確認が終わるまで他のスレッドも待たせる (停止中のエンジンに送らないため)
+            with self._check_lock:
+                if not self._checked:
+                    self.check_health()
+                    self._checked = True
+        for ep in self.engines.probe_candidates():
+            if self._is_alive(ep.url):
+                self.engines.readmit(ep)
+
+    def _check_cancel(self) -> None:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise SynthesisCancelled()
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """path へのリクエストをいずれかのエンジンに送る。"""
+        timeout = kwargs.pop("timeout", (self.connect_timeout, self.read_timeout))
+        deadline = time.monotonic() + self.max_total_sec
+        attempt = 0
+        while True:
+            self._check_cancel()
+            self._probe_evicted()
+            ep = self.engines.acquire()
+            remaining = max(deadline - time.monotonic(), self.connect_timeout)
+            last = attempt >= self.retries or remaining <= self.connect_timeout
+            t0 = time.perf_counter()
+            try:
+                resp = self._session.request(method, f"{ep.url}{path}",
+                                             timeout=_cap_timeout(timeout, remaining), **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                elapsed = time.perf_counter() - t0
+                self.engines.report_failure(ep)
+                if last or time.monotonic() >= deadline:
+                    self.latency.record(path, elapsed, error=True)
+                    count("http.errors")
+                    raise
+            else:
+                elapsed = time.perf_counter() - t0
+                self.engines.report_success(ep)
+                if resp.status_code < 500 or last or time.monotonic() >= deadline:
+                    nbytes = 0 if kwargs.get("stream") else len(resp.content)
+                    self.latency.record(path, elapsed, error=resp.status_code >= 400, nbytes=nbytes)
+                    count("http.requests")
+                    count("http.bytes_sent", len(resp.request.body or b""))
+                    count("http.bytes_received", nbytes)
+                    if resp.status_code >= 400:
+                        count("http.errors")
+                    return resp
+                resp.close()
+            finally:
+                self.engines.release(ep)
+            self.latency.record(path, elapsed, retry=True)
+            count("http.retries")
+            # 他に正常なエンジンがあれば待たずにそちらへ送り直す
+            if len(self.base_urls) == 1 or not self.engines.has_healthy():
+                delay = min(self.backoff_sec * (2 ** attempt), max(deadline - time.monotonic(), 0.0))
+                if self.cancel_event is not None:
+                    self.cancel_event.wait(delay)
+                else:
+                    time.sleep(delay)
+            attempt += 1
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def stats(self) -> dict[str, EndpointStats]:
+        return self.latency.stats()
+
+    def format_stats(self) -> str:
+        text = self.latency.format_stats()
+        if len(self.base_urls) > 1:
+            text += "\n" + self.engines.format_summary()
+        return text
+
+    def close(self) -> None:
+        self._session.close()
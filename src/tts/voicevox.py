@@ -1,14 +1,36 @@
 """VOICEVOX音声合成エンジン"""
 
+import contextlib
+import functools
 import io
+import json
 import re
+import struct
+import tempfile
+import threading
 import wave
 import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
 
 import requests
 
+from tracing import bind_trace, count, span
+
 from .base import TTSEngine
+from .cache import DiskCache, MemoryCache, make_key
+from .transport import HttpTransport, SynthesisCancelled
+
+# VOICEVOX の標準の出力サンプリングレート (Hz)
+DEFAULT_SAMPLING_RATE = 24000
+
+# /multi_synthesis 1 回にまとめる上限 (推定の音声秒数・文数)。
+# 長いスライドでも最初のバッチから合成を始め、1 回の応答サイズを抑える
+_BATCH_MAX_SEC = 60.0
+_BATCH_MAX_SENTENCES = 16
+# /multi_synthesis の ZIP 応答をメモリに置く上限 (超えた分は一時ファイルに書き出す)
+_SPOOL_MAX_BYTES = 8 * 1024 ** 2
 
 # 読み指定パターン: {表示テキスト|読み} or {表示テキスト|読み|アクセント位置}
 _READING_PATTERN = re.compile(r"\{([^|}]+)\|([^|}]+)(?:\|(\d+))?\}")
@@ -229,10 +251,56 @@ def _split_sentences(text: str) -> tuple[list[str], list[float | None], float, l
     return [_restore(s) for s in sentences], pauses, leading_pause, next_positions
 
 
+@functools.lru_cache(maxsize=32)
+def _zero_block(num_bytes: int) -> bytes:
+    """指定バイト数のゼロ列 (同じ長さの無音は使い回す)。"""
+    return bytes(num_bytes)
+
+
 def _make_silence(params, duration_sec: float) -> bytes:
     """指定秒数の無音フレームデータを返す。"""
     num_frames = int(params.framerate * duration_sec)
-    return b"\x00" * (num_frames * params.nchannels * params.sampwidth)
+    return _zero_block(num_frames * params.nchannels * params.sampwidth)
+
+
+def _wav_data(chunk: bytes) -> tuple[wave._wave_params, memoryview]:
+    """WAVバイナリのパラメータと PCM データ部分 (コピーなしの memoryview) を返す。"""
+    view = memoryview(chunk)
+    if chunk[0:4] != b"RIFF" or chunk[8:12] != b"WAVE":
+        raise ValueError("WAV (RIFF) 形式ではありません")
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(chunk):
+        chunk_id = chunk[pos:pos + 4]
+        size = int.from_bytes(chunk[pos + 4:pos + 8], "little")
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            nchannels = int.from_bytes(chunk[body + 2:body + 4], "little")
+            framerate = int.from_bytes(chunk[body + 4:body + 8], "little")
+            sampwidth = int.from_bytes(chunk[body + 14:body + 16], "little") // 8
+            fmt = (nchannels, sampwidth, framerate)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV の fmt チャンクがありません")
+            # ストリーミング出力などでサイズが実データより大きい場合は末尾までとする
+            data = view[body:min(body + size, len(chunk))]
+            nchannels, sampwidth, framerate = fmt
+            nframes = len(data) // (nchannels * sampwidth)
+            return wave._wave_params(nchannels, sampwidth, framerate, nframes,
+                                     "NONE", "not compressed"), data
+        pos = body + size + (size & 1)
+    raise ValueError("WAV の data チャンクがありません")
+
+
+def _wav_header(params, data_bytes: int) -> bytes:
+    """PCM WAV のヘッダ (44 バイト) を返す。wave モジュールの出力と同じ形式。"""
+    block_align = params.nchannels * params.sampwidth
+    return (
+        b"RIFF" + struct.pack("<I", 36 + data_bytes) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, params.nchannels, params.framerate,
+                                params.framerate * block_align, block_align, params.sampwidth * 8)
+        + b"data" + struct.pack("<I", data_bytes)
+    )
 
 
 def _concat_wav(
@@ -243,50 +311,307 @@ def _concat_wav(
 ) -> tuple[bytes, list[tuple[str, int, int]]]:
     """複数のWAVバイナリを1つに結合する。
 
+    先に全体のフレーム数を求めてから各チャンクの PCM を1回だけコピーする
+    (文が増えても結合時間は線形)。
+
     Args:
         pauses: 各チャンク間の無音秒数 (len = len(wav_chunks) - 1)
         leading_pause: 最初のチャンクの前に挿入する無音秒数
 
     Returns:
-        (結合WAV, [(文テキスト, 開始ms, 長さms), ...])
+        (結合WAV, [(文テキスト, 開始ms, 長さms), ...])。wav_chunks が空なら (b"", [])
     """
-    all_frames = b""
-    params = None
+    if not wav_chunks:
+        return b"", []
     timings: list[tuple[str, int, int]] = []
+    # (出力中のオフセット, PCM データ or 無音バイト数) の並び
+    layout: list[tuple[int, memoryview | int]] = []
+    params = None
     current_ms = 0
+    offset = 0
+
+    def _add_silence(sec: float):
+        nonlocal offset, current_ms
+        nbytes = len(_make_silence(params, sec))
+        layout.append((offset, nbytes))
+        offset += nbytes
+        current_ms += int(sec * 1000)
 
     for i, chunk in enumerate(wav_chunks):
-        with io.BytesIO(chunk) as f:
-            with wave.open(f, "rb") as w:
-                if params is None:
-                    params = w.getparams()
-                    # 先頭の無音を挿入
-                    if leading_pause > 0:
-                        all_frames += _make_silence(params, leading_pause)
-                        current_ms += int(leading_pause * 1000)
-                frames = w.readframes(w.getnframes())
-                chunk_ms = int(w.getnframes() / w.getframerate() * 1000)
+        chunk_params, data = _wav_data(chunk)
+        if params is None:
+            params = chunk_params
+            # 先頭の無音を挿入
+            if leading_pause > 0:
+                _add_silence(leading_pause)
+        chunk_ms = int(chunk_params.nframes / chunk_params.framerate * 1000)
 
         if sentences:
             timings.append((sentences[i], current_ms, chunk_ms))
 
-        all_frames += frames
+        layout.append((offset, data))
+        offset += len(data)
         current_ms += chunk_ms
 
         if i < len(pauses):
             gap = pauses[i]
             if gap > 0:
-                all_frames += _make_silence(params, gap)
-                current_ms += int(gap * 1000)
+                _add_silence(gap)
 
     if len(wav_chunks) == 1 and not pauses and leading_pause <= 0:
         return wav_chunks[0], timings
 
-    out = io.BytesIO()
-    with wave.open(out, "wb") as w:
-        w.setparams(params)
-        w.writeframes(all_frames)
-    return out.getvalue(), timings
+    header = _wav_header(params, offset)
+    # 全体をゼロで確保してから PCM 部分だけを書き込む (無音部分は書き込み不要)。
+    # BytesIO は書き込み済みサイズと確保サイズが一致していれば getvalue() でコピーしない
+    buf = io.BytesIO()
+    total = len(header) + offset
+    buf.seek(total - 1)
+    buf.write(b"\x00")
+    buf.seek(0)
+    buf.write(header)
+    for pos, part in layout:
+        if not isinstance(part, int):
+            buf.seek(len(header) + pos)
+            buf.write(part)
+    return buf.getvalue(), timings
+
+
+@dataclass
+class _SlidePlan:
+    """1スライド分のノートを文に分割した結果と、文ごとの合成パラメータ。"""
+    display_sentences: list[str]
+    readings: list[str]
+    pauses: list[float]
+    leading_pause: float
+    next_positions: list[tuple[int, float]]
+    speeds: list[float | None]
+    pitches: list[float | None]
+    intonations: list[float | None]
+    volumes: list[float | None]
+    accents: list[list[tuple[str, int]]]
+    cache_keys: list[str | None]
+
+
+def _plan_text(text: str, pause_sec: float) -> _SlidePlan | None:
+    """ノートテキストを文に分割し、文ごとの合成パラメータを求める。
+
+    合成する文がなければ None を返す。cache_keys はすべて None で返す。
+    """
+    if not text:
+        return None
+
+    # <config> タグを事前除去 (configだけの行が空文にならないよう)
+    text = _CONFIG_TAG.sub("", text)
+
+    sentences, pause_gaps, leading_pause, next_positions = _split_sentences(text)
+    if not sentences:
+        return None
+
+    # pause_gaps の None をデフォルト pause_sec に置換
+    pauses = [g if g is not None else pause_sec for g in pause_gaps]
+
+    display_sentences = [_to_display(s) for s in sentences]
+    readings = [_to_reading(s) for s in sentences]
+
+    # 各文の <speed>/<pitch>/<intonation>/<volume> タグを抽出 (最後にマッチした値を使用)
+    speed_per_sent: list[float | None] = []
+    pitch_per_sent: list[float | None] = []
+    intonation_per_sent: list[float | None] = []
+    volume_per_sent: list[float | None] = []
+    for s in sentences:
+        sm = list(_SPEED_TAG.finditer(s))
+        speed_per_sent.append(float(sm[-1].group(1)) if sm else None)
+        pm = list(_PITCH_TAG.finditer(s))
+        pitch_per_sent.append(float(pm[-1].group(1)) if pm else None)
+        im = list(_INTONATION_TAG.finditer(s))
+        intonation_per_sent.append(float(im[-1].group(1)) if im else None)
+        vm = list(_VOLUME_TAG.finditer(s))
+        volume_per_sent.append(float(vm[-1].group(1)) if vm else None)
+
+    return _SlidePlan(
+        display_sentences=display_sentences,
+        readings=readings,
+        pauses=pauses,
+        leading_pause=leading_pause,
+        next_positions=next_positions,
+        speeds=speed_per_sent,
+        pitches=pitch_per_sent,
+        intonations=intonation_per_sent,
+        volumes=volume_per_sent,
+        # 各文のアクセント指定を抽出
+        accents=[_extract_accents(s) for s in sentences],
+        cache_keys=[None] * len(sentences),
+    )
+
+
+def display_sentences(text: str) -> list[str]:
+    """ノートテキストを合成と同じ規則で文に分割し、字幕に表示する文のリストを返す。"""
+    # 文の分割は無音の長さに依らない
+    plan = _plan_text(text, 0.0)
+    return plan.display_sentences if plan else []
+
+
+def count_next_tags(text: str) -> int:
+    """ノートテキストの <next> の数 ({...} でエスケープしたものは数えない)。"""
+    stripped = _READING_PATTERN.sub("", text)
+    stripped = _BRACE_PATTERN.sub("", stripped)
+    return len(_NEXT_TAG.findall(stripped))
+
+
+def _effective_scales(plan: _SlidePlan, i: int,
+                      defaults: tuple[float, float, float, float]) -> tuple[float, float, float, float]:
+    """文中のタグ指定があればそれを、なければ defaults を使った (速度, ピッチ, 抑揚, 音量)。"""
+    tagged = (plan.speeds[i], plan.pitches[i], plan.intonations[i], plan.volumes[i])
+    return tuple(t if t is not None else d for t, d in zip(tagged, defaults))
+
+
+def _apply_scales(query: dict, scales: tuple[float, float, float, float]) -> dict:
+    """音声クエリに (速度, ピッチ, 抑揚, 音量) を設定する。"""
+    query["speedScale"], query["pitchScale"], query["intonationScale"], query["volumeScale"] = scales
+    return query
+
+
+def _apply_output_format(query: dict, sampling_rate: int, stereo: bool) -> dict:
+    """音声クエリに出力のサンプリングレートとステレオ指定を設定する。"""
+    query["outputSamplingRate"] = sampling_rate
+    query["outputStereo"] = stereo
+    return query
+
+
+def _wav_key(version: str, speaker_id: int, reading: str,
+             scales: tuple[float, float, float, float], accents: list[tuple[str, int]],
+             output_format: tuple[int, bool] = (DEFAULT_SAMPLING_RATE, False)) -> str:
+    """1文の合成結果のキャッシュキー。"""
+    return make_key("wav", version, speaker_id, reading, *scales, accents, *output_format)
+
+
+def _query_key(version: str, speaker_id: int, text: str) -> str:
+    """/audio_query の結果のキャッシュキー。"""
+    return make_key("audio_query", version, speaker_id, text)
+
+
+def _estimate_query_sec(query: dict) -> float:
+    """音声クエリから合成後の音声の長さ (秒) を見積もる。"""
+    total = query.get("prePhonemeLength", 0.1) + query.get("postPhonemeLength", 0.1)
+    for phrase in query.get("accent_phrases", []):
+        for mora in phrase.get("moras", []):
+            total += (mora.get("consonant_length") or 0) + (mora.get("vowel_length") or 0)
+        pause = phrase.get("pause_mora")
+        if pause:
+            total += pause.get("vowel_length") or 0
+    return total / max(query.get("speedScale") or 1.0, 0.1)
+
+
+def _accent_key(version: str, speaker_id: int, phrases: list[dict]) -> str:
+    """アクセント位置を書き換えた accent_phrases のピッチ再計算結果のキャッシュキー。"""
+    return make_key("accent_phrases", version, speaker_id, phrases)
+
+
+# エンジンがエンドポイント自体に対応していないことを示すステータス
+_UNSUPPORTED_STATUS = (404, 405)
+# メモリに保持するピッチ再計算結果の件数 (1 件は数 KB。超えた分は query_cache から読み直す)
+_ACCENT_MEMO_ITEMS = 1024
+
+
+class _KeyLocks:
+    """キーごとのロック。待っているスレッドがいなくなったキーのロックは捨てる。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks: dict[str, list] = {}  # キー → [ロック, 保持・待機中のスレッド数]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @contextlib.contextmanager
+    def hold(self, key: str):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+
+class _AccentEndpoints:
+    """アクセント再計算に使うエンドポイント (mora_pitch → mora_data の順に試す)。
+
+    未対応 (404/405) と分かったエンドポイントは記憶して以降は呼ばない。
+    一時的なエラーでは除外しない。エンジンのインスタンスごとに持つ。
+    confirmed になるまで (使えるエンドポイントが分かるまで) は、呼び出し側が
+    問い合わせを 1 件ずつに絞り、並列の文がそろって未対応のエンドポイントを叩かないようにする。
+    """
+
+    def __init__(self):
+        self._candidates = ["mora_pitch", "mora_data"]
+        self._lock = threading.Lock()
+        self._warned = False
+        self.confirmed = False
+
+    def candidates(self) -> list[str]:
+        with self._lock:
+            return list(self._candidates)
+
+    def mark_unsupported(self, endpoint: str) -> None:
+        with self._lock:
+            if endpoint in self._candidates:
+                self._candidates.remove(endpoint)
+            if not self._candidates:
+                self.confirmed = True
+
+    def mark_supported(self, endpoint: str) -> None:
+        with self._lock:
+            self.confirmed = True
+
+    def warn_once(self) -> bool:
+        """全エンドポイントが未対応になった最初の 1 回だけ True を返す。"""
+        with self._lock:
+            if self._candidates or self._warned:
+                return False
+            self._warned = True
+            return True
+
+
+def _finish_plan(plan: _SlidePlan, wav_chunks: list[bytes],
+                 ) -> tuple[bytes, list[tuple[str, int, int]], list[tuple[int, float]]]:
+    """文ごとの WAV を結合し、synthesize_with_timings と同じ形式で返す。"""
+    with span("concat_wav", sentences=len(wav_chunks)):
+        wav, timings = _concat_wav(wav_chunks, pauses=plan.pauses, sentences=plan.display_sentences,
+                                   leading_pause=plan.leading_pause)
+    return wav, timings, plan.next_positions
+
+
+def _mark_accents(phrases: list[dict], accents: list[tuple[str, int]]) -> bool:
+    """accent_phrases 中の該当フレーズのアクセント位置を書き換える。
+
+    Returns: 1つでも書き換えたら True (ピッチの再計算が必要)
+    """
+    modified = False
+    for katakana, accent_pos in accents:
+        matched = None
+        # 完全一致を優先検索
+        for phrase in phrases:
+            mora_text = "".join(m["text"] for m in phrase["moras"])
+            if mora_text == katakana:
+                matched = phrase
+                break
+        # 見つからなければ前方一致 (助詞が結合されている場合: ハシヲ vs ハシ)
+        if matched is None:
+            for phrase in phrases:
+                mora_text = "".join(m["text"] for m in phrase["moras"])
+                if mora_text.startswith(katakana) and len(katakana) >= 2:
+                    matched = phrase
+                    break
+        if matched is not None:
+            matched["accent"] = accent_pos
+            modified = True
+    return modified
 
 
 class VoicevoxEngine(TTSEngine):
@@ -294,102 +619,231 @@ class VoicevoxEngine(TTSEngine):
 
     事前にVOICEVOXエンジンを起動しておく必要がある。
     デフォルトで http://localhost:50021 に接続する。
+
+    wav_cache を渡すと、文ごとの合成結果 (結合前の WAV) をディスクにキャッシュし、
+    同じ文・同じパラメータの再合成では /audio_query も /multi_synthesis も呼ばない。
+    query_cache を渡すと、/audio_query の結果 (速度等を上書きする前の JSON) を
+    (テキスト, 話者, エンジンバージョン) ごとにキャッシュし、
+    パラメータだけを変えた再合成ではテキスト解析を省略する。
+
+    HTTP 通信は HttpTransport (keep-alive・タイムアウト・リトライ付き) を通して行う。
+    transport を渡せば複数のエンジンインスタンスで接続プールを共有できる。
+    cancel_event を渡すと (transport を作る場合は) 再試行の前にも中断を確認する。
+    base_url にリストまたはカンマ区切りで複数の URL を渡すと、起動済みの複数の
+    VOICEVOX エンジンへリクエストを振り分ける (同じバージョンのエンジンを並べること)。
+
+    output_sampling_rate / output_stereo で出力 WAV の形式を指定する。
+    読み上げ用途なら 16000Hz でも十分で、通信量と埋め込み後のファイルサイズを減らせる。
+    文間の無音や再生時間は各 WAV のヘッダから求めるため、指定に合わせて変わる。
     """
 
-    def __init__(self, speaker_id: int = 1, base_url: str = "http://localhost:50021",
+    def __init__(self, speaker_id: int = 1, base_url: str | list[str] = "http://localhost:50021",
                  pause_sec: float = 0.5, speed_scale: float = 1.0, pitch_scale: float = 0.0,
-                 intonation_scale: float = 1.0, volume_scale: float = 1.0):
+                 intonation_scale: float = 1.0, volume_scale: float = 1.0,
+                 wav_cache: DiskCache | None = None, query_cache: DiskCache | None = None,
+                 transport: HttpTransport | None = None,
+                 output_sampling_rate: int = DEFAULT_SAMPLING_RATE, output_stereo: bool = False,
+                 cancel_event: threading.Event | None = None):
         self.speaker_id = speaker_id
-        self.base_url = base_url.rstrip("/")
+        self.transport = transport or HttpTransport(base_url, cancel_event=cancel_event)
+        self.base_url = self.transport.base_url
         self.pause_sec = pause_sec
         self.speed_scale = speed_scale
         self.pitch_scale = pitch_scale
         self.intonation_scale = intonation_scale
         self.volume_scale = volume_scale
-
-    def _audio_query(self, text: str, speed: float | None = None, pitch: float | None = None,
-                     intonation: float | None = None, volume: float | None = None) -> dict:
-        """テキストから音声クエリを取得する。"""
-        resp = requests.post(
-            f"{self.base_url}/audio_query",
-            params={"text": text, "speaker": self.speaker_id},
-        )
-        resp.raise_for_status()
-        query = resp.json()
-        query["speedScale"] = speed if speed is not None else self.speed_scale
-        query["pitchScale"] = pitch if pitch is not None else self.pitch_scale
-        query["intonationScale"] = intonation if intonation is not None else self.intonation_scale
-        query["volumeScale"] = volume if volume is not None else self.volume_scale
-        return query
+        self.output_sampling_rate = output_sampling_rate
+        self.output_stereo = output_stereo
+        self.wav_cache = wav_cache
+        self.query_cache = query_cache
+        self._version: str | None = None
+        self._version_lock = threading.Lock()
+        self._accent_endpoints = _AccentEndpoints()
+        self._accent_probe_lock = threading.Lock()
+        # ピッチ再計算結果 (_accent_key → JSON バイト列) と、同じキーの同時問い合わせを防ぐロック
+        self._accent_memo = MemoryCache(_ACCENT_MEMO_ITEMS)
+        self._accent_locks = _KeyLocks()
+
+    def engine_version(self) -> str:
+        """エンジンのバージョン文字列を返す (/version)。取得できなければ空文字。
+
+        キャッシュキーに含めるため、1 インスタンスにつき 1 回だけ問い合わせる。
+        """
+        with self._version_lock:
+            if self._version is None:
+                try:
+                    resp = self.transport.get("/version")
+                    resp.raise_for_status()
+                    self._version = str(resp.json())
+                except (requests.RequestException, ValueError):
+                    self._version = ""
+            return self._version
+
+    def _wav_cache_key(self, plan: _SlidePlan, i: int) -> str | None:
+        """plan の i 番目の文の合成結果のキャッシュキーを返す。キャッシュ無効時は None。"""
+        if self.wav_cache is None:
+            return None
+        version = self.engine_version()
+        if not version:
+            # バージョン不明のエンジンでは古い結果を使い回す危険があるためキャッシュしない
+            return None
+        return _wav_key(version, self.speaker_id, plan.readings[i], self._scales(plan, i), plan.accents[i],
+                        (self.output_sampling_rate, self.output_stereo))
+
+    def _raw_audio_query(self, text: str) -> dict:
+        """/audio_query の結果をそのまま返す (呼び出しごとに新しい dict)。
+
+        結果はテキストと話者だけで決まるため、query_cache があれば再利用する。
+        キャッシュには JSON のバイト列を保存し、呼び出し側が書き換えても影響しない。
+        """
+        key = None
+        if self.query_cache is not None:
+            version = self.engine_version()
+            if version:
+                key = _query_key(version, self.speaker_id, text)
+                raw = self.query_cache.get(key)
+                if raw is not None:
+                    count("cache.query.hit")
+                    return json.loads(raw)
+                count("cache.query.miss")
+        with span("audio_query", chars=len(text)):
+            resp = self.transport.post(
+                "/audio_query",
+                params={"text": text, "speaker": self.speaker_id},
+            )
+            resp.raise_for_status()
+        if key is not None:
+            self.query_cache.put(key, resp.content)
+        return resp.json()
 
     def _apply_accent_overrides(self, query: dict, accents: list[tuple[str, int]]) -> dict:
         """accent_phrases のアクセント位置を上書きし、ピッチを再計算する。"""
         if not accents:
             return query
         phrases = query.get("accent_phrases", [])
-        modified = False
-        for katakana, accent_pos in accents:
-            matched = None
-            # 完全一致を優先検索
-            for phrase in phrases:
-                mora_text = "".join(m["text"] for m in phrase["moras"])
-                if mora_text == katakana:
-                    matched = phrase
-                    break
-            # 見つからなければ前方一致 (助詞が結合されている場合: ハシヲ vs ハシ)
-            if matched is None:
-                for phrase in phrases:
-                    mora_text = "".join(m["text"] for m in phrase["moras"])
-                    if mora_text.startswith(katakana) and len(katakana) >= 2:
-                        matched = phrase
-                        break
-            if matched is not None:
-                matched["accent"] = accent_pos
-                modified = True
-        if modified:
-            # mora_pitch でピッチ再計算 (失敗時は mora_data を試す)
-            recalculated = False
-            for endpoint in ("mora_pitch", "mora_data"):
-                try:
-                    resp = requests.post(
-                        f"{self.base_url}/{endpoint}",
-                        params={"speaker": self.speaker_id},
-                        json=phrases,
-                    )
-                    resp.raise_for_status()
-                    query["accent_phrases"] = resp.json()
-                    recalculated = True
-                    break
-                except requests.RequestException:
-                    continue
-            if not recalculated:
+        if _mark_accents(phrases, accents):
+            recalculated = self._recalc_accent_phrases(phrases)
+            if recalculated is not None:
+                query["accent_phrases"] = recalculated
+            elif self._accent_endpoints.candidates() or self._accent_endpoints.warn_once():
                 print("[PPVoice] アクセント再計算に失敗しました (mora_pitch/mora_data 未対応)")
         return query
 
-    def _synthesize_chunk(self, text: str) -> bytes:
-        """1文のテキストからWAV音声を生成する。"""
-        audio_query = self._audio_query(text)
-        synth_resp = requests.post(
-            f"{self.base_url}/synthesis",
-            params={"speaker": self.speaker_id},
-            json=audio_query,
-        )
-        synth_resp.raise_for_status()
-        return synth_resp.content
+    def _recalc_accent_phrases(self, phrases: list[dict]) -> list[dict] | None:
+        """アクセント位置を書き換えた accent_phrases のピッチを再計算する。再計算できなければ None。
+
+        結果は (phrases, 話者) ごとにメモリと query_cache にキャッシュし、
+        同じ読み・アクセント指定の文が繰り返し出てきてもエンジンには 1 回しか問い合わせない。
+        """
+        version = self.engine_version() if self.query_cache is not None else ""
+        key = _accent_key(version, self.speaker_id, phrases)
+        raw = self._accent_memo.get(key)
+        if raw is not None:
+            count("cache.accent.hit")
+            return json.loads(raw)
+        with self._accent_locks.hold(key):
+            raw = self._accent_memo.get(key)
+            if raw is None and version:
+                raw = self.query_cache.get(key)
+            if raw is not None:
+                count("cache.accent.hit")
+                return json.loads(raw)
+
+            probing = not self._accent_endpoints.confirmed
+            with self._accent_probe_lock if probing else contextlib.nullcontext():
+                for endpoint in self._accent_endpoints.candidates():
+                    try:
+                        with span(endpoint):
+                            resp = self.transport.post(
+                                f"/{endpoint}",
+                                params={"speaker": self.speaker_id},
+                                json=phrases,
+                            )
+                            resp.raise_for_status()
+                    except requests.HTTPError as e:
+                        if e.response is not None and e.response.status_code in _UNSUPPORTED_STATUS:
+                            self._accent_endpoints.mark_unsupported(endpoint)
+                        continue
+                    except requests.RequestException:
+                        continue
+                    self._accent_endpoints.mark_supported(endpoint)
+                    self._accent_memo.put(key, resp.content)
+                    if version:
+                        self.query_cache.put(key, resp.content)
+                    return resp.json()
+        return None
 
     def _multi_synthesis(self, queries: list[dict]) -> list[bytes]:
-        """複数の音声クエリを一括合成し、WAVリストを返す。"""
-        resp = requests.post(
-            f"{self.base_url}/multi_synthesis",
-            params={"speaker": self.speaker_id},
-            json=queries,
-        )
-        resp.raise_for_status()
-        wav_list = []
-        with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
-            for name in sorted(zf.namelist()):
-                wav_list.append(zf.read(name))
-        return wav_list
+        """複数の音声クエリを一括合成し、WAVリストを返す。
+
+        ZIP 応答は一度に読み込まず、SpooledTemporaryFile (一定サイズを超えたら
+        ディスク) に流し込んでから展開する。
+        """
+        with span("multi_synthesis", sentences=len(queries)):
+            resp = self.transport.post(
+                "/multi_synthesis",
+                params={"speaker": self.speaker_id},
+                json=queries,
+                stream=True,
+            )
+            with resp, tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES) as spool:
+                resp.raise_for_status()
+                for block in resp.iter_content(chunk_size=64 * 1024):
+                    spool.write(block)
+                count("http.bytes_received", spool.tell())
+                spool.seek(0)
+                with zipfile.ZipFile(spool) as zf:
+                    return [zf.read(name) for name in sorted(zf.namelist())]
+
+    def _synthesize_batch(self, batch: list[tuple[_SlidePlan, int, dict]]) -> list[bytes]:
+        """(plan, 文番号, 音声クエリ) のバッチを /multi_synthesis で合成し、キャッシュに保存する。
+
+        バッチにはスライドをまたいで文を入れてよい。
+        """
+        synthesized = self._multi_synthesis([query for _, _, query in batch])
+        for (plan, i, _), wav_chunk in zip(batch, synthesized):
+            if plan.cache_keys[i] is not None:
+                self.wav_cache.put(plan.cache_keys[i], wav_chunk)
+        return synthesized
+
+    def _plan(self, text: str) -> _SlidePlan | None:
+        """ノートテキストを文に分割し、文ごとの合成パラメータとキャッシュキーを求める。
+
+        合成する文がなければ None を返す。
+        """
+        plan = _plan_text(text, self.pause_sec)
+        if plan is not None and self.wav_cache is not None:
+            plan.cache_keys = [self._wav_cache_key(plan, i) for i in range(len(plan.readings))]
+        return plan
+
+    def _scales(self, plan: _SlidePlan, i: int) -> tuple[float, float, float, float]:
+        """plan の i 番目の文に適用する (速度, ピッチ, 抑揚, 音量) を返す。"""
+        return _effective_scales(plan, i, (self.speed_scale, self.pitch_scale,
+                                           self.intonation_scale, self.volume_scale))
+
+    def _cached_chunk(self, plan: _SlidePlan, i: int) -> bytes | None:
+        """plan の i 番目の文の合成結果をキャッシュから取り出す。"""
+        key = plan.cache_keys[i]
+        if key is None:
+            return None
+        wav_chunk = self.wav_cache.get(key)
+        count("cache.wav.hit" if wav_chunk is not None else "cache.wav.miss")
+        return wav_chunk
+
+    def _query_for(self, plan: _SlidePlan, i: int) -> dict:
+        """plan の i 番目の文の音声クエリを取得する (アクセント上書き込み)。"""
+        query = _apply_scales(self._raw_audio_query(plan.readings[i]), self._scales(plan, i))
+        _apply_output_format(query, self.output_sampling_rate, self.output_stereo)
+        if plan.accents[i]:
+            query = self._apply_accent_overrides(query, plan.accents[i])
+        return query
+
+    def _prepare_sentence(self, plan: _SlidePlan, i: int) -> tuple[bytes | None, dict | None]:
+        """plan の i 番目の文を、キャッシュにあれば (WAV, None)、なければ (None, 音声クエリ) にする。"""
+        wav_chunk = self._cached_chunk(plan, i)
+        if wav_chunk is not None:
+            return wav_chunk, None
+        return None, self._query_for(plan, i)
 
     def synthesize(self, text: str, on_chunk=None) -> bytes:
         """テキストからWAV音声を生成する。長文は文単位で分割して合成・結合する。"""
@@ -401,7 +855,9 @@ class VoicevoxEngine(TTSEngine):
     ) -> tuple[bytes, list[tuple[str, int, int]], list[tuple[int, float]]]:
         """テキストからWAV音声を生成し、各文のタイミング情報も返す。
 
-        audio_query を並列実行し、multi_synthesis で一括合成する。
+        audio_query を並列実行し、揃ったクエリから順に multi_synthesis で合成する。
+        バッチは推定の音声長 (_BATCH_MAX_SEC) と文数 (_BATCH_MAX_SENTENCES) で区切り、
+        残りの audio_query と並行して合成を進める。
 
         Args:
             on_chunk: コールバック on_chunk(chunk_index, total, sentence_text)
@@ -411,69 +867,163 @@ class VoicevoxEngine(TTSEngine):
             (WAVバイナリ, [(文テキスト, 開始ms, 長さms), ...],
              [(sentence_index, char_ratio), ...])
         """
-        if not text:
-            return b"", [], []
-
-        # <config> タグを事前除去 (configだけの行が空文にならないよう)
-        text = _CONFIG_TAG.sub("", text)
-
-        sentences, pause_gaps, leading_pause, next_positions = _split_sentences(text)
-        if not sentences:
+        plan = self._plan(text)
+        if plan is None:
             return b"", [], []
+        total = len(plan.readings)
+
+        # --- キャッシュ済みの文を取り出す ---
+        wav_chunks: list[bytes | None] = [None] * total
+        for i in range(total):
+            wav_chunks[i] = self._cached_chunk(plan, i)
+            if wav_chunks[i] is not None and on_chunk:
+                on_chunk(i, total, plan.display_sentences[i])
+        missing = [i for i, w in enumerate(wav_chunks) if w is None]
+
+        if missing:
+            # 合成は同時に (エンジンの台数) バッチまで。audio_query とは別の接続を使う
+            synth_workers = len(self.transport.base_urls)
+            self.transport.ensure_pool_size(max_workers + synth_workers)
+            batch: list[tuple[_SlidePlan, int, dict]] = []
+            batch_sec = 0.0
+            batches = {}
+            with ThreadPoolExecutor(max_workers=max_workers) as pool, \
+                    ThreadPoolExecutor(max_workers=synth_workers) as synth_pool:
+                # --- audio_query (+ アクセント上書き) を並列実行 ---
+                query_for = bind_trace(self._query_for)
+                synthesize_batch = bind_trace(self._synthesize_batch)
+                futures = {pool.submit(query_for, plan, i): i for i in missing}
+                for future in as_completed(futures):
+                    idx = futures[future]
+                    query = future.result()
+                    if on_chunk:
+                        on_chunk(idx, total, plan.display_sentences[idx])
+                    # --- 揃ったクエリからバッチにして multi_synthesis に回す ---
+                    batch.append((plan, idx, query))
+                    batch_sec += _estimate_query_sec(query)
+                    if batch_sec >= _BATCH_MAX_SEC or len(batch) >= _BATCH_MAX_SENTENCES:
+                        batches[synth_pool.submit(synthesize_batch, batch)] = batch
+                        batch, batch_sec = [], 0.0
+                if batch:
+                    batches[synth_pool.submit(synthesize_batch, batch)] = batch
+                for future, items in batches.items():
+                    for (_, i, _), wav_chunk in zip(items, future.result()):
+                        wav_chunks[i] = wav_chunk
+
+        return _finish_plan(plan, wav_chunks)
+
+    def synthesize_deck(
+        self, texts: list[str], on_chunk=None, on_slide=None,
+        max_in_flight: int = 8, cancel_event: threading.Event | None = None, on_slide_start=None,
+    ) -> list[tuple[bytes, list[tuple[str, int, int]], list[tuple[int, float]]]]:
+        """複数スライドのノートをまとめて合成する。
+
+        スライドの境界に関係なく文単位で audio_query を最大 max_in_flight 件まで同時に
+        実行し、揃ったクエリをスライドをまたいだバッチにして multi_synthesis で合成する。
+        バッチは合成中の接続が空いたら (エンジンを遊ばせないよう) すぐに送り、
+        合成が詰まっている間は推定の音声長 (_BATCH_MAX_SEC) と文数 (_BATCH_MAX_SENTENCES)
+        まで溜める。1〜2文しかないスライドが続いても 1 文ずつ合成を依頼することはない。
+        文の合成順は不定だが、結合は各スライドの全文が揃ってから文の順に行うため
+        出力とタイミングは逐次合成と同じになる。
 
-        # pause_gaps の None をデフォルト pause_sec に置換
-        pauses = [g if g is not None else self.pause_sec for g in pause_gaps]
-
-        display_sentences = [_to_display(s) for s in sentences]
-        readings = [_to_reading(s) for s in sentences]
-
-        # 各文の <speed>/<pitch>/<intonation>/<volume> タグを抽出 (最後にマッチした値を使用)
-        speed_per_sent: list[float | None] = []
-        pitch_per_sent: list[float | None] = []
-        intonation_per_sent: list[float | None] = []
-        volume_per_sent: list[float | None] = []
-        for s in sentences:
-            sm = list(_SPEED_TAG.finditer(s))
-            speed_per_sent.append(float(sm[-1].group(1)) if sm else None)
-            pm = list(_PITCH_TAG.finditer(s))
-            pitch_per_sent.append(float(pm[-1].group(1)) if pm else None)
-            im = list(_INTONATION_TAG.finditer(s))
-            intonation_per_sent.append(float(im[-1].group(1)) if im else None)
-            vm = list(_VOLUME_TAG.finditer(s))
-            volume_per_sent.append(float(vm[-1].group(1)) if vm else None)
+        Args:
+            texts: スライドごとのノートテキスト (空文字は音声なし)
+            on_chunk: コールバック on_chunk(slide_pos, chunk_index, total, sentence_text)
+                文の合成が完了するたびに (完了順で) 呼ばれる。例外を送出すると中断する
+            on_slide: コールバック on_slide(slide_pos, result)
+                スライドの合成が完了するたびに、texts の順で呼ばれる
+            max_in_flight: 同時に実行する audio_query の数
+            cancel_event: セットされたら未着手のジョブを破棄して SynthesisCancelled を送出
+            on_slide_start: コールバック on_slide_start(slide_pos, total)
+                スライドの最初の文の処理を開始するときに呼ばれる
 
-        # 各文のアクセント指定を抽出
-        accents_per_sent = [_extract_accents(s) for s in sentences]
-
-        # --- audio_query を並列実行 ---
-        queries = [None] * len(readings)
-        with ThreadPoolExecutor(max_workers=max_workers) as pool:
-            futures = {
-                pool.submit(self._audio_query, r, speed_per_sent[i], pitch_per_sent[i],
-                            intonation_per_sent[i], volume_per_sent[i]): i
-                for i, r in enumerate(readings)
-            }
-            done_count = 0
-            for future in as_completed(futures):
-                idx = futures[future]
-                queries[idx] = future.result()
-                done_count += 1
-                if on_chunk:
-                    on_chunk(idx, len(sentences), display_sentences[idx])
-
-        # --- アクセント上書き ---
-        for i, accents in enumerate(accents_per_sent):
-            if accents:
-                queries[i] = self._apply_accent_overrides(queries[i], accents)
-
-        # --- multi_synthesis で一括合成 ---
-        wav_chunks = self._multi_synthesis(queries)
-
-        wav, timings = _concat_wav(wav_chunks, pauses=pauses, sentences=display_sentences, leading_pause=leading_pause)
-        return wav, timings, next_positions
+        Returns:
+            texts と同じ順の [(WAVバイナリ, タイミング, next_positions), ...]
+        """
+        max_in_flight = max(1, max_in_flight)
+        plans = [self._plan(t) for t in texts]
+        results: list[tuple | None] = [None] * len(texts)
+        chunks: list[list[bytes | None]] = [
+            [None] * len(p.readings) if p else [] for p in plans
+        ]
+        remaining = [len(c) for c in chunks]
+        jobs = deque((pos, i) for pos, p in enumerate(plans) if p for i in range(len(p.readings)))
+        next_emit = 0
+
+        def _emit_ready():
+            nonlocal next_emit
+            while next_emit < len(texts) and remaining[next_emit] == 0:
+                plan = plans[next_emit]
+                if plan is None:
+                    results[next_emit] = (b"", [], [])
+                else:
+                    results[next_emit] = _finish_plan(plan, chunks[next_emit])
+                    # 結合後は文ごとの WAV を保持しない
+                    chunks[next_emit] = []
+                if on_slide:
+                    on_slide(next_emit, results[next_emit])
+                next_emit += 1
+
+        def _chunk_done(pos, i, wav_chunk):
+            chunks[pos][i] = wav_chunk
+            remaining[pos] -= 1
+            if on_chunk:
+                on_chunk(pos, i, len(chunks[pos]), plans[pos].display_sentences[i])
+
+        # 合成は同時に (エンジンの台数) バッチまで。audio_query とは別の接続を使う
+        synth_workers = len(self.transport.base_urls)
+        self.transport.ensure_pool_size(max_in_flight + synth_workers)
+        pool = ThreadPoolExecutor(max_workers=max_in_flight)
+        synth_pool = ThreadPoolExecutor(max_workers=synth_workers)
+        prepare_sentence = bind_trace(self._prepare_sentence)
+        synthesize_batch = bind_trace(self._synthesize_batch)
+        queries: dict = {}  # audio_query 中の文 → (pos, i)
+        batches: dict = {}  # 合成中のバッチ → [(pos, i), ...]
+        batch: list[tuple[int, int, dict]] = []  # 合成待ちの (pos, i, query)
+        batch_sec = 0.0
+
+        def _submit_batch():
+            nonlocal batch, batch_sec
+            future = synth_pool.submit(synthesize_batch, [(plans[pos], i, q) for pos, i, q in batch])
+            batches[future] = [(pos, i) for pos, i, _ in batch]
+            batch, batch_sec = [], 0.0
+        try:
+            _emit_ready()
+            while jobs or queries or batches or batch:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise SynthesisCancelled()
+                while jobs and len(queries) < max_in_flight:
+                    pos, i = jobs.popleft()
+                    if i == 0 and on_slide_start:
+                        on_slide_start(pos, len(chunks[pos]))
+                    queries[pool.submit(prepare_sentence, plans[pos], i)] = (pos, i)
+                # 合成の接続が空いているか、もう届くクエリがなければ溜まった分を送る
+                if batch and (len(batches) < synth_workers or not (jobs or queries)):
+                    _submit_batch()
+                # キャンセルに素早く反応できるよう短い間隔で待つ
+                done, _ = wait([*queries, *batches], timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in batches:
+                        for (pos, i), wav_chunk in zip(batches.pop(future), future.result()):
+                            _chunk_done(pos, i, wav_chunk)
+                        continue
+                    pos, i = queries.pop(future)
+                    wav_chunk, query = future.result()
+                    if wav_chunk is not None:
+                        _chunk_done(pos, i, wav_chunk)
+                        continue
+                    batch.append((pos, i, query))
+                    batch_sec += _estimate_query_sec(query)
+                    if batch_sec >= _BATCH_MAX_SEC or len(batch) >= _BATCH_MAX_SENTENCES:
+                        _submit_batch()
+                _emit_ready()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            synth_pool.shutdown(wait=False, cancel_futures=True)
+        return results
 
     def list_speakers(self) -> list[dict]:
         """利用可能な話者一覧を取得する。"""
-        resp = requests.get(f"{self.base_url}/speakers")
+        resp = self.transport.get("/speakers")
         resp.raise_for_status()
         return resp.json()
@@ -0,0 +1,440 @@
+"""VOICEVOX音声合成エンジン (asyncio 版)
+
+VoicevoxEngine と同じ文分割・キャッシュ・アクセント指定を使い、
+HTTP 通信を aiohttp で非同期に行う。スレッドを使わずに数百件のリクエストを
+同時に流せるため、複数エンジンへの大量合成や asyncio ベースのジョブランナーから使う。
+CLI では --async-engine で GenerationPipeline の合成に使える。
+
+aiohttp は任意の依存パッケージ (pip install aiohttp)。
+"""
+
+import asyncio
+import contextlib
+import json
+import threading
+import time
+
+try:
+    import aiohttp
+    _HAS_AIOHTTP = True
+except ImportError:
+    _HAS_AIOHTTP = False
+
+from tracing import count, span
+
+from .base import AsyncTTSEngine
+from .cache import DiskCache, MemoryCache
+from .transport import EnginePool, LatencyRecorder, SynthesisCancelled, _cap_timeout, parse_base_urls
+from .voicevox import (
+    _ACCENT_MEMO_ITEMS, _UNSUPPORTED_STATUS, DEFAULT_SAMPLING_RATE, _AccentEndpoints, _SlidePlan,
+    _accent_key, _apply_output_format, _apply_scales, _effective_scales, _finish_plan, _mark_accents,
+    _plan_text, _query_key, _wav_key,
+)
+
+
+def async_engine_available() -> bool:
+    """AsyncVoicevoxEngine を使えるか (aiohttp がインストールされているか)。"""
+    return _HAS_AIOHTTP
+
+
+class AsyncVoicevoxEngine(AsyncTTSEngine):
+    """aiohttp を使った非同期の VOICEVOX 音声合成。
+
+    synthesize / synthesize_with_timings / synthesize_deck はコルーチンで、
+    戻り値は VoicevoxEngine の同名メソッドと同じ形式 (AsyncTTSEngine の実装)。
+    同時リクエスト数は max_concurrency (セマフォ) で制限する。
+    セッションは最初の呼び出し時に作成されるため、1つのイベントループ内で使い、
+    終了時に close() (または async with) で閉じること。
+    base_url に複数の URL を渡した場合の振り分けと、再試行の時間上限 (max_total_sec)・
+    cancel_event による中断は HttpTransport と同じ。
+    """
+
+    def __init__(self, speaker_id: int = 1, base_url: str | list[str] = "http://localhost:50021",
+                 pause_sec: float = 0.5, speed_scale: float = 1.0, pitch_scale: float = 0.0,
+                 intonation_scale: float = 1.0, volume_scale: float = 1.0,
+                 wav_cache: DiskCache | None = None, query_cache: DiskCache | None = None,
+                 max_concurrency: int = 64, connect_timeout: float = 5.0,
+                 read_timeout: float = 300.0, retries: int = 3, backoff_sec: float = 0.5,
+                 max_total_sec: float = 300.0, cancel_event: threading.Event | None = None,
+                 output_sampling_rate: int = DEFAULT_SAMPLING_RATE, output_stereo: bool = False):
+        if not _HAS_AIOHTTP:
+            raise ImportError("AsyncVoicevoxEngine には aiohttp が必要です (pip install aiohttp)。"
+                              "インストールしない場合は通常の VoicevoxEngine を使ってください")
+        self.speaker_id = speaker_id
+        self.base_urls = parse_base_urls(base_url)
+        self.base_url = self.base_urls[0]
+        self.engines = EnginePool(self.base_urls)
+        self.pause_sec = pause_sec
+        self.speed_scale = speed_scale
+        self.pitch_scale = pitch_scale
+        self.intonation_scale = intonation_scale
+        self.volume_scale = volume_scale
+        self.output_sampling_rate = output_sampling_rate
+        self.output_stereo = output_stereo
+        self.wav_cache = wav_cache
+        self.query_cache = query_cache
+        self.max_concurrency = max_concurrency
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_sec = backoff_sec
+        self.max_total_sec = max_total_sec
+        self.cancel_event = cancel_event
+        self.latency = LatencyRecorder()
+        self._session: "aiohttp.ClientSession | None" = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._version: str | None = None
+        self._version_lock: asyncio.Lock | None = None
+        self._check_task: asyncio.Future | None = None
+        self._accent_endpoints = _AccentEndpoints()
+        self._accent_probe_lock: asyncio.Lock | None = None
+        self._accent_memo = MemoryCache(_ACCENT_MEMO_ITEMS)
+        # 同じキーの問い合わせ中のタスク (同時に来た文は結果を待つだけにする)
+        self._accent_pending: dict[str, asyncio.Future] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self) -> None:
+        # 共有しているアクセント再計算の問い合わせ (shield されている) を止めてから閉じる
+        pending = list(self._accent_pending.values())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout,
+                                            sock_read=self.read_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._version_lock = asyncio.Lock()
+            self._accent_probe_lock = asyncio.Lock()
+        return self._session
+
+    def _check_cancel(self) -> None:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise SynthesisCancelled()
+
+    async def _backoff(self, delay: float) -> None:
+        """delay 秒待つ。待っている間に cancel_event がセットされたら SynthesisCancelled を送出する。"""
+        end = time.monotonic() + delay
+        while (left := end - time.monotonic()) > 0:
+            self._check_cancel()
+            # threading.Event は await できないので短い間隔で確認する
+            await asyncio.sleep(min(left, 0.2))
+
+    async def _request(self, method: str, path: str, params: dict | None = None,
+                       json_body=None) -> bytes:
+        """リクエストを送り、レスポンス本文を返す。
+
+        HttpTransport と同じく、接続エラー・タイムアウト・5xx は指数バックオフで
+        再試行する。最初の送信から max_total_sec を過ぎたら再試行せず、
+        cancel_event がセットされたら次の送信の前に SynthesisCancelled を送出する。
+        最終的に 4xx/5xx なら aiohttp.ClientResponseError を送出する。
+        """
+        session = self._get_session()
+        # 送信量を数えるため、JSON は自分でシリアライズして送る
+        data = None if json_body is None else json.dumps(json_body).encode()
+        headers = None if data is None else {"Content-Type": "application/json"}
+        deadline = time.monotonic() + self.max_total_sec
+        attempt = 0
+        while True:
+            self._check_cancel()
+            await self._probe_evicted()
+            # セマフォを待っている間はエンジンの処理中数に数えない (振り分けが偏らないように)
+            async with self._semaphore:
+                self._check_cancel()
+                ep = self.engines.acquire()
+                remaining = max(deadline - time.monotonic(), self.connect_timeout)
+                last = attempt >= self.retries or remaining <= self.connect_timeout
+                connect, read = _cap_timeout((self.connect_timeout, self.read_timeout), remaining)
+                timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+                t0 = time.perf_counter()
+                try:
+                    async with session.request(method, f"{ep.url}{path}", params=params, data=data,
+                                               headers=headers, timeout=timeout) as resp:
+                        body = await resp.read()
+                        elapsed = time.perf_counter() - t0
+                        self.engines.report_success(ep)
+                        if resp.status < 500 or last or time.monotonic() >= deadline:
+                            self.latency.record(path, elapsed, error=resp.status >= 400, nbytes=len(body))
+                            count("http.requests")
+                            count("http.bytes_sent", len(data or b""))
+                            count("http.bytes_received", len(body))
+                            if resp.status >= 400:
+                                count("http.errors")
+                            resp.raise_for_status()
+                            return body
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    elapsed = time.perf_counter() - t0
+                    self.engines.report_failure(ep)
+                    if last or time.monotonic() >= deadline:
+                        self.latency.record(path, elapsed, error=True)
+                        count("http.errors")
+                        raise
+                finally:
+                    self.engines.release(ep)
+            self.latency.record(path, elapsed, retry=True)
+            count("http.retries")
+            # 他に正常なエンジンがあれば待たずにそちらへ送り直す
+            if len(self.base_urls) == 1 or not self.engines.has_healthy():
+                await self._backoff(min(self.backoff_sec * (2 ** attempt),
+                                        max(deadline - time.monotonic(), 0.0)))
+            attempt += 1
+
+    def format_stats(self) -> str:
+        """通信の統計を HttpTransport.format_stats() と同じ形式で返す。"""
+        text = self.latency.format_stats()
+        if len(self.base_urls) > 1:
+            text += "\n" + self.engines.format_summary()
+        return text
+
+    async def _is_alive(self, url: str) -> bool:
+        try:
+            async with self._get_session().get(
+                f"{url}/version", timeout=aiohttp.ClientTimeout(total=self.connect_timeout),
+            ) as resp:
+                return resp.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def _check_health(self) -> None:
+        """全エンジンを確認し、応答しないものを退避させる。"""
+        alive = await asyncio.gather(*(self._is_alive(ep.url) for ep in self.engines.endpoints))
+        for ep, ok in zip(self.engines.endpoints, alive):
+            if ok:
+                self.engines.readmit(ep)
+            else:
+                self.engines.evict(ep)
+
+    async def _probe_evicted(self) -> None:
+        """初回は全エンジンを、以降は再確認時刻を過ぎた退避中エンジンを /version で確認する。"""
+        if len(self.base_urls) > 1:
+            # 初回確認が終わるまで他のコルーチンも待たせる
+            if self._check_task is None:
+                self._check_task = asyncio.ensure_future(self._check_health())
+            await self._check_task
+        for ep in self.engines.probe_candidates():
+            if await self._is_alive(ep.url):
+                self.engines.readmit(ep)
+
+    async def engine_version(self) -> str:
+        """エンジンのバージョン文字列を返す (/version)。取得できなければ空文字。"""
+        self._get_session()
+        async with self._version_lock:
+            if self._version is None:
+                try:
+                    self._version = str(json.loads(await self._request("GET", "/version")))
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    self._version = ""
+            return self._version
+
+    async def list_speakers(self) -> list[dict]:
+        """利用可能な話者一覧を取得する。"""
+        return json.loads(await self._request("GET", "/speakers"))
+
+    async def _raw_audio_query(self, text: str) -> dict:
+        """/audio_query の結果をそのまま返す (query_cache があれば再利用)。"""
+        key = None
+        if self.query_cache is not None:
+            version = await self.engine_version()
+            if version:
+                key = _query_key(version, self.speaker_id, text)
+                raw = await asyncio.to_thread(self.query_cache.get, key)
+                if raw is not None:
+                    count("cache.query.hit")
+                    return json.loads(raw)
+                count("cache.query.miss")
+        with span("audio_query", chars=len(text)):
+            body = await self._request("POST", "/audio_query",
+                                       params={"text": text, "speaker": self.speaker_id})
+        if key is not None:
+            await asyncio.to_thread(self.query_cache.put, key, body)
+        return json.loads(body)
+
+    async def _apply_accent_overrides(self, query: dict, accents: list[tuple[str, int]]) -> dict:
+        """accent_phrases のアクセント位置を上書きし、ピッチを再計算する。"""
+        phrases = query.get("accent_phrases", [])
+        if not accents or not _mark_accents(phrases, accents):
+            return query
+        recalculated = await self._recalc_accent_phrases(phrases)
+        if recalculated is not None:
+            query["accent_phrases"] = recalculated
+        elif self._accent_endpoints.candidates() or self._accent_endpoints.warn_once():
+            print("[PPVoice] アクセント再計算に失敗しました (mora_pitch/mora_data 未対応)")
+        return query
+
+    async def _recalc_accent_phrases(self, phrases: list[dict]) -> list[dict] | None:
+        """VoicevoxEngine._recalc_accent_phrases と同じ (未対応エンドポイントの記憶とキャッシュ付き)。"""
+        version = await self.engine_version() if self.query_cache is not None else ""
+        key = _accent_key(version, self.speaker_id, phrases)
+        raw = self._accent_memo.get(key)
+        if raw is None and version:
+            raw = await asyncio.to_thread(self.query_cache.get, key)
+        if raw is not None:
+            count("cache.accent.hit")
+        else:
+            task = self._accent_pending.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._fetch_accent_phrases(key, version, phrases))
+                self._accent_pending[key] = task
+                task.add_done_callback(lambda _: self._accent_pending.pop(key, None))
+            raw = await asyncio.shield(task)
+        return json.loads(raw) if raw is not None else None
+
+    async def _fetch_accent_phrases(self, key: str, version: str, phrases: list[dict]) -> bytes | None:
+        probing = not self._accent_endpoints.confirmed
+        async with self._accent_probe_lock if probing else contextlib.nullcontext():
+            for endpoint in self._accent_endpoints.candidates():
+                try:
+                    with span(endpoint):
+                        raw = await self._request("POST", f"/{endpoint}",
+                                                  params={"speaker": self.speaker_id}, json_body=phrases)
+                except aiohttp.ClientResponseError as e:
+                    if e.status in _UNSUPPORTED_STATUS:
+                        self._accent_endpoints.mark_unsupported(endpoint)
+                    continue
+                except aiohttp.ClientError:
+                    continue
+                self._accent_endpoints.mark_supported(endpoint)
+                self._accent_memo.put(key, raw)
+                if version:
+                    await asyncio.to_thread(self.query_cache.put, key, raw)
+                return raw
+        return None
+
+    async def _plan(self, text: str) -> _SlidePlan | None:
+        plan = _plan_text(text, self.pause_sec)
+        if plan is not None and self.wav_cache is not None:
+            version = await self.engine_version()
+            if version:
+                plan.cache_keys = [
+                    _wav_key(version, self.speaker_id, plan.readings[i], self._scales(plan, i),
+                             plan.accents[i], (self.output_sampling_rate, self.output_stereo))
+                    for i in range(len(plan.readings))
+                ]
+        return plan
+
+    def _scales(self, plan: _SlidePlan, i: int) -> tuple[float, float, float, float]:
+        return _effective_scales(plan, i, (self.speed_scale, self.pitch_scale,
+                                           self.intonation_scale, self.volume_scale))
+
+    async def _synthesize_sentence(self, plan: _SlidePlan, i: int) -> bytes:
+        """plan の i 番目の文を合成する (キャッシュがあれば再利用)。"""
+        key = plan.cache_keys[i]
+        if key is not None:
+            wav_chunk = await asyncio.to_thread(self.wav_cache.get, key)
+            count("cache.wav.hit" if wav_chunk is not None else "cache.wav.miss")
+            if wav_chunk is not None:
+                return wav_chunk
+        query = _apply_scales(await self._raw_audio_query(plan.readings[i]), self._scales(plan, i))
+        _apply_output_format(query, self.output_sampling_rate, self.output_stereo)
+        if plan.accents[i]:
+            query = await self._apply_accent_overrides(query, plan.accents[i])
+        with span("synthesis"):
+            wav_chunk = await self._request("POST", "/synthesis",
+                                            params={"speaker": self.speaker_id}, json_body=query)
+        if key is not None:
+            await asyncio.to_thread(self.wav_cache.put, key, wav_chunk)
+        return wav_chunk
+
+    async def _synthesize_plan(self, plan: _SlidePlan, on_chunk=None) -> list[bytes]:
+        """plan の全文を並行に合成し、文の順に並べた WAV リストを返す。"""
+        total = len(plan.readings)
+
+        async def _one(i):
+            wav_chunk = await self._synthesize_sentence(plan, i)
+            if on_chunk:
+                on_chunk(i, total, plan.display_sentences[i])
+            return wav_chunk
+
+        return list(await asyncio.gather(*(_one(i) for i in range(total))))
+
+    async def synthesize(self, text: str, on_chunk=None) -> bytes:
+        """テキストからWAV音声を生成する。"""
+        wav, _, _ = await self.synthesize_with_timings(text, on_chunk=on_chunk)
+        return wav
+
+    async def synthesize_with_timings(
+        self, text: str, on_chunk=None,
+    ) -> tuple[bytes, list[tuple[str, int, int]], list[tuple[int, float]]]:
+        """テキストからWAV音声を生成し、各文のタイミング情報も返す。
+
+        Args:
+            on_chunk: コールバック on_chunk(chunk_index, total, sentence_text) (完了順)
+
+        Returns:
+            (WAVバイナリ, [(文テキスト, 開始ms, 長さms), ...],
+             [(sentence_index, char_ratio), ...])
+        """
+        plan = await self._plan(text)
+        if plan is None:
+            return b"", [], []
+        return _finish_plan(plan, await self._synthesize_plan(plan, on_chunk))
+
+    async def synthesize_deck(
+        self, texts: list[str], on_chunk=None, on_slide=None, on_slide_start=None,
+        cancel_event: threading.Event | None = None,
+    ) -> list[tuple[bytes, list[tuple[str, int, int]], list[tuple[int, float]]]]:
+        """複数スライドのノートをまとめて合成する。
+
+        全スライドの文を一度に投入し、同時実行数はセマフォで制限する。
+        on_slide(slide_pos, result) は texts の順で呼ばれる。
+        on_chunk(slide_pos, chunk_index, total, sentence_text) は完了順で呼ばれる。
+        on_slide_start(slide_pos, total) は合成を投入したスライドごとに呼ばれる。
+        cancel_event (他のスレッドからセットされる) がセットされると、
+        処理中のリクエストを取り消して SynthesisCancelled を送出する。
+        """
+        plans = [await self._plan(t) for t in texts]
+        if on_slide_start:
+            for pos, p in enumerate(plans):
+                if p:
+                    on_slide_start(pos, len(p.readings))
+
+        def _chunk_cb(pos):
+            if on_chunk is None:
+                return None
+            return lambda i, total, text: on_chunk(pos, i, total, text)
+
+        tasks = [
+            asyncio.ensure_future(self._synthesize_plan(p, _chunk_cb(pos))) if p else None
+            for pos, p in enumerate(plans)
+        ]
+        results = []
+        try:
+            for pos, (plan, task) in enumerate(zip(plans, tasks)):
+                if task is not None:
+                    await _wait_unless_cancelled(task, cancel_event)
+                result = (b"", [], []) if task is None else _finish_plan(plan, task.result())
+                results.append(result)
+                if on_slide:
+                    on_slide(pos, result)
+        finally:
+            pending = [task for task in tasks if task is not None and not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return results
+
+
+async def _wait_unless_cancelled(task: asyncio.Future, cancel_event: threading.Event | None) -> None:
+    """task の完了を待つ。cancel_event がセットされたら SynthesisCancelled を送出する。"""
+    while not task.done():
+        if cancel_event is not None and cancel_event.is_set():
+            raise SynthesisCancelled()
+        # キャンセルに素早く反応できるよう短い間隔で確認する (task 自体は取り消さない)
+        await asyncio.wait((task,), timeout=0.2)
+
+
+async def synthesize_deck_async(engine: AsyncVoicevoxEngine, texts: list[str], **kwargs):
+    """engine.synthesize_deck を実行してセッションを閉じる (asyncio.run に渡す用)。"""
+    async with engine:
+        return await engine.synthesize_deck(texts, **kwargs)
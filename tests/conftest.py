@@ -0,0 +1,13 @@
+"""テスト共通の設定
+
+src のモジュールは (GUI・CLI と同じく) src ディレクトリを基準に import する。
+モック VOICEVOX (tools/mock_voicevox.py) も import できるようにしておく。
+"""
+
+import os
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_ROOT, "src"))
+sys.path.insert(0, _ROOT)
+sys.path.insert(0, os.path.join(_ROOT, "tools"))
@@ -0,0 +1,70 @@
+"""アクセント再計算結果のメモ (VoicevoxEngine._recalc_accent_phrases) のテスト"""
+
+import json
+import threading
+import time
+
+from tts import voicevox
+from tts.voicevox import VoicevoxEngine
+
+
+class _Response:
+    def __init__(self, body: bytes):
+        self.content = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _Transport:
+    """mora_pitch に届いた accent_phrases をそのまま返す。問い合わせ回数を数える。"""
+
+    base_url = "http://127.0.0.1:1"
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def post(self, path, params=None, json=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(0.01)
+        return _Response(_dumps(json))
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value).encode()
+
+
+def _phrases(n: int) -> list[dict]:
+    return [{"moras": [{"text": "ア", "pitch": 0.0}], "accent": 1, "n": n}]
+
+
+def test_concurrent_same_key_is_fetched_once_and_locks_are_dropped():
+    engine = VoicevoxEngine(transport=_Transport())
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(engine._recalc_accent_phrases(_phrases(0))))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [_phrases(0)] * 8
+    assert engine.transport.calls == 1
+    assert len(engine._accent_locks) == 0
+
+
+def test_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(voicevox, "_ACCENT_MEMO_ITEMS", 4)
+    engine = VoicevoxEngine(transport=_Transport())
+    for n in range(10):
+        assert engine._recalc_accent_phrases(_phrases(n)) == _phrases(n)
+    assert len(engine._accent_memo) == 4
+    assert len(engine._accent_locks) == 0
+    # メモに残っている直近のキーは問い合わせない
+    calls = engine.transport.calls
+    engine._recalc_accent_phrases(_phrases(9))
+    assert engine.transport.calls == calls
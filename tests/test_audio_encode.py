@@ -0,0 +1,60 @@
+"""encode_audio の失敗時の扱いと、埋め込んだ形式のマニフェストへの記録のテスト"""
+
+import io
+import wave
+
+import audio_encode
+from audio_encode import encode_audio
+from manifest import SlideEntry
+from pptx_writer import _encode_slide_audio
+
+
+def _wav(nframes: int = 2400) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(24000)
+        w.writeframes(b"\x01\x00" * nframes)
+    return buf.getvalue()
+
+
+def _fail(wav_bytes, audio_format):
+    raise RuntimeError("ffmpeg failed")
+
+
+def test_failed_encode_falls_back_to_wav_with_reason(monkeypatch):
+    monkeypatch.setattr(audio_encode, "_encode_ffmpeg", _fail)
+    wav = _wav()
+    audio = encode_audio(wav, "mp3")
+    assert audio.format == "wav"
+    assert audio.ext == "wav"
+    assert audio.data == wav
+    assert "ffmpeg failed" in audio.error
+
+
+def test_encode_report_lists_fallback_slides(monkeypatch):
+    monkeypatch.setattr(audio_encode, "_encode_ffmpeg", _fail)
+    monkeypatch.setattr(audio_encode, "find_ffmpeg", lambda: "ffmpeg")
+    encoded, report = _encode_slide_audio([(0, _wav()), (1, b""), (2, _wav())], "mp3")
+    assert sorted(encoded) == [0, 2]
+    assert all(a.format == "wav" for a in encoded.values())
+    assert sorted(report.failed) == [0, 2]
+    assert any("スライド 1" in line and "WAV のまま" in line for line in report.lines())
+
+
+def test_mulaw_encode_has_no_error():
+    audio = encode_audio(_wav(), "mulaw")
+    assert audio.format == "mulaw"
+    assert audio.error == ""
+
+
+def test_entry_matches_recorded_format():
+    entry = SlideEntry("h", "/ppt/media/a.wav", "audio/wav", 1000, format="wav")
+    assert entry.matches("h")
+    assert entry.matches("h", "wav")
+    # 前回 mp3 にできず WAV で埋め込んだスライドは mp3 の実行では再利用しない
+    assert not entry.matches("h", "mp3")
+    assert not entry.matches("other", "wav")
+    # format のない古いマニフェストはハッシュだけで判定する
+    assert SlideEntry("h", "/ppt/media/a.mp3", "audio/mpeg", 1000).matches("h", "mp3")
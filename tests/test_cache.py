@@ -0,0 +1,149 @@
+"""DiskCache と MemoryCache のテスト"""
+
+import os
+import threading
+import time
+
+from tts.cache import DiskCache, MemoryCache, make_key
+
+
+def _set_mtime(cache: DiskCache, key: str, mtime: float) -> None:
+    os.utime(cache._path(key), (mtime, mtime))
+
+
+def test_put_get_roundtrip(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = make_key("wav", "0.14.0", 1, "こんにちは")
+    assert cache.get(key) is None
+    cache.put(key, b"RIFF data")
+    assert cache.get(key) == b"RIFF data"
+    # 別インスタンス (別プロセス相当) からも読める
+    assert DiskCache(str(tmp_path)).get(key) == b"RIFF data"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_make_key_is_stable():
+    assert make_key("a", 1, {"x": 1, "y": 2}) == make_key("a", 1, {"y": 2, "x": 1})
+    assert make_key("a", 1) != make_key("a", 2)
+
+
+def test_eviction_removes_oldest_first(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10_000)
+    keys = [make_key("entry", i) for i in range(4)]
+    now = time.time()
+    for i, key in enumerate(keys):
+        cache.put(key, bytes(300))
+        _set_mtime(cache, key, now - 100 + i)
+    # 最も古い keys[0] を読むと最終アクセスが更新され、次に古い keys[1] が消える
+    assert cache.get(keys[0]) is not None
+    cache.max_bytes = 1000
+    cache.evict()
+    assert not os.path.exists(cache._path(keys[1]))
+    assert os.path.exists(cache._path(keys[0]))
+    assert os.path.exists(cache._path(keys[3]))
+    assert cache._scan_size() <= 1000 * 0.8
+
+
+def test_put_over_limit_triggers_eviction(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    now = time.time()
+    for i in range(10):
+        key = make_key("entry", i)
+        cache.put(key, bytes(200))
+        _set_mtime(cache, key, now - 100 + i)
+    assert cache._scan_size() <= 1000
+    assert os.path.exists(cache._path(make_key("entry", 9)))
+    assert not os.path.exists(cache._path(make_key("entry", 0)))
+
+
+def test_evict_skips_while_other_process_holds_lock(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    os.makedirs(tmp_path, exist_ok=True)
+    lock_path = tmp_path / ".evict.lock"
+    lock_path.write_bytes(b"")
+    cache.put(make_key("a"), bytes(300))
+    # 他プロセスがエビクション中なら何もしない
+    assert os.path.exists(cache._path(make_key("a")))
+    # 古いロックは異常終了の残骸として取り除かれ、次回のエビクションが実行される
+    old = time.time() - 3600
+    os.utime(lock_path, (old, old))
+    cache.evict()
+    assert not lock_path.exists()
+    cache.evict()
+    assert not os.path.exists(cache._path(make_key("a")))
+
+
+def test_concurrent_put_from_threads(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = make_key("shared")
+    payloads = [bytes([n]) * 100_000 for n in range(2)]
+    errors = []
+
+    def writer(data):
+        try:
+            for _ in range(50):
+                cache.put(key, data)
+        except Exception as e:  # pragma: no cover - 失敗時の情報用
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(p,)) for p in payloads]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    # どちらかの書き込みが丸ごと残る (混ざったり途中で切れたりしない)
+    assert DiskCache(str(tmp_path)).get(key) in payloads
+    # 一時ファイルは残らない
+    leftovers = [n for _, _, names in os.walk(tmp_path) for n in names if n.endswith(".tmp")]
+    assert leftovers == []
+
+
+def test_partial_writes_are_ignored(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    key = make_key("partial")
+    # 書き込み途中で異常終了したプロセスの一時ファイル
+    shard = tmp_path / key[:2]
+    shard.mkdir(parents=True)
+    (shard / "tmpabcd.tmp").write_bytes(bytes(5000))
+    (shard / "unrelated.txt").write_bytes(bytes(5000))
+    assert cache.get(key) is None
+    assert cache._scan_size() == 0
+    cache.put(key, b"ok")
+    assert cache.get(key) == b"ok"
+
+
+def test_memory_tier(tmp_path):
+    cache = DiskCache(str(tmp_path), memory_items=2)
+    keys = [make_key("m", i) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, b"%d" % i)
+    assert list(cache._memory) == keys[1:]
+    # メモリにあるエントリはディスクから消えても返る
+    os.remove(cache._path(keys[2]))
+    assert cache.get(keys[2]) == b"2"
+    # メモリから追い出されたエントリはディスクから読み直してメモリに戻す
+    assert cache.get(keys[0]) == b"0"
+    assert list(cache._memory) == [keys[2], keys[0]]
+
+
+def test_clear(tmp_path):
+    cache = DiskCache(str(tmp_path), memory_items=4)
+    key = make_key("c")
+    cache.put(key, b"x")
+    cache.clear()
+    assert cache.get(key) is None
+    assert cache._scan_size() == 0
+
+
+def test_memory_cache_is_bounded_lru():
+    cache = MemoryCache(max_items=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3")
+    # 直近に使っていない "b" から追い出す
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+    assert len(cache) == 2
@@ -0,0 +1,44 @@
+"""_concat_wav のテスト"""
+
+import io
+import wave
+
+from tts.voicevox import _concat_wav
+
+
+def _wav(nframes: int, value: int = 1, framerate: int = 24000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(framerate)
+        w.writeframes(value.to_bytes(2, "little") * nframes)
+    return buf.getvalue()
+
+
+def _frames(data: bytes) -> tuple[wave._wave_params, bytes]:
+    with wave.open(io.BytesIO(data), "rb") as w:
+        return w.getparams(), w.readframes(w.getnframes())
+
+
+def test_empty_chunks_give_empty_audio():
+    assert _concat_wav([], []) == (b"", [])
+    assert _concat_wav([], [], sentences=[], leading_pause=1.0) == (b"", [])
+
+
+def test_single_chunk_is_returned_as_is():
+    chunk = _wav(2400)
+    wav, timings = _concat_wav([chunk], [], sentences=["a"])
+    assert wav is chunk
+    assert timings == [("a", 0, 100)]
+
+
+def test_chunks_and_pauses_are_laid_out_in_order():
+    chunks = [_wav(2400, 1), _wav(4800, 2)]
+    wav, timings = _concat_wav(chunks, [0.5], sentences=["a", "b"], leading_pause=0.25)
+    params, frames = _frames(wav)
+    assert (params.nchannels, params.sampwidth, params.framerate) == (1, 2, 24000)
+    silence = lambda sec: bytes(int(24000 * sec) * 2)  # noqa: E731
+    expected = (silence(0.25) + b"\x01\x00" * 2400 + silence(0.5) + b"\x02\x00" * 4800)
+    assert frames == expected
+    assert timings == [("a", 250, 100), ("b", 850, 200)]
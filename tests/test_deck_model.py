@@ -0,0 +1,33 @@
+"""load_deck (解析済みデッキ) のテスト"""
+
+from benchmark import make_deck
+from deck_model import DeckCache, load_deck
+from tts.voicevox import count_next_tags, display_sentences
+
+
+def test_load_deck_counts_clicks_and_next_tags(tmp_path):
+    path = tmp_path / "deck.pptx"
+    make_deck(str(path), slides=4, sentences=3, clicks=2, seed=1)
+    deck = load_deck(str(path))
+    assert len(deck.slides) == 4
+    for slide in deck.slides:
+        assert slide.click_groups == 2
+        assert slide.next_tags == 2
+        assert slide.sentences == display_sentences(slide.notes_text)
+        assert slide.sentences
+
+
+def test_count_next_tags_ignores_escaped():
+    assert count_next_tags("一<next>二<NEXT/>三") == 2
+    assert count_next_tags("{<next>}と{よみ|<next>}は数えない<next>") == 1
+    assert count_next_tags("") == 0
+
+
+def test_cache_reloads_changed_file(tmp_path):
+    path = tmp_path / "deck.pptx"
+    make_deck(str(path), slides=2, clicks=0)
+    cache = DeckCache()
+    first = cache.get(str(path))
+    assert cache.get(str(path)) is first
+    make_deck(str(path), slides=3, clicks=0)
+    assert len(cache.get(str(path)).slides) == 3
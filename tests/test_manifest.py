@@ -0,0 +1,126 @@
+"""マニフェストによる差分再生成のテスト"""
+
+import io
+import wave
+import zipfile
+
+from pptx import Presentation
+
+from generation import GenerationPipeline, GenerationSettings, changed_slides, hash_settings
+from manifest import RT_MANIFEST, load_reusable, read_manifest, slide_hash
+from pptx_reader import read_notes
+from pptx_writer import embed_audio
+
+
+def _wav(ms: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(24000)
+        w.writeframes(b"\x01\x00" * (24 * ms))
+    return buf.getvalue()
+
+
+def _make_deck(path, notes: list[str]) -> None:
+    prs = Presentation()
+    for text in notes:
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        if text:
+            slide.notes_slide.notes_text_frame.text = text
+    prs.save(str(path))
+
+
+class _FakePipeline(GenerationPipeline):
+    """VOICEVOX の代わりにテキスト長に応じた無音を返す。合成したテキストを synthesized に記録する。"""
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.synthesized = []
+
+    def _synthesize_deck(self, texts, cancel_event, on_chunk=None, on_slide=None, on_slide_start=None):
+        for pos, text in enumerate(texts):
+            if not text:
+                on_slide(pos, (b"", [], []))
+                continue
+            self.synthesized.append(text)
+            ms = 100 * len(text)
+            on_slide(pos, (_wav(ms), [(text, 0, ms)], []))
+        return ""
+
+
+def _run(src, out, **settings):
+    pipeline = _FakePipeline(GenerationSettings(update_mode=True, **settings))
+    pipeline.run(str(src), str(out))
+    return pipeline.synthesized
+
+
+def test_slide_hash_is_stable():
+    hs = hash_settings(GenerationSettings())
+    assert slide_hash("こんにちは。", hs) == slide_hash("こんにちは。", dict(reversed(hs.items())))
+    assert slide_hash("こんにちは。", hs) != slide_hash("こんばんは。", hs)
+    assert slide_hash("こんにちは。", hs) != slide_hash("こんにちは。", hash_settings(GenerationSettings(speed=1.2)))
+
+
+def test_unchanged_slides_are_reused(tmp_path):
+    src, out = tmp_path / "in.pptx", tmp_path / "out.pptx"
+    _make_deck(src, ["一枚目。", "", "三枚目。"])
+    assert _run(src, out) == ["一枚目。", "三枚目。"]
+    assert sorted(read_manifest(str(out))) == [0, 2]
+    assert _run(src, out) == []
+
+    _make_deck(src, ["一枚目。", "", "三枚目を変えた。"])
+    assert _run(src, out) == ["三枚目を変えた。"]
+
+
+def test_load_reusable_rejects_changed_settings(tmp_path):
+    src, out = tmp_path / "in.pptx", tmp_path / "out.pptx"
+    _make_deck(src, ["一枚目。", "二枚目。"])
+    _run(src, out)
+    old = hash_settings(GenerationSettings())
+    new = hash_settings(GenerationSettings(speaker_id=3))
+    assert sorted(load_reusable(str(out), {0: slide_hash("一枚目。", old), 1: slide_hash("二枚目。", old)})) == [0, 1]
+    assert load_reusable(str(out), {0: slide_hash("一枚目。", new), 1: slide_hash("二枚目。", new)}) == {}
+    assert _run(src, out, speaker_id=3) == ["一枚目。", "二枚目。"]
+
+
+def test_missing_media_part_is_not_reused(tmp_path):
+    src, out, stale = tmp_path / "in.pptx", tmp_path / "out.pptx", tmp_path / "stale.pptx"
+    _make_deck(src, ["一枚目。", "二枚目。"])
+    _run(src, out)
+    media = read_manifest(str(out))[0].media.lstrip("/")
+    # マニフェストは残したまま、スライド 1 の音声パートだけを落とす
+    with zipfile.ZipFile(out) as zin, zipfile.ZipFile(stale, "w") as zout:
+        for item in zin.infolist():
+            if item.filename != media:
+                zout.writestr(item, zin.read(item))
+    hs = hash_settings(GenerationSettings())
+    reused = load_reusable(str(stale), {0: slide_hash("一枚目。", hs), 1: slide_hash("二枚目。", hs)})
+    assert sorted(reused) == [1]
+
+
+def test_unselected_slides_keep_previous_audio(tmp_path):
+    src, out = tmp_path / "in.pptx", tmp_path / "out.pptx"
+    _make_deck(src, ["一枚目。", "二枚目。", "三枚目。"])
+    _run(src, out)
+    _make_deck(src, ["一枚目。", "二枚目を変えた。", "三枚目を変えた。"])
+
+    # スライド 2 だけを選んで更新しても、選択外のスライドの音声とマニフェストは残る
+    assert _run(src, out, selected_slides={2}) == ["二枚目を変えた。"]
+    assert sorted(read_manifest(str(out))) == [0, 1]
+    assert changed_slides(read_notes(str(src)), str(out), GenerationSettings()) == {2}
+
+    # 続けて全スライドで更新すると、変更の残っているスライド 3 だけを合成する
+    assert _run(src, out) == ["三枚目を変えた。"]
+    assert sorted(read_manifest(str(out))) == [0, 1, 2]
+
+
+def test_manifest_is_replaced_when_reembedding(tmp_path):
+    src, first, second = tmp_path / "in.pptx", tmp_path / "first.pptx", tmp_path / "second.pptx"
+    _make_deck(src, ["", ""])
+    embed_audio(str(src), [(0, _wav(200))], str(first), slide_timings=None, slide_hashes={0: "a"})
+    # マニフェスト付きの出力を入力にすると、前回のマニフェストが新しいものに置き換わる
+    embed_audio(str(first), [(1, _wav(200))], str(second), slide_timings=None, slide_hashes={1: "b"})
+    assert [(idx, e.hash) for idx, e in read_manifest(str(second)).items()] == [(1, "b")]
+    package = Presentation(str(second)).part.package
+    assert len([rel for rel in package.iter_rels() if rel.reltype == RT_MANIFEST]) == 1
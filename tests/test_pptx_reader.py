@@ -0,0 +1,79 @@
+"""read_notes (ZIP から直接読む) が read_slides (python-pptx) と同じ結果になるかのテスト"""
+
+import zipfile
+
+import pytest
+from lxml import etree
+from pptx import Presentation
+from pptx.util import Emu
+
+from pptx_reader import read_notes, read_slides
+
+
+_NS_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+
+
+@pytest.fixture
+def deck(tmp_path):
+    prs = Presentation()
+    layout = prs.slide_layouts[6]
+    notes = [
+        "一枚目のノート。",
+        "非表示のスライド。",
+        None,  # ノートなし
+        "複数の段落。\n二段落目\v段落内の改行。\n\n  前後の空白  ",
+        "",  # ノートスライドはあるが空
+        "最後のスライド。",
+    ]
+    for n, text in enumerate(notes):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.add_textbox(Emu(0), Emu(0), Emu(914400), Emu(914400)).text_frame.text = f"slide {n + 1}"
+        if text is not None:
+            slide.notes_slide.notes_text_frame.text = text
+    prs.slides[1]._element.set("show", "0")
+    saved = tmp_path / "saved.pptx"
+    prs.save(str(saved))
+
+    # 保存時に python-pptx がパート名を表示順に振り直すので、保存後の presentation.xml で
+    # 表示順をパート名・rId の順と変える (末尾のスライドを先頭に、2 枚目と 3 枚目を入れ替え)
+    path = tmp_path / "deck.pptx"
+    with zipfile.ZipFile(saved) as src, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename == "ppt/presentation.xml":
+                root = etree.fromstring(data)
+                sld_id_lst = root.find(f"{{{_NS_P}}}sldIdLst")
+                ids = list(sld_id_lst)
+                for el in ids:
+                    sld_id_lst.remove(el)
+                for el in [ids[5], ids[0], ids[2], ids[1], ids[3], ids[4]]:
+                    sld_id_lst.append(el)
+                data = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+            dst.writestr(info, data)
+    return path
+
+
+def test_read_notes_matches_read_slides(deck):
+    expected = read_slides(str(deck))
+    actual = read_notes(str(deck))
+    assert [(s.index, s.notes_text) for s in actual] == [(s.index, s.notes_text) for s in expected]
+    # python-pptx は読み込み時にスライドのパート名を表示順に振り直すため、パート名ではなく
+    # partname の XML が同じスライド (同じテキスト) であることを確かめる
+    with zipfile.ZipFile(deck) as zf:
+        for notes, info in zip(actual, expected):
+            title = info.slide.shapes[0].text_frame.text
+            assert f"<a:t>{title}</a:t>".encode() in zf.read(notes.partname)
+
+
+def test_display_order_hidden_and_empty_notes(deck):
+    notes = [s.notes_text for s in read_notes(str(deck))]
+    assert notes == [
+        "最後のスライド。",
+        "一枚目のノート。",
+        "",
+        "非表示のスライド。",
+        "複数の段落。\n二段落目\v段落内の改行。\n\n  前後の空白",
+        "",
+    ]
+    # 表示順と rId・パート名の順が食い違っている
+    assert [s.partname for s in read_notes(str(deck))][:2] == ["ppt/slides/slide6.xml", "ppt/slides/slide1.xml"]
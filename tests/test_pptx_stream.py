@@ -0,0 +1,122 @@
+"""StreamingPackage の保存のテスト"""
+
+import io
+import os
+import struct
+import wave
+import zipfile
+import zlib
+
+import pytest
+from pptx import Presentation
+from pptx.util import Emu
+
+from pptx_stream import StreamingPackage
+from pptx_writer import embed_audio
+
+
+def _png(width: int = 8, height: int = 8) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">L", len(data)) + kind + data + struct.pack(">L", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + bytes([200, 30, 30]) * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">2L5B", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+
+def _wav(ms: int = 200) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(24000)
+        w.writeframes(b"\x01\x00" * (24 * ms))
+    return buf.getvalue()
+
+
+@pytest.fixture
+def deck(tmp_path):
+    image = tmp_path / "red.png"
+    image.write_bytes(_png())
+    prs = Presentation()
+    for n in range(3):
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        slide.shapes.add_textbox(Emu(0), Emu(0), Emu(914400), Emu(914400)).text_frame.text = f"slide {n + 1}"
+        slide.shapes.add_picture(str(image), Emu(914400), Emu(914400))
+        slide.notes_slide.notes_text_frame.text = f"notes {n + 1}"
+    path = tmp_path / "deck.pptx"
+    prs.save(str(path))
+    return path
+
+
+def _modify_first_slide(package: StreamingPackage) -> str:
+    slide = package.presentation.slides[0]
+    slide.shapes.add_textbox(Emu(0), Emu(1828800), Emu(914400), Emu(914400)).text_frame.text = "added"
+    return slide.part.partname
+
+
+def test_roundtrip_keeps_unchanged_parts(deck, tmp_path):
+    package = StreamingPackage(str(deck))
+    partname = _modify_first_slide(package)
+    out = tmp_path / "out.pptx"
+    package.save(str(out), modified_parts={partname}, workers=2)
+
+    with zipfile.ZipFile(deck) as src, zipfile.ZipFile(out) as dst:
+        assert dst.testzip() is None
+        assert set(dst.namelist()) == set(src.namelist())
+        changed = {partname.membername, "[Content_Types].xml", "_rels/.rels"}
+        for info in src.infolist():
+            if info.filename in changed:
+                continue
+            copied = dst.getinfo(info.filename)
+            # 変更のないパートは展開・再圧縮せずにコピーされる
+            assert dst.read(copied) == src.read(info), info.filename
+            assert (copied.compress_type, copied.compress_size, copied.CRC) == \
+                (info.compress_type, info.compress_size, info.CRC), info.filename
+        assert b"added" in dst.read(partname.membername)
+
+    prs = Presentation(str(out))
+    assert [sh.text_frame.text for sh in prs.slides[0].shapes if sh.has_text_frame] == ["slide 1", "added"]
+    assert prs.slides[2].notes_slide.notes_text_frame.text == "notes 3"
+    assert prs.slides[1].shapes[1].image.blob == _png()
+
+
+def test_overwrite_source(deck):
+    package = StreamingPackage(str(deck))
+    partname = _modify_first_slide(package)
+    package.save(str(deck), modified_parts={partname}, workers=1)
+    with zipfile.ZipFile(deck) as zf:
+        assert zf.testzip() is None
+    assert len(Presentation(str(deck)).slides[0].shapes) == 3
+
+
+def test_source_modified_after_open_is_rejected(deck, tmp_path):
+    package = StreamingPackage(str(deck))
+    partname = _modify_first_slide(package)
+    # 開いた後に元のファイルが別の内容に置き換わった
+    prs = Presentation(str(deck))
+    prs.slides[1].shapes[0].text_frame.text = "edited elsewhere"
+    prs.save(str(deck))
+    stamp = os.stat(deck)
+    os.utime(deck, ns=(stamp.st_atime_ns, stamp.st_mtime_ns + 1_000_000))
+
+    out = tmp_path / "out.pptx"
+    with pytest.raises(RuntimeError):
+        package.save(str(out), modified_parts={partname})
+    assert not out.exists()
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".ppvoice_")]
+
+
+def test_reembed_into_deck_with_audio_parts(deck, tmp_path):
+    # 音声付きの出力をもう一度入力にすると、元の audio1.wav と新しい音声の名前がぶつかる
+    first = tmp_path / "first.pptx"
+    embed_audio(str(deck), [(0, _wav())], str(first), slide_timings=None)
+    second = tmp_path / "second.pptx"
+    saved = embed_audio(str(first), [(0, _wav()), (1, _wav(300))], str(second), slide_timings=None)
+
+    with zipfile.ZipFile(saved) as zf:
+        assert zf.testzip() is None
+        audio = sorted(name for name in zf.namelist() if name.startswith("ppt/media/audio"))
+    assert len(audio) == len(set(audio)) == 3
+    prs = Presentation(saved)
+    for slide in list(prs.slides)[:2]:
+        assert any(rel.reltype.endswith("/audio") for rel in slide.part.rels.values())
@@ -0,0 +1,84 @@
+"""VoicevoxEngine.synthesize_deck のテスト (モック VOICEVOX を使う)"""
+
+import asyncio
+import threading
+
+import pytest
+
+from mock_voicevox import start_server
+from tracing import Trace, recording
+from tts.voicevox import VoicevoxEngine
+
+_TEXTS = [
+    "一枚目です。\n二文目です。",
+    "",
+    "短い。",
+    "一枚目です。\n二文目です。",  # 同じノートのスライド
+    "三枚目は<next>クリックで進みます。\n四文目です。\n最後の文です。",
+]
+
+
+@pytest.fixture
+def server():
+    # 合成に時間がかかる (エンジンが詰まる) 状況にしてバッチが溜まるようにする
+    server = start_server(rtf=0.05, workers=1)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _engine(server) -> VoicevoxEngine:
+    host, port = server.server_address
+    return VoicevoxEngine(base_url=f"http://{host}:{port}")
+
+
+def test_deck_is_synthesized_in_batches(server):
+    engine = _engine(server)
+    started, chunks, slides = [], [], []
+    results = engine.synthesize_deck(
+        _TEXTS,
+        on_slide_start=lambda pos, total: started.append(pos),
+        on_chunk=lambda pos, i, total, text: chunks.append((pos, i)),
+        on_slide=lambda pos, result: slides.append(pos),
+    )
+    assert slides == list(range(len(_TEXTS)))
+    assert started == [0, 2, 3, 4]
+    expected_chunks = [(pos, i) for pos, (_, timings, _) in enumerate(results) for i in range(len(timings))]
+    assert sorted(chunks) == expected_chunks
+    assert server.stats["/synthesis"] == 0
+    assert 0 < server.stats["/multi_synthesis"] < len(expected_chunks)
+    assert results[1] == (b"", [], [])
+    assert results[0] == results[3]
+
+    # スライドをまたいだバッチでも、1 スライドずつ合成したときと同じ結果になる
+    for text, result in zip(_TEXTS, results):
+        assert engine.synthesize_with_timings(text) == result
+
+
+def test_non_positive_in_flight_is_clamped(server):
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(_engine(server).synthesize_deck(_TEXTS[:3], max_in_flight=0)),
+        daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert len(results[0]) == 3
+
+
+def test_async_engine_records_trace(server):
+    pytest.importorskip("aiohttp")
+    from tts.voicevox_async import AsyncVoicevoxEngine, synthesize_deck_async
+
+    host, port = server.server_address
+    engine = AsyncVoicevoxEngine(base_url=f"http://{host}:{port}")
+    with recording(Trace()) as trace:
+        asyncio.run(synthesize_deck_async(engine, _TEXTS[:3]))
+    sentences = server.stats["/synthesis"]
+    assert sentences > 0
+    names = [s.name for s in trace.spans]
+    assert names.count("synthesis") == sentences
+    assert names.count("audio_query") == server.stats["/audio_query"]
+    assert trace.counters["http.requests"] == sum(server.stats.values())
+    assert trace.counters["http.bytes_sent"] > 0
+    assert trace.counters["http.bytes_received"] > 0
@@ -0,0 +1,48 @@
+"""tracing の記録先の切り替えのテスト"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import Trace, bind_trace, count, recording, span
+
+
+def _work(name: str) -> None:
+    with span(name):
+        count("calls")
+
+
+def test_recording_is_per_thread():
+    traces = {}
+    barrier = threading.Barrier(2)
+
+    def run(name):
+        with recording(Trace()) as trace:
+            barrier.wait()
+            _work(name)
+            barrier.wait()
+        traces[name] = trace
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("a", "b")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [s.name for s in traces["a"].spans] == ["a"]
+    assert [s.name for s in traces["b"].spans] == ["b"]
+
+
+def test_bind_trace_carries_trace_into_pool():
+    with recording(Trace()) as trace, ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(bind_trace(_work), ["x", "y"]))
+        # 包まなければワーカーでは記録されない
+        pool.submit(_work, "z").result()
+    assert sorted(s.name for s in trace.spans) == ["x", "y"]
+    assert trace.counters["calls"] == 2
+
+
+def test_nothing_is_recorded_outside_recording():
+    assert bind_trace(_work) is _work
+    with recording(Trace()) as trace:
+        pass
+    _work("outside")
+    assert trace.spans == []
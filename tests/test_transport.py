@@ -0,0 +1,126 @@
+"""EnginePool と HttpTransport・AsyncVoicevoxEngine の再試行・退避のテスト (エンジンには接続しない)"""
+
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+from tts.transport import EnginePool, HttpTransport, SynthesisCancelled
+from tts.voicevox_async import AsyncVoicevoxEngine
+
+
+def _closed_port_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def test_single_engine_is_never_evicted_by_request_errors():
+    pool = EnginePool(["http://a"])
+    ep = pool.endpoints[0]
+    for _ in range(5):
+        pool.report_failure(ep)
+    assert ep.healthy
+    assert pool.probe_candidates() == []
+
+
+def test_engine_is_evicted_after_consecutive_failures():
+    pool = EnginePool(["http://a", "http://b"], max_failures=2)
+    a, b = pool.endpoints
+    pool.report_failure(a)
+    pool.report_success(a)
+    pool.report_failure(a)
+    assert a.healthy  # 間に成功があれば連続とみなさない
+    pool.report_failure(a)
+    assert not a.healthy
+    # 残り 1 台になったら退避させない
+    for _ in range(3):
+        pool.report_failure(b)
+    assert b.healthy
+    assert pool.acquire() is b
+
+
+def test_request_checks_cancel_before_sending():
+    cancel = threading.Event()
+    cancel.set()
+    transport = HttpTransport(_closed_port_url(), cancel_event=cancel)
+    with pytest.raises(SynthesisCancelled):
+        transport.get("/version")
+    assert transport.stats() == {}
+
+
+def test_cancel_interrupts_backoff():
+    cancel = threading.Event()
+    transport = HttpTransport(_closed_port_url(), retries=5, backoff_sec=5.0, cancel_event=cancel)
+    threading.Timer(0.3, cancel.set).start()
+    t0 = time.monotonic()
+    with pytest.raises(SynthesisCancelled):
+        transport.get("/version")
+    assert time.monotonic() - t0 < 3.0
+
+
+def test_total_retry_time_is_capped():
+    transport = HttpTransport(_closed_port_url(), retries=100, backoff_sec=0.2, max_total_sec=1.0,
+                              connect_timeout=0.5)
+    t0 = time.monotonic()
+    with pytest.raises(requests.ConnectionError):
+        transport.get("/version")
+    assert time.monotonic() - t0 < 3.0
+    assert transport.stats()["/version"].errors == 1
+
+
+def test_growing_pool_closes_replaced_adapter(monkeypatch):
+    transport = HttpTransport("http://127.0.0.1:1", pool_size=2)
+    old = transport._session.adapters["http://"]
+    closed = []
+    monkeypatch.setattr(old, "close", lambda: closed.append(old))
+    transport.ensure_pool_size(2)
+    assert closed == []
+    transport.ensure_pool_size(8)
+    assert closed and transport._session.adapters["http://"] is not old
+    assert transport._session.adapters["http://"]._pool_maxsize == 8
+    transport.close()
+
+
+def _run_async(engine, coro):
+    async def main():
+        async with engine:
+            return await coro
+    return asyncio.run(main())
+
+
+def test_async_request_checks_cancel_before_sending():
+    pytest.importorskip("aiohttp")
+    cancel = threading.Event()
+    cancel.set()
+    engine = AsyncVoicevoxEngine(base_url=_closed_port_url(), cancel_event=cancel)
+    with pytest.raises(SynthesisCancelled):
+        _run_async(engine, engine._request("GET", "/version"))
+    assert engine.latency.stats() == {}
+
+
+def test_async_cancel_interrupts_backoff():
+    pytest.importorskip("aiohttp")
+    cancel = threading.Event()
+    engine = AsyncVoicevoxEngine(base_url=_closed_port_url(), retries=5, backoff_sec=5.0,
+                                 cancel_event=cancel)
+    threading.Timer(0.3, cancel.set).start()
+    t0 = time.monotonic()
+    with pytest.raises(SynthesisCancelled):
+        _run_async(engine, engine._request("GET", "/version"))
+    assert time.monotonic() - t0 < 3.0
+
+
+def test_async_total_retry_time_is_capped():
+    aiohttp = pytest.importorskip("aiohttp")
+    engine = AsyncVoicevoxEngine(base_url=_closed_port_url(), retries=100, backoff_sec=0.2,
+                                 max_total_sec=1.0, connect_timeout=0.5)
+    t0 = time.monotonic()
+    with pytest.raises(aiohttp.ClientConnectionError):
+        _run_async(engine, engine._request("GET", "/version"))
+    assert time.monotonic() - t0 < 3.0
+    assert engine.latency.stats()["/version"].errors == 1
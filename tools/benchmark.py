@@ -0,0 +1,426 @@
+"""PPVoice のエンドツーエンド・ベンチマーク
+
+合成用のデッキ (スライド数・1 ノートあたりの文数・タグの密度・クリックアニメーションを指定)
+を生成し、次の各段階の経過時間・ピークメモリ (RSS)・出力サイズを測って JSON に書き出す。
+
+    read    read_notes (PPTX からのノート抽出)
+    synth   VoicevoxEngine.synthesize_deck (モック VOICEVOX に対して)
+    concat  _concat_wav (文ごとの WAV の結合)
+    embed   embed_audio (音声・字幕・タイミングの埋め込みと保存)
+    save    embed_audio の保存部分だけを、圧縮のプリセット × 圧縮スレッド数の組み合わせごとに
+            (保存時間と出力サイズのトレードオフを見るため。段階名は save:<プリセット>/<スレッド数>)
+
+各段階は別プロセスで実行するため、ピーク RSS はその段階だけの値になる
+(baseline_rss_mb は段階の開始前 = import 直後の値)。
+結果の JSON はコミット間で比較できる (--compare)。
+
+使い方 (リポジトリ直下で実行):
+    python tools/benchmark.py                       # 10, 100, 1000 スライド
+    python tools/benchmark.py --sizes 10 100 --sentences 5 -o bench.json
+    python tools/benchmark.py --url http://localhost:50021   # 本物のエンジンを使う
+    python tools/benchmark.py --compare before.json -o after.json
+    python tools/benchmark.py --sizes 1000 --stages save --save-workers 1 2 8
+"""
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+_TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+_ROOT = os.path.dirname(_TOOLS_DIR)
+sys.path.insert(0, os.path.join(_ROOT, "src"))
+sys.path.insert(0, _ROOT)
+sys.path.insert(0, _TOOLS_DIR)
+
+from lxml import etree
+from pptx import Presentation
+from pptx.util import Emu, Pt
+
+from mock_voicevox import make_audio_query, start_server, synthesize
+from pptx_reader import read_notes
+from pptx_stream import COMPRESSION_PRESETS
+from pptx_writer import embed_audio
+from tracing import Trace, recording
+from tts.voicevox import VoicevoxEngine, _concat_wav, _plan_text
+from version import __version__
+
+try:
+    import resource
+    _HAS_RESOURCE = True
+except ImportError:  # Windows
+    _HAS_RESOURCE = False
+
+try:
+    import psutil
+    _HAS_PSUTIL = True
+except ImportError:
+    _HAS_PSUTIL = False
+
+STAGES = ("read", "synth", "concat", "embed", "save")
+
+_PHRASES = [
+    "この章では音声合成の仕組みを説明します",
+    "まず入力されたテキストを文に分割します",
+    "次に各文の読みとアクセントを推定します",
+    "推定したアクセントからピッチを計算します",
+    "最後に波形を生成して一つの音声にまとめます",
+    "処理時間の大半は波形の生成にかかります",
+    "スライドごとに音声と字幕が埋め込まれます",
+    "詳しくは配布資料を参照してください",
+]
+_RUBY = ["{PPTX|パワーポイント}", "{API|エーピーアイ}", "{橋|はし|2}", "{VOICEVOX|ボイスボックス}"]
+_FORMATS = [("<b>", "</b>"), ("<i>", "</i>"), ("<u>", "</u>"), ("<color=#FF0000>", "</color>"),
+            ("<size=+4>", "</size>")]
+
+_P_NS = "http://schemas.openxmlformats.org/presentationml/2006/main"
+
+
+# --- 合成用デッキ ---------------------------------------------------------
+
+def _make_sentence(rng: random.Random, markup: float) -> str:
+    """タグを確率 markup で混ぜた 1 文。"""
+    text = rng.choice(_PHRASES)
+    if rng.random() < markup:
+        pos = rng.randrange(len(text))
+        text = text[:pos] + rng.choice(_RUBY) + text[pos:]
+    if rng.random() < markup:
+        start, end = rng.choice(_FORMATS)
+        pos = rng.randrange(len(text) // 2)
+        text = text[:pos] + start + text[pos:pos + 4] + end + text[pos + 4:]
+    if rng.random() < markup / 2:
+        text = rng.choice(["<speed=1.2>", "<pitch=0.05>", "<volume=0.8>"]) + text
+    return text + "。"
+
+
+def make_notes(rng: random.Random, sentences: int, markup: float, clicks: int) -> str:
+    """1 スライド分のノート。<wait> と、クリック数と同じ数の <next> を含む。"""
+    parts = [_make_sentence(rng, markup) for _ in range(sentences)]
+    for i in range(1, len(parts)):
+        if rng.random() < markup / 2:
+            parts[i] = rng.choice(["<wait=500ms>", "<wait=1s>"]) + parts[i]
+    for _ in range(clicks):
+        i = rng.randrange(len(parts))
+        parts[i] = "<next>" + parts[i]
+    return "\n".join(parts)
+
+
+def _click_timing_xml(shape_ids: list[int]) -> etree._Element:
+    """各シェイプを 1 クリックずつ表示する (開始: クリック時 / アピール) mainSeq。"""
+    ids = iter(range(3, 10000))
+    pars = []
+    for spid in shape_ids:
+        outer, mid, effect, behavior = next(ids), next(ids), next(ids), next(ids)
+        pars.append(
+            f'<p:par><p:cTn id="{outer}" fill="hold"><p:stCondLst><p:cond delay="indefinite"/></p:stCondLst>'
+            f'<p:childTnLst><p:par><p:cTn id="{mid}" fill="hold"><p:stCondLst><p:cond delay="0"/>'
+            f'</p:stCondLst><p:childTnLst><p:par><p:cTn id="{effect}" presetID="1" presetClass="entr" '
+            f'presetSubtype="0" fill="hold" grpId="0" nodeType="clickEffect"><p:stCondLst>'
+            f'<p:cond delay="0"/></p:stCondLst><p:childTnLst><p:set><p:cBhvr><p:cTn id="{behavior}" '
+            f'dur="1" fill="hold"><p:stCondLst><p:cond delay="0"/></p:stCondLst></p:cTn><p:tgtEl>'
+            f'<p:spTgt spid="{spid}"/></p:tgtEl><p:attrNameLst><p:attrName>style.visibility</p:attrName>'
+            f'</p:attrNameLst></p:cBhvr><p:to><p:strVal val="visible"/></p:to></p:set></p:childTnLst>'
+            f'</p:cTn></p:par></p:childTnLst></p:cTn></p:par></p:childTnLst></p:cTn></p:par>'
+        )
+    bld = "".join(f'<p:bldP spid="{spid}" grpId="0"/>' for spid in shape_ids)
+    xml = (
+        f'<p:timing xmlns:p="{_P_NS}"><p:tnLst><p:par><p:cTn id="1" dur="indefinite" restart="never" '
+        f'nodeType="tmRoot"><p:childTnLst><p:seq concurrent="1" nextAc="seek"><p:cTn id="2" '
+        f'dur="indefinite" nodeType="mainSeq"><p:childTnLst>{"".join(pars)}</p:childTnLst></p:cTn>'
+        f'<p:prevCondLst><p:cond evt="onPrev" delay="0"><p:tgtEl><p:sldTgt/></p:tgtEl></p:cond>'
+        f'</p:prevCondLst><p:nextCondLst><p:cond evt="onNext" delay="0"><p:tgtEl><p:sldTgt/></p:tgtEl>'
+        f'</p:cond></p:nextCondLst></p:seq></p:childTnLst></p:cTn></p:par></p:tnLst>'
+        f'<p:bldLst>{bld}</p:bldLst></p:timing>'
+    )
+    return etree.fromstring(xml)
+
+
+def make_deck(path: str, slides: int, sentences: int = 3, markup: float = 0.3,
+              clicks: int = 2, seed: int = 0) -> None:
+    """合成用のデッキを作る。
+
+    Args:
+        slides: スライド数
+        sentences: 1 ノートあたりの文数
+        markup: 読み指定・書式タグ・<wait> などを入れる確率 (0〜1)
+        clicks: 1 スライドあたりのクリックアニメーション数 (ノートには同数の <next> を入れる)
+        seed: 乱数シード (同じ引数なら同じデッキになる)
+    """
+    rng = random.Random(seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[6]  # 白紙
+    for n in range(slides):
+        slide = prs.slides.add_slide(layout)
+        title = slide.shapes.add_textbox(Emu(457200), Emu(274638), Emu(8229600), Emu(1143000))
+        title.text_frame.text = f"スライド {n + 1}"
+        title.text_frame.paragraphs[0].runs[0].font.size = Pt(32)
+        shape_ids = []
+        for c in range(clicks):
+            box = slide.shapes.add_textbox(Emu(457200), Emu(1600200 + c * 685800), Emu(8229600), Emu(600000))
+            box.text_frame.text = rng.choice(_PHRASES)
+            shape_ids.append(box.shape_id)
+        if shape_ids:
+            slide._element.append(_click_timing_xml(shape_ids))
+        slide.notes_slide.notes_text_frame.text = make_notes(rng, sentences, markup, clicks)
+    prs.save(path)
+
+
+# --- 計測 ------------------------------------------------------------------
+
+def _peak_rss_mb() -> float | None:
+    """このプロセスのピーク RSS (MB)。取得できなければ None。"""
+    if _HAS_RESOURCE:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux は KB、macOS はバイト単位
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    if _HAS_PSUTIL:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    return None
+
+
+def _stage_read(deck: str, work: str, options: dict) -> dict:
+    baseline = _peak_rss_mb()
+    t0 = time.perf_counter()
+    slides = read_notes(deck)
+    wall = time.perf_counter() - t0
+    return {"wall_sec": wall, "baseline_rss_mb": baseline, "peak_rss_mb": _peak_rss_mb(),
+            "notes_chars": sum(len(s.notes_text) for s in slides)}
+
+
+def _stage_synth(deck: str, work: str, options: dict) -> dict:
+    texts = [s.notes_text for s in read_notes(deck)]
+    engine = VoicevoxEngine(speaker_id=options["speaker_id"], base_url=options["url"])
+    baseline = _peak_rss_mb()
+    t0 = time.perf_counter()
+    try:
+        results = engine.synthesize_deck(texts, max_in_flight=options["parallel"])
+    finally:
+        engine.transport.close()
+    wall = time.perf_counter() - t0
+    peak = _peak_rss_mb()
+    # embed 段階の入力として保存する (計測の外)
+    with open(os.path.join(work, "synth.pickle"), "wb") as f:
+        pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return {"wall_sec": wall, "baseline_rss_mb": baseline, "peak_rss_mb": peak,
+            "sentences": sum(len(timings) for _, timings, _ in results),
+            "audio_bytes": sum(len(wav) for wav, _, _ in results)}
+
+
+def _stage_concat(deck: str, work: str, options: dict) -> dict:
+    """スライドごとに文の WAV を (計測の外で) 用意し、_concat_wav の時間だけを合計する。"""
+    texts = [s.notes_text for s in read_notes(deck)]
+    baseline = _peak_rss_mb()
+    wall = 0.0
+    out_bytes = 0
+    for text in texts:
+        plan = _plan_text(text, options["pause"])
+        if plan is None:
+            continue
+        chunks = [synthesize(make_audio_query(r, options["speaker_id"]), options["speaker_id"])
+                  for r in plan.readings]
+        t0 = time.perf_counter()
+        wav, _ = _concat_wav(chunks, plan.pauses, plan.display_sentences, plan.leading_pause)
+        wall += time.perf_counter() - t0
+        out_bytes += len(wav)
+    return {"wall_sec": wall, "baseline_rss_mb": baseline, "peak_rss_mb": _peak_rss_mb(),
+            "audio_bytes": out_bytes}
+
+
+def _load_embed_input(work: str) -> dict:
+    """synth 段階の結果を embed_audio の引数にする。"""
+    with open(os.path.join(work, "synth.pickle"), "rb") as f:
+        results = pickle.load(f)
+    next_positions = {idx: n for idx, (wav, _, n) in enumerate(results) if n}
+    return {"slide_audio": [(idx, wav) for idx, (wav, _, _) in enumerate(results) if wav],
+            "slide_timings": {idx: t for idx, (wav, t, _) in enumerate(results) if wav},
+            "slide_next_positions": next_positions or None}
+
+
+def _stage_embed(deck: str, work: str, options: dict) -> dict:
+    embed_input = _load_embed_input(work)
+    output = os.path.join(work, "output.pptx")
+    baseline = _peak_rss_mb()
+    t0 = time.perf_counter()
+    saved = embed_audio(deck, output_path=output, audio_format=options["audio_format"], **embed_input)
+    wall = time.perf_counter() - t0
+    return {"wall_sec": wall, "baseline_rss_mb": baseline, "peak_rss_mb": _peak_rss_mb(),
+            "output_bytes": os.path.getsize(saved)}
+
+
+def _stage_save(deck: str, work: str, options: dict) -> dict:
+    """圧縮のプリセット × スレッド数ごとに embed_audio を実行し、保存 (save_package) の時間を測る。"""
+    embed_input = _load_embed_input(work)
+    output = os.path.join(work, "output.pptx")
+    baseline = _peak_rss_mb()
+    variants = []
+    for compression in options["save_presets"]:
+        for workers in options["save_workers"]:
+            trace = Trace()
+            with recording(trace):
+                saved = embed_audio(deck, output_path=output, audio_format=options["audio_format"],
+                                    compression=compression, compress_workers=workers, **embed_input)
+            save_sec = sum(s.duration for s in trace.spans if s.name == "save_package")
+            variants.append({"stage": f"save:{compression}/{workers}", "wall_sec": save_sec,
+                             "output_bytes": os.path.getsize(saved)})
+    return {"wall_sec": sum(v["wall_sec"] for v in variants), "baseline_rss_mb": baseline,
+            "peak_rss_mb": _peak_rss_mb(), "variants": variants}
+
+
+_STAGE_FUNCS = {"read": _stage_read, "synth": _stage_synth, "concat": _stage_concat, "embed": _stage_embed,
+                "save": _stage_save}
+
+
+def _run_stage(stage: str, deck: str, work: str, options: dict) -> dict:
+    """段階を新しいプロセスで実行する (ピーク RSS を段階ごとに分けるため)。"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(_STAGE_FUNCS[stage], deck, work, options).result()
+
+
+def run_benchmark(sizes: list[int], stages: list[str], options: dict, deck_options: dict,
+                  repeat: int = 1) -> list[dict]:
+    """スライド数ごとにデッキを作り、各段階を計測する。repeat 回のうち最短の結果を採る。"""
+    records = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="ppvoice_bench_") as work:
+            deck = os.path.join(work, "deck.pptx")
+            make_deck(deck, size, **deck_options)
+            deck_bytes = os.path.getsize(deck)
+            for stage in stages:
+                if stage in ("embed", "save") and not os.path.exists(os.path.join(work, "synth.pickle")):
+                    # embed・save の入力は synth 段階の結果を使う
+                    _run_stage("synth", deck, work, options)
+                runs = [_run_stage(stage, deck, work, options) for _ in range(repeat)]
+                if "variants" in runs[0]:
+                    # 組み合わせごとに 1 レコードにする (ピーク RSS は段階全体の値)
+                    rows = []
+                    for i, variant in enumerate(runs[0]["variants"]):
+                        best = min((r["variants"][i] for r in runs), key=lambda v: v["wall_sec"])
+                        rows.append({**runs[0], **best})
+                else:
+                    rows = [{**min(runs, key=lambda r: r["wall_sec"]), "stage": stage}]
+                for row in rows:
+                    row.pop("variants", None)
+                    record = {"slides": size, "deck_bytes": deck_bytes, **row}
+                    records.append(record)
+                    print(_format_record(record), flush=True)
+    return records
+
+
+# --- 出力 ------------------------------------------------------------------
+
+def _format_rss(value: float | None) -> str:
+    return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def _format_record(r: dict) -> str:
+    size = r.get("output_bytes") or r.get("audio_bytes")
+    return (f"{r['slides']:>6} {r['stage']:<14} {r['wall_sec']:>9.3f}s  RSS {_format_rss(r['peak_rss_mb'])} MB"
+            f" (+{_format_rss((r['peak_rss_mb'] or 0) - (r['baseline_rss_mb'] or 0)).strip()})"
+            + (f"  {size / 1e6:8.1f} MB" if size else ""))
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def compare(base: dict, current: dict) -> str:
+    """2 つの結果 JSON を (スライド数, 段階) ごとに比べた表。"""
+    old = {(r["slides"], r["stage"]): r for r in base["results"]}
+    lines = [f"比較: {base['meta'].get('commit') or '?'} → {current['meta'].get('commit') or '?'}",
+             f"{'スライド':>6} {'段階':<14} {'前(秒)':>9} {'後(秒)':>9} {'比':>7} {'RSS前':>8} {'RSS後':>8}"]
+    for r in current["results"]:
+        b = old.get((r["slides"], r["stage"]))
+        if b is None:
+            continue
+        ratio = r["wall_sec"] / b["wall_sec"] if b["wall_sec"] > 0 else float("inf")
+        lines.append(f"{r['slides']:>6} {r['stage']:<14} {b['wall_sec']:>9.3f} {r['wall_sec']:>9.3f} "
+                     f"{ratio:>6.2f}x {_format_rss(b['peak_rss_mb'])} {_format_rss(r['peak_rss_mb'])}")
+    return "\n".join(lines)
+
+
+def _positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"1 以上の整数を指定してください: {value}")
+    return n
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="PPVoice のエンドツーエンド・ベンチマーク")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="スライド数 (複数可)")
+    p.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    p.add_argument("--sentences", type=int, default=3, help="1 ノートあたりの文数")
+    p.add_argument("--markup", type=float, default=0.3, help="タグを入れる確率 (0〜1)")
+    p.add_argument("--clicks", type=int, default=2, help="1 スライドあたりのクリックアニメーション数")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=1, help="各段階の試行回数 (最短を採用)")
+    p.add_argument("--url", help="VOICEVOX の URL (省略時はモックを起動する)")
+    p.add_argument("--speaker-id", type=int, default=1)
+    p.add_argument("--parallel", type=_positive_int, default=8, help="同時に合成する文の数")
+    p.add_argument("--pause", type=float, default=0.5)
+    p.add_argument("--audio-format", default="wav")
+    p.add_argument("--mock-rtf", type=float, default=0.0, help="モックの合成時間 (音声の長さに対する比)")
+    p.add_argument("--mock-workers", type=int, default=0, help="モックの同時合成数 (0 = 無制限)")
+    p.add_argument("--save-presets", nargs="+", choices=list(COMPRESSION_PRESETS),
+                   default=list(COMPRESSION_PRESETS), help="save 段階で比べる圧縮のプリセット")
+    p.add_argument("--save-workers", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                   help="save 段階で比べる圧縮スレッド数")
+    p.add_argument("-o", "--output", help="結果 JSON の保存先")
+    p.add_argument("--compare", help="比較する以前の結果 JSON")
+    args = p.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        server = start_server(port=0, rtf=args.mock_rtf, workers=args.mock_workers)
+        url = f"http://127.0.0.1:{server.server_port}"
+    options = {"url": url, "speaker_id": args.speaker_id, "parallel": args.parallel, "pause": args.pause,
+               "audio_format": args.audio_format, "save_presets": args.save_presets,
+               "save_workers": sorted(set(args.save_workers))}
+    deck_options = {"sentences": args.sentences, "markup": args.markup, "clicks": args.clicks,
+                    "seed": args.seed}
+    meta = {
+        "commit": _git_commit(),
+        "version": __version__,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "engine": "mock" if server else url,
+        "options": {**options, **deck_options, "repeat": args.repeat, "mock_rtf": args.mock_rtf,
+                    "mock_workers": args.mock_workers},
+    }
+    print(f"{'スライド':>6} {'段階':<14} {'経過':>10}  ピーク RSS")
+    try:
+        results = run_benchmark(args.sizes, args.stages, options, deck_options, repeat=args.repeat)
+    finally:
+        if server is not None:
+            server.shutdown()
+    report = {"meta": meta, "results": results}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"保存しました: {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print()
+            print(compare(json.load(f), report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
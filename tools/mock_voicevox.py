@@ -0,0 +1,358 @@
+"""VOICEVOX Engine の簡易モックサーバー (ベンチマーク・オフライン確認用)
+
+VOICEVOX がなくても PPVoice の合成 → PPTX 生成の流れを動かせるよう、
+PPVoice が使う API だけを標準ライブラリで実装する。
+
+    /version, /speakers, /audio_query, /synthesis, /multi_synthesis, /mora_pitch, /mora_data
+
+音声は本物ではないが、同じクエリからは常に同じ WAV を返す (決定的)。
+長さはモーラ数・話速から求め、サンプリングレート・ステレオ・音量の指定も反映する。
+応答の遅延・処理能力・障害は起動オプションで再現できる。
+
+使い方:
+    python tools/mock_voicevox.py --port 50021
+    python tools/mock_voicevox.py --port 50021 --latency 0.05 --rtf 0.2 --workers 2 --fail-rate 0.01
+
+    # Python から (ポート 0 で空きポートを使う)
+    server = start_server(port=0, rtf=0.1)
+    url = f"http://127.0.0.1:{server.server_port}"
+    ...
+    server.shutdown()
+"""
+
+import argparse
+import array
+import hashlib
+import io
+import json
+import random
+import sys
+import threading
+import time
+import wave
+import zipfile
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+VERSION = "0.0.0-mock"
+
+# 話者名・スタイル ID は本物の VOICEVOX に合わせる (GUI の既定話者をそのまま使えるように)
+SPEAKERS = [
+    {
+        "name": "四国めたん",
+        "speaker_uuid": "7ffcb7ce-00ec-4bdc-82cd-45a8889e43ff",
+        "styles": [{"name": "ノーマル", "id": 2}, {"name": "あまあま", "id": 0}],
+        "version": VERSION,
+    },
+    {
+        "name": "ずんだもん",
+        "speaker_uuid": "388f246b-8c41-4ac1-8e2d-5d79f3ff56d9",
+        "styles": [{"name": "ノーマル", "id": 3}, {"name": "あまあま", "id": 1}],
+        "version": VERSION,
+    },
+]
+
+_SAMPLE_RATE = 24000
+# 1 アクセント句あたりの最大モーラ数
+_PHRASE_MORAS = 4
+_VOWELS = "aiueo"
+
+
+@dataclass
+class MockOptions:
+    """遅延・障害の設定。
+
+    latency: 全リクエストに加える固定の遅延 (秒)
+    rtf: 合成にかかる時間 = 生成した音声の長さ × rtf (実時間比。0 なら即時)
+    workers: 同時に合成できる数 (エンジンの処理能力。超えた分は待たされる)
+    fail_rate: 500 エラーを返す確率
+    drop_rate: 応答せずに接続を切る確率
+    seed: 障害発生の乱数シード
+    disabled: 未対応として 404 を返すエンドポイント (例: ("/mora_pitch",) で古いエンジンを再現)
+    """
+    latency: float = 0.0
+    rtf: float = 0.0
+    workers: int = 0
+    fail_rate: float = 0.0
+    drop_rate: float = 0.0
+    seed: int | None = None
+    disabled: tuple[str, ...] = ()
+
+
+def _stable_int(*parts) -> int:
+    return int.from_bytes(hashlib.sha256(repr(parts).encode("utf-8")).digest()[:4], "little")
+
+
+def _mora(char: str, speaker: int) -> dict:
+    h = _stable_int(char, speaker)
+    return {
+        "text": char,
+        "consonant": None if h % 3 == 0 else "k",
+        "consonant_length": None if h % 3 == 0 else 0.05 + (h % 5) * 0.005,
+        "vowel": _VOWELS[h % 5],
+        "vowel_length": 0.08 + (h % 7) * 0.01,
+        "pitch": 5.5 + (h % 10) * 0.05,
+    }
+
+
+def _apply_accent_pitch(phrases: list[dict]) -> list[dict]:
+    """アクセント位置に応じてピッチを付け直す (mora_pitch / mora_data 相当)。"""
+    for phrase in phrases:
+        accent = phrase.get("accent", 1)
+        for i, mora in enumerate(phrase.get("moras", [])):
+            # アクセント核までは高く、以降は下げる (1 モーラ目は低め)
+            high = (i < accent) and not (i == 0 and accent != 1)
+            mora["pitch"] = 5.9 if high else 5.4
+    return phrases
+
+
+def make_audio_query(text: str, speaker: int) -> dict:
+    """テキストから決定的な音声クエリを作る (1 文字 = 1 モーラ、ひらがなはカタカナにする)。"""
+    chars = [chr(ord(c) + 0x60) if "\u3041" <= c <= "\u3096" else c
+             for c in text if not c.isspace()]
+    phrases = []
+    for start in range(0, len(chars), _PHRASE_MORAS):
+        moras = [_mora(c, speaker) for c in chars[start:start + _PHRASE_MORAS]]
+        phrases.append({
+            "moras": moras,
+            "accent": 1 + _stable_int(text, start) % len(moras),
+            "pause_mora": None,
+            "is_interrogative": False,
+        })
+    return {
+        "accent_phrases": _apply_accent_pitch(phrases),
+        "speedScale": 1.0,
+        "pitchScale": 0.0,
+        "intonationScale": 1.0,
+        "volumeScale": 1.0,
+        "prePhonemeLength": 0.1,
+        "postPhonemeLength": 0.1,
+        "outputSamplingRate": _SAMPLE_RATE,
+        "outputStereo": False,
+        "kana": "".join(chars),
+    }
+
+
+def query_duration_sec(query: dict) -> float:
+    """クエリから音声の長さ (秒) を求める。"""
+    total = query.get("prePhonemeLength", 0.1) + query.get("postPhonemeLength", 0.1)
+    for phrase in query.get("accent_phrases", []):
+        for mora in phrase.get("moras", []):
+            total += (mora.get("consonant_length") or 0) + (mora.get("vowel_length") or 0)
+        if phrase.get("pause_mora"):
+            total += phrase["pause_mora"].get("vowel_length") or 0
+    return total / max(query.get("speedScale", 1.0), 0.1)
+
+
+def synthesize(query: dict, speaker: int) -> bytes:
+    """クエリから決定的な WAV を作る。
+
+    モーラごとにピッチで周期の変わる矩形波に、クエリから決まる雑音を下位バイトに乗せる
+    (単純な矩形波だと ZIP で極端に縮み、出力サイズの計測が実際とかけ離れるため)。
+    """
+    rate = int(query.get("outputSamplingRate", _SAMPLE_RATE))
+    channels = 2 if query.get("outputStereo") else 1
+    speed = max(query.get("speedScale", 1.0), 0.1)
+    amplitude = int(min(max(query.get("volumeScale", 1.0), 0.0), 2.0) * 4000)
+    pitch_shift = query.get("pitchScale", 0.0)
+
+    samples = array.array("h")
+    samples.extend([0] * int(rate * query.get("prePhonemeLength", 0.1) / speed))
+    for phrase in query.get("accent_phrases", []):
+        for mora in phrase.get("moras", []):
+            length = ((mora.get("consonant_length") or 0) + (mora.get("vowel_length") or 0)) / speed
+            n = int(rate * length)
+            freq = 100 + 40 * (mora.get("pitch", 5.5) + pitch_shift - 5.0) + speaker * 10
+            period = max(2, int(rate / max(freq, 20)))
+            half = period // 2
+            cycle = array.array("h", [amplitude] * half + [-amplitude] * (period - half))
+            tone = cycle * (n // period + 1)
+            samples.extend(tone[:n])
+    samples.extend([0] * int(rate * query.get("postPhonemeLength", 0.1) / speed))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    pcm = bytearray(samples.tobytes())
+    noise = random.Random(_stable_int(json.dumps(query, sort_keys=True), speaker)).randbytes(len(pcm))
+    pcm[0::2] = noise[0::2]  # リトルエンディアンの下位バイト
+    pcm = bytes(pcm)
+    if channels == 2:
+        # 左右同じ音を交互に並べる
+        stereo = array.array("h", bytes(len(pcm) * 2))
+        mono = array.array("h", pcm)
+        stereo[0::2] = mono
+        stereo[1::2] = mono
+        pcm = stereo.tobytes()
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+class MockVoicevoxServer(ThreadingHTTPServer):
+    """モックサーバー本体。stats にエンドポイントごとのリクエスト数を記録する。"""
+
+    daemon_threads = True
+    # 並列ベンチマークで接続が溢れないようにする
+    request_queue_size = 256
+
+    def __init__(self, address, options: MockOptions | None = None):
+        super().__init__(address, _Handler)
+        self.options = options or MockOptions()
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        self._random = random.Random(self.options.seed)
+        self._random_lock = threading.Lock()
+        self._synth_slots = (threading.BoundedSemaphore(self.options.workers)
+                             if self.options.workers > 0 else None)
+
+    def count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def roll(self) -> float:
+        with self._random_lock:
+            return self._random.random()
+
+    def simulate_synthesis(self, audio_sec: float) -> None:
+        """音声の長さに比例した合成時間を、同時実行数の制限付きで待つ。"""
+        if self.options.rtf <= 0:
+            return
+        if self._synth_slots is None:
+            time.sleep(audio_sec * self.options.rtf)
+            return
+        with self._synth_slots:
+            time.sleep(audio_sec * self.options.rtf)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockVoicevoxServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data, status: int = 200) -> None:
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def _inject_faults(self, path: str) -> bool:
+        """遅延と障害を注入する。応答済み (または切断済み) なら True。"""
+        opts = self.server.options
+        if opts.latency > 0:
+            time.sleep(opts.latency)
+        if opts.drop_rate > 0 and self.server.roll() < opts.drop_rate:
+            self.server.count("dropped")
+            self.close_connection = True
+            return True
+        if opts.fail_rate > 0 and self.server.roll() < opts.fail_rate:
+            self.server.count("failed")
+            self._send_json({"detail": "injected failure"}, status=500)
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.count(url.path)
+        if url.path == "/__stats":
+            self._send_json(dict(self.server.stats))
+            return
+        if self._inject_faults(url.path):
+            return
+        if url.path == "/version":
+            self._send_json(VERSION)
+        elif url.path == "/speakers":
+            self._send_json(SPEAKERS)
+        else:
+            self._send_json({"detail": "Not Found"}, status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.server.count(url.path)
+        if self._inject_faults(url.path):
+            return
+        if url.path in self.server.options.disabled:
+            self._send_json({"detail": "Not Found"}, status=404)
+            return
+        try:
+            speaker = int(query.get("speaker", 0))
+            payload = json.loads(body) if body else None
+        except ValueError:
+            self._send_json({"detail": "invalid request"}, status=422)
+            return
+
+        if url.path == "/audio_query":
+            if "text" not in query:
+                self._send_json({"detail": "text is required"}, status=422)
+                return
+            self._send_json(make_audio_query(query["text"], speaker))
+        elif url.path in ("/mora_pitch", "/mora_data"):
+            self._send_json(_apply_accent_pitch(payload or []))
+        elif url.path == "/synthesis":
+            self.server.simulate_synthesis(query_duration_sec(payload or {}))
+            self._send(200, synthesize(payload or {}, speaker), "audio/wav")
+        elif url.path == "/multi_synthesis":
+            queries = payload or []
+            self.server.simulate_synthesis(sum(query_duration_sec(q) for q in queries))
+            buf = io.BytesIO()
+            with zipfile.ZipFile(buf, "w") as zf:
+                for i, q in enumerate(queries):
+                    zf.writestr(f"{i + 1:03}.wav", synthesize(q, speaker))
+            self._send(200, buf.getvalue(), "application/zip")
+        else:
+            self._send_json({"detail": "Not Found"}, status=404)
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, **options) -> MockVoicevoxServer:
+    """モックサーバーをバックグラウンドスレッドで起動する。止めるときは shutdown() を呼ぶ。"""
+    server = MockVoicevoxServer((host, port), MockOptions(**options))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="VOICEVOX Engine の簡易モックサーバー")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=50021)
+    p.add_argument("--latency", type=float, default=0.0, help="全リクエストの固定遅延 (秒)")
+    p.add_argument("--rtf", type=float, default=0.0,
+                   help="合成時間 = 音声の長さ × RTF (例: 0.2 で音声 1 秒あたり 0.2 秒)")
+    p.add_argument("--workers", type=int, default=0, help="同時に合成できる数 (0 = 無制限)")
+    p.add_argument("--fail-rate", type=float, default=0.0, help="500 エラーを返す確率")
+    p.add_argument("--drop-rate", type=float, default=0.0, help="応答せずに接続を切る確率")
+    p.add_argument("--seed", type=int, help="障害発生の乱数シード")
+    p.add_argument("--disable", action="append", default=[], metavar="PATH",
+                   help="未対応として 404 を返すエンドポイント (例: --disable /mora_pitch)")
+    args = p.parse_args(argv)
+
+    options = MockOptions(latency=args.latency, rtf=args.rtf, workers=args.workers,
+                          fail_rate=args.fail_rate, drop_rate=args.drop_rate, seed=args.seed,
+                          disabled=tuple(args.disable))
+    server = MockVoicevoxServer((args.host, args.port), options)
+    print(f"モック VOICEVOX を起動しました: http://{args.host}:{server.server_port} (Ctrl+C で終了)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("リクエスト数: " + ", ".join(f"{k}={v}" for k, v in sorted(server.stats.items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())